@@ -0,0 +1,130 @@
+"""
+Compression policy benchmark.
+
+Builds a synthetic temp folder (CSV/JSON text, images, parquet-like binary,
+an existing zip, a PDF) and bundles it under each policy, reporting
+throughput and compression ratio. The "parallel" row uses the same policy
+built with ParallelCompressor.
+
+Usage:
+    python benchmarks/bench_compression.py [--scale-mb 64] [--keep]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.archive import ParallelCompressor, ZipBuilder  # noqa: E402
+from utils.compression import CompressionPolicy, available_tar_codecs, build_tar_bundle  # noqa: E402
+
+
+def make_synthetic_folder(folder: str, scale_mb: int, seed: int = 7):
+    """
+    Fills folder with a mix of compressible and incompressible files.
+    """
+    rng = random.Random(seed)
+    mb = 1024 * 1024
+    text_budget = scale_mb * mb // 2
+    binary_budget = scale_mb * mb // 2
+
+    with open(os.path.join(folder, "train.csv"), "w") as f:
+        f.write("id,age,fare,cabin,label\n")
+        written = 0
+        row_id = 0
+        while written < text_budget * 3 // 4:
+            row = f"{row_id},{rng.randint(1, 90)},{rng.random() * 500:.4f},C{rng.randint(1, 200)},{rng.randint(0, 1)}\n"
+            f.write(row)
+            written += len(row)
+            row_id += 1
+
+    with open(os.path.join(folder, "metadata.json"), "w") as f:
+        written = 0
+        f.write("[\n")
+        while written < text_budget // 4:
+            item = f'  {{"name": "sample_{rng.randint(0, 10**6)}", "split": "train", "tags": ["ml", "csv"]}},\n'
+            f.write(item)
+            written += len(item)
+        f.write('  {}\n]\n')
+
+    for name, share in (("images.png", 3), ("features.parquet", 3), ("weights.bin", 2), ("paper.pdf", 1)):
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(os.urandom(binary_budget * share // 10))
+
+    with zipfile.ZipFile(os.path.join(folder, "archive_inner.dat"), "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.write(os.path.join(folder, "train.csv"), "train.csv")
+
+
+def run_zip(files, output: str, choose) -> float:
+    start = time.perf_counter()
+    with open(output, "wb") as fp:
+        builder = ZipBuilder(fp)
+        for path, arcname in files:
+            method, level = choose(path)
+            builder.add_file(path, arcname, method, level)
+        builder.finish()
+    return time.perf_counter() - start
+
+
+def run_zip_parallel(files, output: str, choose) -> float:
+    start = time.perf_counter()
+    jobs = [(path, arcname) + tuple(choose(path)) for path, arcname in files]
+    with open(output, "wb") as fp:
+        builder = ZipBuilder(fp)
+        for member in ParallelCompressor().imap(jobs):
+            builder.add_prepared(member)
+        builder.finish()
+    return time.perf_counter() - start
+
+
+def run_tar(files, output: str, codec: str) -> float:
+    start = time.perf_counter()
+    build_tar_bundle(files, output, codec)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale-mb", type=int, default=64, help="Approximate size of the synthetic folder")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic folder and outputs")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_compression_")
+    folder = os.path.join(workdir, "temp")
+    os.makedirs(folder)
+    make_synthetic_folder(folder, args.scale_mb)
+    files = [(os.path.join(folder, name), name) for name in sorted(os.listdir(folder))]
+    input_bytes = sum(os.path.getsize(path) for path, _ in files)
+
+    policy = CompressionPolicy()
+    runs = [
+        ("zip deflate-6 (legacy)", lambda out: run_zip(files, out, lambda p: (zipfile.ZIP_DEFLATED, 6))),
+        ("zip stored", lambda out: run_zip(files, out, lambda p: (zipfile.ZIP_STORED, 0))),
+        ("zip policy", lambda out: run_zip(files, out, policy.choose)),
+        ("zip policy parallel", lambda out: run_zip_parallel(files, out, policy.choose)),
+    ]
+    for codec in available_tar_codecs():
+        runs.append((f"tar {codec}", lambda out, codec=codec: run_tar(files, out, codec)))
+
+    print(f"Synthetic folder: {len(files)} files, {input_bytes / 2**20:.1f} MiB in {folder}")
+    print(f"{'policy':<24}{'seconds':>10}{'MiB/s':>10}{'ratio':>9}")
+    for name, run in runs:
+        output = os.path.join(workdir, name.replace(" ", "_").replace("(", "").replace(")", "") + ".out")
+        seconds = run(output)
+        ratio = os.path.getsize(output) / input_bytes
+        print(f"{name:<24}{seconds:>10.2f}{input_bytes / 2**20 / seconds:>10.1f}{ratio:>9.3f}")
+
+    if args.keep:
+        print(f"Outputs kept in {workdir}")
+    else:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Downloader benchmark against a local HTTP server that serves byte ranges.
+
+The server throttles each connection (like a CDN capping per-stream bandwidth)
+and can drop connections part-way through. The run compares a single stream
+with parallel segments, then interrupts a download and resumes it. Every
+result is checked against the source's SHA-256.
+
+Usage:
+    python benchmarks/bench_download.py [--size-mb 32] [--per-conn-mbps 16] [--segments 4]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.downloader import Downloader, DownloadError  # noqa: E402
+from utils.http_client import build_session  # noqa: E402
+
+
+class RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload: bytes, per_conn_bps: int, ranges: bool = True):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.payload = payload
+        self.per_conn_bps = per_conn_bps
+        self.ranges = ranges
+        self.drop_after = None  # Bytes per response before the connection is cut
+        self.outage = False  # Cut running responses and answer 503
+        self.etag = f'"{hashlib.sha256(payload).hexdigest()[:16]}"'
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status: int, length: int, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", self.server.etag)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(self.server.payload))
+
+    def do_GET(self):
+        if self.server.outage:
+            self._headers(503, 0)
+            return
+        payload = self.server.payload
+        start, end = 0, len(payload) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if self.server.ranges and match and self.headers.get("If-Range", self.server.etag) == self.server.etag:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            self._headers(206, end - start + 1, {"Content-Range": f"bytes {start}-{end}/{len(payload)}"})
+        else:
+            self._headers(200, len(payload))
+
+        sent = 0
+        chunk = 64 * 1024
+        started = time.monotonic()
+        position = start
+        while position <= end:
+            if self.server.outage or (self.server.drop_after is not None and sent >= self.server.drop_after):
+                self.close_connection = True
+                return
+            piece = payload[position:min(position + chunk, end + 1)]
+            try:
+                self.wfile.write(piece)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            position += len(piece)
+            sent += len(piece)
+            # Throttle this connection to per_conn_bps
+            delay = sent / self.server.per_conn_bps - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def timed(label: str, fn, expected_hash: str, path: str, size: int):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    ok = sha256_file(path) == expected_hash
+    print(f"{label:<34}{seconds:>9.2f}{size / 2**20 / seconds:>10.1f}   {'ok' if ok else 'HASH MISMATCH'}")
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=32, help="Size of the served file")
+    parser.add_argument("--per-conn-mbps", type=float, default=16, help="Per-connection bandwidth cap (MB/s)")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel segments for the segmented runs")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(payload).hexdigest()
+    server = RangeServer(payload, int(args.per_conn_mbps * 1024 * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/dataset.bin"
+    workdir = tempfile.mkdtemp(prefix="bench_download_")
+    dest = os.path.join(workdir, "dataset.bin")
+    session = build_session(pool_maxsize=args.segments * 2, max_retries=0)
+    min_segment = 1024 * 1024
+
+    print(f"Serving {args.size_mb} MiB at {args.per_conn_mbps} MB/s per connection")
+    print(f"{'run':<34}{'seconds':>9}{'MiB/s':>10}   check")
+    try:
+        single = Downloader(session=session, segments=1, min_segment=min_segment)
+        timed("single stream", lambda: single.download(url, dest, sha256=expected), expected, dest, len(payload))
+
+        segmented = Downloader(session=session, segments=args.segments, min_segment=min_segment)
+        timed(f"{args.segments} segments", lambda: segmented.download(url, dest, sha256=expected),
+              expected, dest, len(payload))
+
+        # Cut every connection after 1/8 of the file; segments retry from where they stopped
+        server.drop_after = len(payload) // 8
+        flaky = Downloader(session=session, segments=args.segments, min_segment=min_segment, retries=20)
+        timed(f"{args.segments} segments, dropped connections", lambda: flaky.download(url, dest, sha256=expected),
+              expected, dest, len(payload))
+
+        # Take the server down mid-download; the next attempt resumes from the .part file
+        server.drop_after = None
+        fragile = Downloader(session=session, segments=args.segments, min_segment=min_segment, retries=0)
+        threading.Timer(0.3 * args.size_mb / args.per_conn_mbps / args.segments,
+                        lambda: setattr(server, "outage", True)).start()
+        try:
+            fragile.download(url, dest, sha256=expected)
+        except DownloadError:
+            pass
+        server.outage = False
+        with open(f"{dest}.part.json") as f:
+            resumed = sum(segment[2] for segment in json.load(f)["segments"])
+        timed(f"resume ({resumed * 100 // len(payload)}% already on disk)",
+              lambda: fragile.download(url, dest, sha256=expected), expected, dest, len(payload))
+
+        server.ranges = False
+        timed("server without ranges", lambda: segmented.download(url, dest, sha256=expected),
+              expected, dest, len(payload))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,632 @@
+"""
+Load test of the whole bot against local stand-ins for Telegram and the providers.
+
+Runs the real Application from main.build_app() and feeds it synthetic text
+message updates, the way the Updater or the webhook would. Nothing leaves the
+machine:
+- a fake Bot API (in this process) answers the bot's getMe, sendMessage,
+  editMessageText, deleteMessage, sendDocument, ... calls and sees when each
+  request has been answered;
+- stub GitHub, HuggingFace and Kaggle APIs (one child process) return
+  canned search results after --latency ms, failing --error-rate of the
+  requests with a 500 and --throttle-rate with a 429.
+
+The Kaggle SDK only talks to api.kaggle.com or http://localhost, so it is
+pointed at localhost and reaches the stub through HTTP_PROXY.
+
+Load is closed-loop: --users virtual users each send a message, wait for the
+bot's final reply (search results, the MLparset bundle, or an error) and send
+the next, until --updates messages were answered. The scenario picks the
+messages: "search" (queries drawn from --queries distinct ones, so the cache
+sees repeats), "mlparset" (bundles of a temp folder with --files random
+files) or "mixed" (--mlparset-share of MLparset). A seed makes runs
+repeatable.
+
+Reports p50/p95/p99 latency per request kind, answered updates per second,
+peak RSS of the bot process, bytes uploaded to Telegram and the Bot API and
+provider traffic. Results can be saved as a JSON baseline; --compare prints
+the change against one and exits non-zero when a metric got worse by more
+than --tolerance.
+
+Usage:
+    python benchmarks/bench_load.py [--scenario mixed] [--updates 500] [--users 20]
+    python benchmarks/bench_load.py --scenario search --latency 150 --error-rate 0.05
+    python benchmarks/bench_load.py --scenario mlparset --files 40 --file-kb 512
+    python benchmarks/bench_load.py --save load-v1.json
+    python benchmarks/bench_load.py --compare load-v1.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The bot's modules read their configuration at import time, so they are only
+# imported once environment() has pointed it at the stubs.
+
+TOKEN = "123456:LOADTEST"
+FIRST_USER_ID = 100000
+BOT_API_METHODS = ("getMe", "sendMessage", "editMessageText", "editMessageReplyMarkup", "deleteMessage",
+                   "sendDocument", "answerCallbackQuery", "sendChatAction")
+KAGGLE_PATH = "/api/v1/datasets.DatasetApiService/ListDatasets"
+# Results each stub returns per query, over all pages
+RESULTS_PER_QUERY = 30
+
+_CHAT_ID = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+# Metrics compared against a baseline: key -> whether higher is better
+COMPARED = {
+    "throughput": True,
+    "latency_ms.all.p50": False,
+    "latency_ms.all.p95": False,
+    "latency_ms.all.p99": False,
+    "peak_rss_mb": False,
+    "uploaded_bytes": False,
+}
+
+
+# ---------------------------------------------------------
+# Stub providers (child process)
+# ---------------------------------------------------------
+
+def run_providers(conn, latency: float, jitter: float, error_rate: float, throttle_rate: float, seed: int):
+    """
+    Child process entry point: serves the stub provider APIs until conn says stop.
+
+    Sends the port first and the request counters when done.
+    """
+    asyncio.run(_serve_providers(conn, latency, jitter, error_rate, throttle_rate, seed))
+
+
+async def _serve_providers(conn, latency, jitter, error_rate, throttle_rate, seed):
+    from utils.web_server import Response, WebServer
+
+    rng = random.Random(seed)
+    counters = defaultdict(Counter)
+
+    def results(query: str, page: int, per_page: int, make):
+        start = (page - 1) * per_page
+        return [make(f"{query.replace(' ', '-')}-{i}", i) for i in range(start, min(start + per_page, RESULTS_PER_QUERY))]
+
+    async def inject(provider: str):
+        """
+        Waits the configured latency; returns an error Response to send instead, if one is due.
+        """
+        counters[provider]["requests"] += 1
+        delay = max(0.0, latency + rng.uniform(-jitter, jitter)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < error_rate:
+            counters[provider]["errors"] += 1
+            return Response(500, b'{"message": "injected error"}', content_type="application/json")
+        if roll < error_rate + throttle_rate:
+            counters[provider]["throttled"] += 1
+            return Response(429, b'{"message": "injected rate limit"}', content_type="application/json",
+                            headers={"Retry-After": "1"})
+        return None
+
+    def as_json(payload, headers=None):
+        return Response(body=json.dumps(payload).encode(), content_type="application/json", headers=headers or {})
+
+    async def github(request):
+        failure = await inject("github")
+        if failure:
+            return failure
+        query = request.query.get("q", [""])[0].split(" topic:")[0]
+        page = int(request.query.get("page", ["1"])[0])
+        per_page = int(request.query.get("per_page", ["10"])[0])
+        items = results(query, page, per_page, lambda name, i: {
+            "full_name": f"bench/{name}", "html_url": f"https://github.com/bench/{name}",
+            "stargazers_count": 1000 - i, "forks_count": 100 - i})
+        return as_json({"total_count": RESULTS_PER_QUERY, "items": items},
+                       {"X-RateLimit-Remaining": "1000", "X-RateLimit-Reset": str(int(time.time()) + 60)})
+
+    async def huggingface(request):
+        failure = await inject("hf")
+        if failure:
+            return failure
+        query = request.query.get("search", [""])[0]
+        page = int(request.query.get("page", ["1"])[0])
+        per_page = int(request.query.get("limit", ["10"])[0])
+        items = results(query, page, per_page, lambda name, i: {
+            "id": f"bench/{name}", "_id": f"{i:024x}", "downloads": 5000 - i, "likes": 50 - i,
+            "private": False, "tags": []})
+        headers = {}
+        if page * per_page < RESULTS_PER_QUERY:
+            # The Hub paginates with a Link header (paginate() follows it)
+            headers["Link"] = (f'<http://{request.headers.get("host")}/api/datasets?search={query.replace(" ", "+")}'
+                               f'&limit={per_page}&page={page + 1}>; rel="next"')
+        return as_json(items, headers)
+
+    async def kaggle(request):
+        failure = await inject("kaggle")
+        if failure:
+            return failure
+        body = json.loads(request.body or b"{}")
+        query = body.get("search", "")
+        page = int(body.get("page") or 1)
+        datasets = results(query, page, 20, lambda name, i: {
+            "ref": f"bench/{name}", "title": name, "url": f"https://www.kaggle.com/datasets/bench/{name}",
+            "downloadCount": 3000 - i, "voteCount": 30 - i})
+        return as_json({"datasets": datasets})
+
+    web = WebServer(host="127.0.0.1", port=0)
+    web.route("GET", "/search/repositories", github)
+    web.route("GET", "/api/datasets", huggingface)
+    web.route("POST", KAGGLE_PATH, kaggle)
+    await web.start()
+    conn.send(web.port)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, conn.recv)
+    await web.stop()
+    conn.send({provider: dict(counts) for provider, counts in counters.items()})
+
+
+# ---------------------------------------------------------
+# Fake Bot API (this process)
+# ---------------------------------------------------------
+
+class FakeBotAPI:
+    """
+    Answers Bot API calls like Telegram and reports each one to a listener.
+    """
+
+    def __init__(self, latency: float, listener):
+        """
+        Args:
+            latency (float): Milliseconds before each answer.
+            listener (Callable[[int, str, dict], None]): Called with (chat id, method, parameters).
+        """
+        self.latency = latency / 1000
+        self.listener = listener
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self.documents = 0
+        self._message_id = 0
+        self.web = None
+
+    async def start(self):
+        from utils.web_server import WebServer
+        # sendDocument bodies carry whole bundles
+        self.web = WebServer(host="127.0.0.1", port=0, max_body=2 * 1024 ** 3)
+        for method in BOT_API_METHODS:
+            self.web.route("POST", f"/bot{TOKEN}/{method}", self._handler(method))
+        await self.web.start()
+
+    async def stop(self):
+        await self.web.stop()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.web.port}/bot"
+
+    def _handler(self, method: str):
+        async def handle(request):
+            from utils.web_server import Response
+            self.calls[method] += 1
+            params = self._params(request)
+            if method == "sendDocument":
+                self.uploaded_bytes += len(request.body)
+                self.documents += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            chat_id = int(params.get("chat_id") or 0)
+            result = self._result(method, chat_id, params)
+            if chat_id:
+                self.listener(chat_id, method, params)
+            return Response(body=json.dumps({"ok": True, "result": result}).encode(),
+                            content_type="application/json")
+        return handle
+
+    @staticmethod
+    def _params(request) -> dict:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/"):
+            # Only the chat is needed from uploads; parsing the file part would cost more than the bot's work
+            match = _CHAT_ID.search(request.body[:4096])
+            return {"chat_id": match.group(1).decode()} if match else {}
+        if content_type.startswith("application/json"):
+            return json.loads(request.body or b"{}")
+        return {name: values[0] for name, values in parse_qs(request.body.decode()).items()}
+
+    def _result(self, method: str, chat_id: int, params: dict):
+        if method == "getMe":
+            return {"id": int(TOKEN.split(":")[0]), "is_bot": True, "first_name": "Load", "username": "load_bot"}
+        if method in ("deleteMessage", "answerCallbackQuery", "sendChatAction"):
+            return True
+        self._message_id += 1
+        message = {"message_id": int(params.get("message_id") or self._message_id), "date": int(time.time()),
+                   "chat": {"id": chat_id, "type": "private"}}
+        if method == "sendDocument":
+            self._message_id += 1
+            message["document"] = {"file_id": f"file-{self._message_id}", "file_unique_id": f"u{self._message_id}",
+                                   "file_name": "bundle.zip"}
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+
+# ---------------------------------------------------------
+# Virtual users
+# ---------------------------------------------------------
+
+def outcome_of(method: str, params: dict, sent_document: bool):
+    """
+    Classifies a Bot API call to a waiting user: an outcome name if it is the
+    final reply to their request, else None (status messages and progress).
+    """
+    if method == "deleteMessage":
+        # A job dismisses its status message once the bundle is out
+        return "document" if sent_document else None
+    if method == "editMessageText":
+        # finish() drops the Cancel button; progress edits keep it
+        return None if params.get("reply_markup") else "job_failed"
+    if method != "sendMessage":
+        return None
+    text = params.get("text", "")
+    if text.startswith("🔍") or "cancel:" in (params.get("reply_markup") or ""):
+        return None
+    if text.startswith("🔎"):
+        return "results"
+    if text.startswith("🚦"):
+        return "throttled"
+    if text.startswith("⏳"):
+        return "busy"
+    return "no_results" if text.startswith("❌ No results") else "error"
+
+
+def percentiles(samples):
+    """
+    Nearest-rank p50/p95/p99 and max of samples, in ms.
+    """
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))]
+
+    return {"n": len(ordered), "p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": ordered[-1]}
+
+
+class LoadDriver:
+    """
+    Closed-loop virtual users feeding message updates into an Application.
+    """
+
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.queries = [f"bench topic {i}" for i in range(args.queries)]
+        self.sent = 0
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        # chat id -> [kind, started, future, sent_document]
+        self.waiting = {}
+
+    def on_call(self, chat_id: int, method: str, params: dict):
+        entry = self.waiting.get(chat_id)
+        if entry is None:
+            return
+        if method == "sendDocument":
+            entry[3] = True
+            return
+        outcome = outcome_of(method, params, entry[3])
+        if outcome is not None and not entry[2].done():
+            entry[2].set_result(outcome)
+
+    def next_message(self):
+        """
+        Returns (kind, text) of the next synthetic message.
+        """
+        scenario = self.args.scenario
+        if scenario == "mlparset" or (scenario == "mixed" and self.rng.random() < self.args.mlparset_share):
+            return "mlparset", "MLparset"
+        return "search", self.rng.choice(self.queries)
+
+    def make_update(self, user_id: int, text: str):
+        from telegram import Update
+        chat = {"id": user_id, "type": "private", "first_name": "Load"}
+        return Update.de_json({
+            "update_id": self.sent,
+            "message": {"message_id": self.sent, "date": int(time.time()), "chat": chat, "text": text,
+                        "from": {"id": user_id, "is_bot": False, "first_name": "Load"}},
+        }, self.app.bot)
+
+    async def user(self, user_id: int):
+        loop = asyncio.get_running_loop()
+        while self.sent < self.args.updates:
+            self.sent += 1
+            kind, text = self.next_message()
+            future = loop.create_future()
+            started = time.perf_counter()
+            self.waiting[user_id] = [kind, started, future, False]
+            await self.app.update_queue.put(self.make_update(user_id, text))
+            try:
+                outcome = await asyncio.wait_for(future, self.args.timeout)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+            finally:
+                del self.waiting[user_id]
+            self.outcomes[outcome] += 1
+            if outcome != "timeout":
+                elapsed = (time.perf_counter() - started) * 1000
+                self.latencies[kind].append(elapsed)
+                self.latencies["all"].append(elapsed)
+            if self.args.think:
+                await asyncio.sleep(self.args.think / 1000)
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        await asyncio.gather(*(self.user(FIRST_USER_ID + i) for i in range(self.args.users)))
+        return time.perf_counter() - started
+
+
+# ---------------------------------------------------------
+# Harness
+# ---------------------------------------------------------
+
+def environment(workdir: str, provider_port: int, args):
+    """
+    Points the bot's configuration at the stubs and keeps its state in workdir.
+    """
+    stub = f"http://127.0.0.1:{provider_port}"
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": TOKEN,
+        "GITHUB_API_URL": stub,
+        "GITHUB_TOKEN": "bench",
+        "HF_ENDPOINT": stub,
+        "HF_TOKEN": "hf_bench",
+        "KAGGLE_USERNAME": "bench",
+        "KAGGLE_KEY": "bench",
+        "KAGGLE_API_ENVIRONMENT": "LOCALHOST",
+        "HTTP_PROXY": stub, "http_proxy": stub,
+        "NO_PROXY": "127.0.0.1", "no_proxy": "127.0.0.1",
+        "CACHE_DIR": os.path.join(workdir, ".cache"),
+        # Nothing to prefetch from the real catalog origins
+        "CATALOG_QUOTA_BYTES": "0",
+        # The stub Bot API takes Content-Length bodies only
+        "STREAM_UPLOADS": "false",
+        "WEBHOOK_URL": "",
+        "WORKERS": "1",
+        "STATE_BACKEND": "memory",
+    })
+    if not args.provider_limits:
+        # Only the stubs' injected 429s throttle
+        for provider in ("KAGGLE", "HF", "GITHUB"):
+            os.environ[f"RATE_LIMIT_{provider}"] = "1000000/1"
+
+
+def populate(folder: str, files: int, size: int, seed: int):
+    """
+    Fills the temp folder MLparset bundles with incompressible files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(folder, f"part-{i:03d}.bin"), "wb") as f:
+            f.write(rng.randbytes(size))
+
+
+def rss_mb() -> float:
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def run_bot(args, driver_box: list) -> dict:
+    """
+    Builds the bot, runs the load against it and returns the raw measurements.
+    """
+    import logging
+    from contextlib import ExitStack
+    from config import Config
+    import main as bot_main
+
+    if args.verbose:
+        from utils.logger import setup_logging
+        setup_logging()
+    else:
+        # Injected failures would log an error (with a traceback) each
+        logging.disable(logging.ERROR)
+
+    api = FakeBotAPI(args.telegram_latency, lambda *call: driver_box[0].on_call(*call))
+    await api.start()
+    # Its port is only known now
+    Config.TELEGRAM_API_URL = api.url
+    try:
+        with ExitStack() as cleanup:
+            app = bot_main.build_app(cleanup)
+            driver = LoadDriver(app, args)
+            driver_box.append(driver)
+            services, jobs = app.bot_data["services"], app.bot_data["jobs"]
+            async with app:
+                await jobs.start()
+                await app.start()
+                # Steady state: SDK imports and authentication are bench_startup.py's business
+                await asyncio.get_running_loop().run_in_executor(None, lambda: services.warm(background=False))
+                watcher = app.bot_data["folder_watcher"]
+                deadline = time.monotonic() + 30
+                # Files written just now are still settling; MLparset would only report them as pending
+                while watcher is not None and watcher.snapshot()[1] and time.monotonic() < deadline:
+                    await asyncio.sleep(0.1)
+                rss_before = rss_mb()
+                try:
+                    elapsed = await driver.run()
+                finally:
+                    await jobs.stop()
+                    await app.stop()
+    finally:
+        await api.stop()
+    return {"elapsed": elapsed, "rss_before": rss_before, "api": api, "driver": driver}
+
+
+def measure(args) -> dict:
+    """
+    Starts the stubs, runs the load and returns the result (JSON-serializable).
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    providers = ctx.Process(target=run_providers, daemon=True, args=(
+        child, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.seed))
+    providers.start()
+    cwd = os.getcwd()
+    try:
+        port = parent.recv()
+        environment(workdir, port, args)
+        # TEMP_DIR (the MLparset folder) follows the working directory
+        os.chdir(workdir)
+        populate(os.path.join(workdir, "temp"), args.files, args.file_kb * 1024, args.seed)
+        driver_box = []
+        raw = asyncio.run(run_bot(args, driver_box))
+        parent.send("stop")
+        provider_stats = parent.recv()
+    finally:
+        os.chdir(cwd)
+        providers.join(timeout=5)
+        if providers.is_alive():
+            providers.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    driver, api = raw["driver"], raw["api"]
+    answered = sum(count for outcome, count in driver.outcomes.items() if outcome != "timeout")
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {name: getattr(args, name) for name in (
+            "scenario", "updates", "users", "queries", "mlparset_share", "files", "file_kb", "latency",
+            "jitter", "error_rate", "throttle_rate", "telegram_latency", "think", "seed")},
+        "elapsed_s": raw["elapsed"],
+        "throughput": answered / raw["elapsed"] if raw["elapsed"] else 0.0,
+        "latency_ms": {kind: percentiles(samples) for kind, samples in driver.latencies.items()},
+        "outcomes": dict(driver.outcomes),
+        "peak_rss_mb": rss_mb(),
+        "rss_before_load_mb": raw["rss_before"],
+        "uploaded_bytes": api.uploaded_bytes,
+        "documents": api.documents,
+        "bot_api_calls": dict(api.calls),
+        "provider_requests": provider_stats,
+    }
+
+
+def lookup(result: dict, key: str):
+    value = result
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def report(result: dict, baseline=None, tolerance: float = 0.2) -> bool:
+    """
+    Prints the result (and its change against baseline); returns False on a regression.
+    """
+    params = result["params"]
+    print(f"Revision {result['revision'] or '?'}, Python {result['python']}: {params['scenario']} scenario, "
+          f"{params['updates']} updates from {params['users']} users")
+    print(f"Providers: {params['latency']}±{params['jitter']} ms, {params['error_rate']:.0%} errors, "
+          f"{params['throttle_rate']:.0%} throttled; Bot API {params['telegram_latency']} ms")
+    print(f"\nAnswered in {result['elapsed_s']:.2f}s: {result['throughput']:,.1f} updates/s")
+    for kind, stats in sorted(result["latency_ms"].items()):
+        if stats["n"]:
+            print(f"  {kind:<9} n={stats['n']:<6} p50={stats['p50']:8.1f}ms  p95={stats['p95']:8.1f}ms  "
+                  f"p99={stats['p99']:8.1f}ms  max={stats['max']:8.1f}ms")
+    print(f"Outcomes:       {result['outcomes']}")
+    print(f"Peak RSS:       {result['peak_rss_mb']:.1f} MB ({result['rss_before_load_mb']:.1f} MB before the load)")
+    print(f"Uploaded:       {result['uploaded_bytes'] / 1024 ** 2:.2f} MB in {result['documents']} documents")
+    print(f"Bot API calls:  {result['bot_api_calls']}")
+    print(f"Provider calls: {result['provider_requests']}")
+
+    if baseline is None:
+        return True
+    if baseline.get("params") != params:
+        print("\nNote: the baseline was run with different parameters; deltas may not be comparable.")
+    print(f"\nAgainst {baseline.get('revision') or 'baseline'} (tolerance {tolerance:.0%}):")
+    ok = True
+    for key, higher_is_better in COMPARED.items():
+        now, then = lookup(result, key), lookup(baseline, key)
+        if now is None or then is None:
+            continue
+        change = (now - then) / then if then else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  <-- regression"
+            ok = False
+        print(f"  {key:<20} {then:12,.1f} -> {now:12,.1f}  ({change:+.1%}){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("search", "mlparset", "mixed"), default="mixed")
+    parser.add_argument("--updates", type=int, default=500, help="Messages to get answered")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--queries", type=int, default=200, help="Distinct search queries")
+    parser.add_argument("--mlparset-share", type=float, default=0.1, help="Mixed: share of MLparset requests")
+    parser.add_argument("--files", type=int, default=20, help="Files in the MLparset temp folder")
+    parser.add_argument("--file-kb", type=int, default=256, help="Size of each of those files in KB")
+    parser.add_argument("--latency", type=float, default=100.0, help="Provider stub latency in ms")
+    parser.add_argument("--jitter", type=float, default=50.0, help="Provider latency jitter (+/- ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of provider requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share answered with 429 Retry-After")
+    parser.add_argument("--telegram-latency", type=float, default=20.0, help="Fake Bot API latency in ms")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause of a user between messages in ms")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request counts as lost")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for messages, files and injected failures")
+    parser.add_argument("--provider-limits", action="store_true",
+                        help="Keep the configured provider rate limits (off: only the stubs throttle)")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's logs")
+    parser.add_argument("--save", help="Write the result as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    result = measure(args)
+    ok = report(result, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
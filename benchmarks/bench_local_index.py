@@ -0,0 +1,98 @@
+"""
+Local search index benchmark.
+
+Harvests a synthetic corpus of provider results (as if the bot had answered
+many searches), then reports index build time, on-disk size, query latency
+percentiles and how many queries would be answered without the live
+providers.
+
+Usage:
+    python benchmarks/bench_local_index.py [--docs 50000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.local_index import LocalIndex  # noqa: E402
+
+TOPICS = [
+    "mnist", "cifar", "imagenet", "titanic", "iris", "housing", "sentiment", "imdb", "squad", "coco",
+    "brain", "tumor", "mri", "covid", "xray", "fraud", "credit", "stock", "weather", "traffic",
+    "speech", "audio", "music", "lyrics", "news", "tweets", "reviews", "recipes", "wine", "diabetes",
+]
+KINDS = ["dataset", "csv", "images", "classification", "segmentation", "corpus", "benchmark", "tabular"]
+PLATFORMS = [("Kaggle", "https://www.kaggle.com/datasets/"), ("HuggingFace", "https://huggingface.co/datasets/"),
+             ("GitHub", "https://github.com/")]
+
+
+def synthetic_batches(docs: int, rng: random.Random, batch: int = 15):
+    """
+    Yields (query, results) pairs like the aggregator feeds the index.
+    """
+    for start in range(0, docs, batch):
+        query = " ".join(rng.sample(TOPICS, rng.randint(1, 2)))
+        results = []
+        for i in range(start, min(start + batch, docs)):
+            platform, base = rng.choice(PLATFORMS)
+            words = query.split() + rng.sample(TOPICS, 1) + rng.sample(KINDS, 2)
+            owner = f"user{rng.randint(1, 5000)}"
+            title = f"{owner}/{'-'.join(words)}-{i}"
+            results.append({"platform": platform, "title": title, "url": f"{base}{title}"})
+        yield query, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50000, help="Documents to harvest")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries to time")
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    workdir = tempfile.mkdtemp(prefix="bench_index_")
+    db_path = os.path.join(workdir, "index.sqlite3")
+    try:
+        index = LocalIndex(db_path=db_path, catalog={})
+        started = time.perf_counter()
+        for query, results in synthetic_batches(args.docs, rng):
+            index.add(results, query)
+        build_seconds = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+
+        queries = []
+        for _ in range(args.queries):
+            words = rng.sample(TOPICS, rng.randint(1, 2))
+            if rng.random() < 0.3:
+                words.append(rng.choice(KINDS)[:4])  # Prefix of a trailing term
+            if rng.random() < 0.1:
+                words = [f"unseen{rng.randint(0, 99)}"]
+            queries.append(" ".join(words))
+
+        latencies = []
+        confident = 0
+        for query in queries:
+            match = index.search(query, limit=15)
+            latencies.append(match.elapsed_ms)
+            confident += match.confident
+        latencies.sort()
+        index.close()
+
+        print(f"Documents:        {args.docs}")
+        print(f"Build:            {build_seconds:.2f}s ({args.docs / build_seconds:,.0f} docs/s)")
+        print(f"Size on disk:     {size / 2**20:.1f} MiB")
+        print(f"Query p50/p95/p99: {statistics.median(latencies):.3f} / "
+              f"{latencies[int(len(latencies) * 0.95)]:.3f} / {latencies[int(len(latencies) * 0.99)]:.3f} ms")
+        print(f"Answered locally: {confident}/{len(queries)} ({confident * 100 / len(queries):.0f}%)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
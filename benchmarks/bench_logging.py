@@ -0,0 +1,146 @@
+"""
+Logging benchmark: what a slow stdout costs the event loop.
+
+Simulated update handlers log in a loop (like download progress) to a pipe
+whose reader drains only --read-kb every --read-interval ms, like a busy log
+collector. Each mode runs in a fresh interpreter:
+- sync: the old setup, a StreamHandler writing to the pipe from the caller;
+- queued: utils.logger.setup_logging() (queue + writer thread), no sampling;
+- sampled: the same with LOG_SAMPLE_BURST repeated records per call site.
+
+Reports handler latency (p50/p99), the slowest single logging call, the
+largest event loop stall (seen by a 1 ms ticker), records dropped or
+suppressed, and how long the writer needed to drain afterwards.
+
+Usage:
+    python benchmarks/bench_logging.py [--handlers 200] [--lines 50]
+    python benchmarks/bench_logging.py --read-kb 4 --read-interval 10 --burst 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("sync", "queued", "sampled")
+
+SLOW_READER = (
+    "import sys, time\n"
+    "size, pause = int(sys.argv[1]), float(sys.argv[2])\n"
+    "while sys.stdin.buffer.read1(size):\n"
+    "    time.sleep(pause)\n"
+)
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def workload(args):
+    """
+    Runs the handlers and a loop ticker; returns (handler ms, slowest call ms, largest stall ms).
+    """
+    log = logging.getLogger("bench")
+    calls, handlers = [], []
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal stall
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, (time.perf_counter() - before) * 1000 - 1)
+
+    async def handler(number: int):
+        started = time.perf_counter()
+        for line in range(args.lines):
+            before = time.perf_counter()
+            log.info(f"⏳ Downloading file-{number}.csv: {line * 100 // args.lines}% at 12.5MB/s")
+            calls.append((time.perf_counter() - before) * 1000)
+            await asyncio.sleep(0)
+        handlers.append((time.perf_counter() - started) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.gather(*(handler(number) for number in range(args.handlers)))
+    done.set()
+    await tick
+    return handlers, max(calls), stall
+
+
+def run_mode(args):
+    """
+    Child interpreter: logs through the chosen setup into the slow pipe; prints a JSON result.
+    """
+    reader = subprocess.Popen([sys.executable, "-c", SLOW_READER, str(args.read_kb * 1024),
+                               str(args.read_interval / 1000)], stdin=subprocess.PIPE)
+    stream = open(reader.stdin.fileno(), "w", encoding="utf-8", closefd=False)
+    stats = {}
+    if args.run == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("[%(asctime)s] [%(levelname)s] [%(name)s] - %(message)s",
+                                               datefmt="%Y-%m-%d %H:%M:%S"))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        os.environ["LOG_SAMPLE_BURST"] = str(args.burst if args.run == "sampled" else 0)
+        from utils.logger import logging_stats, setup_logging, shutdown_logging
+        setup_logging(stream=stream)
+
+    handlers, slowest, stall = asyncio.run(workload(args))
+
+    started = time.perf_counter()
+    if args.run != "sync":
+        stats = logging_stats()
+        shutdown_logging()
+    stream.flush()
+    drain = (time.perf_counter() - started) * 1000
+    reader.stdin.close()
+    reader.wait()
+    print(json.dumps({"p50": statistics.median(handlers), "p99": percentile(handlers, 0.99),
+                      "slowest_call": slowest, "stall": stall, "drain": drain,
+                      "dropped": stats.get("dropped", 0), "suppressed": stats.get("suppressed", 0)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, default=200, help="Concurrent simulated handlers")
+    parser.add_argument("--lines", type=int, default=50, help="Records each handler logs")
+    parser.add_argument("--read-kb", type=int, default=4, help="KB the slow reader takes per read")
+    parser.add_argument("--read-interval", type=float, default=5.0, help="ms the slow reader pauses between reads")
+    parser.add_argument("--burst", type=int, default=20, help="Sampled mode: LOG_SAMPLE_BURST")
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args)
+        return
+
+    print(f"{args.handlers} handlers x {args.lines} records; reader drains {args.read_kb} KB "
+          f"every {args.read_interval} ms")
+    print(f"{'mode':<8} {'handler p50':>12} {'p99':>10} {'slowest call':>13} {'loop stall':>11} "
+          f"{'dropped':>8} {'suppressed':>10} {'drain':>9}")
+    passthrough = [f"--{name.replace('_', '-')}={getattr(args, name)}"
+                   for name in ("handlers", "lines", "read_kb", "read_interval", "burst")]
+    for mode in MODES:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", mode, *passthrough],
+                              cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode:<8} {result['p50']:10.1f}ms {result['p99']:8.1f}ms {result['slowest_call']:11.2f}ms "
+              f"{result['stall']:9.1f}ms {result['dropped']:8d} {result['suppressed']:10d} {result['drain']:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Startup benchmark.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and
+reports the wall time until the bot module is importable, the import time of
+main and where it goes (self time summed per top-level package). A separate
+cold interpreter then times the provider warm-up (SDK imports and
+authentication) that now happens after the bot is already taking updates.
+
+Results can be saved as a JSON baseline and compared against later, to
+track startup across versions.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 12]
+    python benchmarks/bench_startup.py --save startup-v1.json
+    python benchmarks/bench_startup.py --compare startup-v1.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (.*)$")
+
+WARM_SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "from services.registry import ServiceRegistry; ServiceRegistry().warm(background=False); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def environment():
+    """
+    Environment for the child interpreters (a dummy token so main imports cleanly).
+    """
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def parse_importtime(stderr: str):
+    """
+    Parses -X importtime output into (module, self_us, cumulative_us) tuples.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            rows.append((match.group(3).strip(), int(match.group(1)), int(match.group(2))))
+    return rows
+
+
+def run_import(env) -> dict:
+    """
+    Imports main in a fresh interpreter; returns wall, main and per-package times in ms.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    packages = defaultdict(float)
+    for module, self_us, _ in rows:
+        packages[module.split(".")[0]] += self_us / 1000
+    main_ms = next((cumulative / 1000 for module, _, cumulative in rows if module == "main"), 0.0)
+    return {"wall_ms": wall, "main_ms": main_ms, "packages": dict(packages),
+            "modules": len(rows)}
+
+
+def run_warmup(env) -> float:
+    """
+    Times ServiceRegistry().warm() in a cold interpreter, in ms.
+    """
+    proc = subprocess.run([sys.executable, "-c", WARM_SNIPPET], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"warm-up failed:\n{proc.stderr[-2000:]}")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def measure(runs: int) -> dict:
+    """
+    Runs the import benchmark runs times plus one warm-up; returns medians.
+    """
+    env = environment()
+    samples = [run_import(env) for _ in range(runs)]
+    packages = defaultdict(list)
+    for sample in samples:
+        for name, ms in sample["packages"].items():
+            packages[name].append(ms)
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "wall_ms": statistics.median(sample["wall_ms"] for sample in samples),
+        "main_import_ms": statistics.median(sample["main_ms"] for sample in samples),
+        "modules": samples[-1]["modules"],
+        "warmup_ms": run_warmup(env),
+        "packages": {name: statistics.median(values) for name, values in packages.items()},
+    }
+
+
+def report(result: dict, top: int, baseline=None):
+    def delta(key):
+        if baseline is None or key not in baseline:
+            return ""
+        return f"  ({result[key] - baseline[key]:+,.1f} ms vs {baseline.get('revision') or 'baseline'})"
+
+    print(f"Revision {result['revision'] or '?'}, Python {result['python']}, median of {result['runs']} runs")
+    print(f"Interpreter start + import main: {result['wall_ms']:8.1f} ms{delta('wall_ms')}")
+    print(f"import main (cumulative):        {result['main_import_ms']:8.1f} ms{delta('main_import_ms')}")
+    print(f"Modules imported:                {result['modules']:8d}")
+    print(f"Deferred provider warm-up:       {result['warmup_ms']:8.1f} ms{delta('warmup_ms')}")
+    print("\nSlowest packages (self time, ms):")
+    previous = (baseline or {}).get("packages", {})
+    for name, ms in sorted(result["packages"].items(), key=lambda item: item[1], reverse=True)[:top]:
+        change = f"  ({ms - previous[name]:+.1f})" if name in previous else ""
+        print(f"  {name:<28} {ms:8.1f}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=12, help="Packages to list")
+    parser.add_argument("--save", help="Write the result as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    result = measure(args.runs)
+    report(result, args.top, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Fake Telegram client for the webhook server.
+
+Posts synthetic message updates to a webhook over keep-alive connections,
+the way Telegram does, and reports acknowledgement latency. While it runs, a
+slow client holds a half-sent request open and GET / is probed, to show neither
+blocks the webhook.
+
+Without --url it runs a self-contained test: the bot's WebServer and webhook
+handler with a real Application whose handler sleeps (a slow search) and
+replies through a local fake Bot API, so nothing leaves the machine. It
+checks that every update is answered and that no more than
+--update-concurrency handlers ran at once.
+
+Usage:
+    python benchmarks/webhook_client.py [--updates 2000] [--connections 40] [--update-concurrency 64]
+    python benchmarks/webhook_client.py --url http://localhost:10000/telegram --secret <WEBHOOK_SECRET>
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import ApplicationBuilder, MessageHandler, filters  # noqa: E402
+from handlers.webhook_handler import webhook_handler  # noqa: E402
+from utils.web_server import Response, WebServer  # noqa: E402
+
+TOKEN = "123456:TEST"
+SECRET = "local-test-secret"
+
+
+def make_update(update_id: int) -> bytes:
+    """
+    A private text message update like Telegram sends.
+    """
+    chat = {"id": 1000 + update_id % 50, "type": "private", "first_name": "Load"}
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": chat,
+            "from": {"id": chat["id"], "is_bot": False, "first_name": "Load"},
+            "text": f"mnist {update_id}",
+        },
+    }).encode()
+
+
+async def request(reader, writer, host: str, method: str, path: str, body: bytes = b"", headers=None):
+    """
+    Sends one HTTP/1.1 request on a keep-alive connection and returns (status, body).
+    """
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(head[0].split()[1])
+    length = next((int(line.split(":", 1)[1]) for line in head if line.lower().startswith("content-length:")), 0)
+    return status, await reader.readexactly(length)
+
+
+async def post_updates(url: str, secret: str, updates: int, connections: int):
+    """
+    Posts updates over parallel keep-alive connections; returns (latencies, status counts).
+    """
+    target = urlsplit(url)
+    queue = asyncio.Queue()
+    for update_id in range(1, updates + 1):
+        queue.put_nowait(update_id)
+    latencies, statuses = [], {}
+    headers = {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret}
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(target.hostname, target.port or 80)
+        try:
+            while not queue.empty():
+                update_id = queue.get_nowait()
+                started = time.perf_counter()
+                status, _ = await request(reader, writer, target.netloc, "POST", target.path,
+                                          make_update(update_id), headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    return latencies, statuses
+
+
+async def slow_client(host: str, port: int, stop: asyncio.Event):
+    """
+    Holds a connection with a half-sent request (until the server times it out or stop is set).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"POST /telegram HTTP/1.1\r\nHost: slow\r\n")
+    await writer.drain()
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=60)
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+
+
+async def probe_health(host: str, port: int, stop: asyncio.Event):
+    """
+    Probes GET / every 50 ms until stop is set; returns latencies in ms.
+    """
+    latencies = []
+    while not stop.is_set():
+        reader, writer = await asyncio.open_connection(host, port)
+        started = time.perf_counter()
+        await request(reader, writer, f"{host}:{port}", "GET", "/")
+        latencies.append((time.perf_counter() - started) * 1000)
+        writer.close()
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        print(f"{name}: no samples")
+        return
+    print(f"{name}: n={len(latencies)} p50={statistics.median(latencies):.2f}ms "
+          f"p95={latencies[int(len(latencies) * 0.95)]:.2f}ms max={latencies[-1]:.2f}ms")
+
+
+async def against(url: str, secret: str, args):
+    """
+    Drives an already running webhook server.
+    """
+    target = urlsplit(url)
+    stop = asyncio.Event()
+    slow = asyncio.create_task(slow_client(target.hostname, target.port or 80, stop))
+    probes = asyncio.create_task(probe_health(target.hostname, target.port or 80, stop))
+    started = time.perf_counter()
+    latencies, statuses = await post_updates(url, secret, args.updates, args.connections)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    health = await probes
+    await slow
+
+    print(f"Posted {args.updates} updates over {args.connections} connections in {elapsed:.2f}s "
+          f"({args.updates / elapsed:,.0f}/s); statuses {statuses}")
+    report("Webhook ack", latencies)
+    report("Health probe", health)
+
+
+async def self_test(args):
+    """
+    Runs the webhook server, an Application and a fake Bot API in-process.
+    """
+    # Fake Bot API: getMe plus sendMessage echoes
+    sent = []
+    api = WebServer(host="127.0.0.1", port=0)
+
+    async def get_me(request):
+        return Response(body=json.dumps({"ok": True, "result": {
+            "id": 123456, "is_bot": True, "first_name": "Test", "username": "test_bot"}}).encode(),
+            content_type="application/json")
+
+    async def send_message(request):
+        sent.append(time.perf_counter())
+        return Response(body=json.dumps({"ok": True, "result": {
+            "message_id": len(sent), "date": int(time.time()), "chat": {"id": 1, "type": "private"},
+            "text": "ok"}}).encode(), content_type="application/json")
+
+    for method in ("GET", "POST"):
+        api.route(method, f"/bot{TOKEN}/getMe", get_me)
+        api.route(method, f"/bot{TOKEN}/sendMessage", send_message)
+    await api.start()
+
+    running = peak = 0
+
+    async def slow_search(update, context):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(args.handler_delay)
+            await update.message.reply_text("results")
+        finally:
+            running -= 1
+
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api.port}/bot")
+        .concurrent_updates(args.update_concurrency)
+        .connection_pool_size(args.update_concurrency + 8)
+        .updater(None)
+        .build()
+    )
+    app.add_handler(MessageHandler(filters.TEXT, slow_search))
+
+    web = WebServer(host="127.0.0.1", port=0, request_timeout=2)
+    web.route("GET", "/", health)
+    web.route("POST", "/telegram", webhook_handler(app, secret=SECRET))
+
+    async with app:
+        await app.start()
+        await web.start()
+        try:
+            started = time.perf_counter()
+            await against(f"http://127.0.0.1:{web.port}/telegram", SECRET, args)
+            # Wait for the handlers to drain
+            deadline = time.monotonic() + 60
+            while len(sent) < args.updates and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+
+            bad = await post_bad_secret(web.port)
+            print(f"Replies sent:     {len(sent)}/{args.updates} in {elapsed:.2f}s "
+                  f"(handler delay {args.handler_delay}s)")
+            print(f"Peak concurrency: {peak} (limit {args.update_concurrency})")
+            print(f"Wrong secret:     HTTP {bad}")
+            print(f"Server stats:     {web.stats()}")
+            ok = len(sent) == args.updates and peak <= args.update_concurrency and bad == 403
+            print("OK" if ok else "FAILED")
+        finally:
+            await web.stop()
+            await app.stop()
+            await api.stop()
+
+
+async def health(request):
+    return Response(body=b"Bot is running.")
+
+
+async def post_bad_secret(port: int) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    status, _ = await request(reader, writer, "127.0.0.1", "POST", "/telegram", make_update(0),
+                              {"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+    writer.close()
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Webhook URL of a running bot (self-test if omitted)")
+    parser.add_argument("--secret", default=SECRET, help="X-Telegram-Bot-Api-Secret-Token to send")
+    parser.add_argument("--updates", type=int, default=2000, help="Updates to post")
+    parser.add_argument("--connections", type=int, default=40, help="Parallel keep-alive connections")
+    parser.add_argument("--update-concurrency", type=int, default=64, help="Self-test: concurrent update limit")
+    parser.add_argument("--handler-delay", type=float, default=0.2, help="Self-test: seconds each handler sleeps")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(against(args.url, args.secret, args))
+    else:
+        asyncio.run(self_test(args))
+
+
+if __name__ == "__main__":
+    main()
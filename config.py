@@ -3,8 +3,10 @@ Configuration management for the Telegram Bot.
 
 This module loads environment variables, defines constants, and 
 validates the runtime configuration to ensure the bot can start safely.
+Importing it has no side effects; the entry point calls Config.validate().
 """
 
+import hashlib
 import os
 import logging
 from dotenv import load_dotenv
@@ -18,18 +20,104 @@ class Config:
     
     Attributes:
         TELEGRAM_BOT_TOKEN (str): The Telegram Bot API token.
+        TELEGRAM_API_URL (str): Bot API base URL the token is appended to (a local Bot API server, or a test double).
         KAGGLE_USERNAME (str): Kaggle username for API authentication.
         KAGGLE_KEY (str): Kaggle API key.
         HF_TOKEN (str): HuggingFace API token.
         GITHUB_TOKEN (str): GitHub Personal Access Token.
         BASE_DIR (str): The absolute path to the project root.
         TEMP_DIR (str): The directory for temporary files (and zips).
+        SEARCH_MAX_WORKERS (int): Thread pool size for concurrent provider searches.
+        SEARCH_PROVIDER_TIMEOUT (float): Per-provider search deadline in seconds.
+        SEARCH_PAGE_SIZE (int): Results per page of search replies (and per provider request when paging).
+        CURSOR_TTL (float): Seconds an idle "Next" button keeps its search cursor.
+        CURSOR_MAX_ENTRIES (int): Maximum number of open search cursors.
+        CACHE_TTL (float): Seconds a cached search result stays fresh.
+        CACHE_STALE_TTL (float): Extra seconds an expired result is served while it refreshes.
+        CACHE_MAX_ENTRIES (int): Maximum number of in-memory cached searches.
+        CACHE_MAX_BYTES (int): Maximum serialized size of the in-memory cache.
+        CACHE_DB_PATH (str): Optional SQLite file that persists the cache across restarts.
+        HTTP_POOL_CONNECTIONS (int): Number of per-host connection pools kept by the shared session.
+        HTTP_POOL_MAXSIZE (int): Maximum keep-alive connections per host.
+        HTTP_MAX_RETRIES (int): Retries on connection errors and 5xx responses (429s go to the rate limiter).
+        HTTP_BACKOFF_FACTOR (float): Exponential backoff base between retries.
+        GITHUB_API_URL (str): Base URL of the GitHub REST API.
+        RATE_LIMITS (dict): Provider key -> "count/seconds" request budget.
+        RATE_LIMIT_MAX_WAIT (float): Longest a request is queued for a token before it is shed.
+        CACHE_DIR (str): Root directory for on-disk caches.
+        BUNDLE_CACHE_DIR (str): Where the cached MLparset bundle is kept.
+        COMPRESSION_ENTROPY_THRESHOLD (float): Sampled bits/byte above which members are stored.
+        COMPRESSION_SMALL_LIMIT (int): Files below this size are deflated at the small-file level.
+        COMPRESSION_LARGE_LIMIT (int): Files at or above this size are deflated at the large-file level.
+        COMPRESSION_LEVELS (tuple): Deflate levels for (small, medium, large) files.
+        TAR_XZ_PRESET (int): xz preset for opt-in tar bundles.
+        TAR_ZSTD_LEVEL (int): zstd level for opt-in tar bundles.
+        ARCHIVE_MAX_WORKERS (int): Cap on concurrent compression threads (shared by all builds).
+        ARCHIVE_BLOCK_SIZE (int): Files larger than this are deflated as parallel blocks.
+        UPLOAD_REGISTRY_PATH (str): SQLite file mapping content hashes to Telegram file_ids.
+        TELEGRAM_UPLOAD_LIMIT (int): Largest document the bot uploads in one piece.
+        CHUNK_SIZE (int): Part size for split files (defaults to TELEGRAM_UPLOAD_LIMIT).
+        STREAM_UPLOADS (bool): Compress the MLparset bundle straight into the upload request.
+        STREAM_UPLOAD_TIMEOUT (float): Read timeout for a streamed upload's response.
+        DOWNLOAD_SEGMENTS (int): Maximum parallel Range segments per download.
+        DOWNLOAD_MIN_SEGMENT (int): Smallest segment worth its own connection.
+        DOWNLOAD_MAX_WORKERS (int): Cap on segment connections across all downloads.
+        DOWNLOAD_RETRIES (int): Attempts per segment after a dropped connection.
+        DOWNLOAD_CONNECT_TIMEOUT (float): Connect timeout for downloads, in seconds.
+        DOWNLOAD_READ_TIMEOUT (float): Read timeout for downloads, in seconds.
+        DOWNLOAD_PROGRESS_INTERVAL (float): Seconds between progress logs (and resume checkpoints).
+        CATALOG_STORE_DIR (str): Content-addressed store for mirrored DATASETS files.
+        CATALOG_QUOTA_BYTES (int): Disk quota for the catalog store (LRU eviction above it).
+        CATALOG_REFRESH_INTERVAL (float): Seconds between background catalog revalidations.
+        LOCAL_INDEX_ENABLED (bool): Answer confident matches from the local full-text index.
+        LOCAL_INDEX_PATH (str): SQLite FTS5 file for the local index.
+        LOCAL_INDEX_MIN_RESULTS (int): Fresh full matches needed to skip the live providers.
+        LOCAL_INDEX_MAX_AGE (float): Seconds a harvested result counts as fresh (CACHE_TTL when only past query keywords match).
+        PORT (int): Port of the bot's HTTP server (health, stats and the webhook).
+        WEBHOOK_URL (str): Public base URL; when set the bot runs in webhook mode instead of polling.
+        WEBHOOK_PATH (str): Path Telegram posts updates to.
+        WEBHOOK_SECRET (str): Secret Telegram echoes in X-Telegram-Bot-Api-Secret-Token (derived from the token if unset).
+        WEBHOOK_MAX_CONNECTIONS (int): Concurrent webhook connections Telegram may open (1-100).
+        UPDATE_CONCURRENCY (int): Updates processed concurrently by the bot.
+        WEB_MAX_CONNECTIONS (int): Open client connections the HTTP server accepts before answering 503.
+        WEB_REQUEST_TIMEOUT (float): Seconds a client gets to send a request (also the keep-alive idle limit).
+        WEB_MAX_BODY (int): Largest request body the HTTP server accepts.
+        LOOP_LAG_INTERVAL (float): Seconds between event loop lag samples.
+        HEALTH_MAX_LOOP_LAG (float): Event loop lag above which /healthz reports unhealthy.
+        HEALTH_ERROR_WINDOW (float): Seconds a failed provider call marks the provider as failing on /healthz.
+        SERVICE_WARMUP (bool): Import and authenticate the provider SDKs in the background right after startup.
+        JOB_WORKERS (int): Background jobs (bundle builds, uploads) run concurrently.
+        JOB_MAX_PER_USER (int): Jobs a user may have waiting in the queue.
+        JOB_PROGRESS_INTERVAL (float): Seconds between elapsed-time edits of a job's status message.
+        WATCH_ENABLED (bool): Watch TEMP_DIR and prebuild the MLparset bundle after changes settle.
+        WATCH_BACKEND (str): "auto" (inotify if available), "inotify" or "poll".
+        WATCH_SETTLE (float): Seconds a file must stay unchanged before it is bundled.
+        WATCH_POLL_INTERVAL (float): Seconds between folder scans when polling.
+        WORKERS (int): Bot worker processes; above 1, a supervisor partitions updates by chat id.
+        WORKER_QUEUE_SIZE (int): Updates buffered per worker before the supervisor pushes back.
+        WORKER_RESTART_BACKOFF (float): Longest wait before restarting a crashed worker.
+        WORKER_HEARTBEAT_TIMEOUT (float): Seconds without a heartbeat after which a worker is killed and restarted.
+        STATE_BACKEND (str): Shared state backend: "auto", "memory", "sqlite" or "module:Class".
+        STATE_DB_PATH (str): SQLite file of the "sqlite" state backend.
+        STATE_LOCK_TIMEOUT (float): Seconds to wait for another process's write lock on the state file.
+        LOG_LEVEL (str): Root log level.
+        LOG_FORMAT (str): "json" (one object per line) or "text".
+        LOG_QUEUE_SIZE (int): Records buffered for the log writer thread before new ones are dropped.
+        LOG_SAMPLE_BURST (int): Records below WARNING one logging call site may emit per window (0: no sampling).
+        LOG_SAMPLE_WINDOW (float): Sampling window in seconds.
+        ADMIN_USER_IDS (frozenset): Telegram user ids allowed to use /profile (empty: the command is off).
+        PROFILE_TOKEN (str): Token for the /debug/* profiling routes on the HTTP port (empty: the routes are off).
+        PROFILE_DIR (str): Where profiles, memory snapshots and task dumps are written.
+        PROFILE_MAX_SECONDS (float): Longest CPU profile allowed.
+        PROFILE_SAMPLE_INTERVAL (float): Seconds between stack samples of the sampling profiler.
+        PROFILE_TRACEMALLOC_FRAMES (int): Frames tracemalloc keeps per allocation while tracing.
     """
     
     # ---------------------------
     # Bot Configuration
     # ---------------------------
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
     
     # ---------------------------
     # API Credentials
@@ -44,6 +132,179 @@ class Config:
     # ---------------------------
     BASE_DIR = os.getcwd()
     TEMP_DIR = os.path.join(BASE_DIR, "temp")
+
+    # ---------------------------
+    # Search Fan-out
+    # ---------------------------
+    SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "8"))
+    SEARCH_PROVIDER_TIMEOUT = float(os.getenv("SEARCH_PROVIDER_TIMEOUT", "8.0"))
+
+    # ---------------------------
+    # Search Pagination
+    # ---------------------------
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+    CURSOR_TTL = float(os.getenv("CURSOR_TTL", "900"))
+    CURSOR_MAX_ENTRIES = int(os.getenv("CURSOR_MAX_ENTRIES", "512"))
+
+    # ---------------------------
+    # Search Result Cache
+    # ---------------------------
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "900"))
+    CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "3600"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+
+    # ---------------------------
+    # Shared HTTP Client
+    # ---------------------------
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+    GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+    # ---------------------------
+    # Provider Rate Limits
+    # ---------------------------
+    # GitHub search allows 30 req/min with a token and 10 req/min without
+    RATE_LIMITS = {
+        "kaggle": os.getenv("RATE_LIMIT_KAGGLE", "60/60"),
+        "hf": os.getenv("RATE_LIMIT_HF", "300/300"),
+        "github": os.getenv("RATE_LIMIT_GITHUB", "30/60" if GITHUB_TOKEN else "10/60"),
+    }
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "2.0"))
+
+    # ---------------------------
+    # MLparset Bundle Cache
+    # ---------------------------
+    CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+    BUNDLE_CACHE_DIR = os.path.join(CACHE_DIR, "bundles")
+    UPLOAD_REGISTRY_PATH = os.getenv("UPLOAD_REGISTRY_PATH", os.path.join(CACHE_DIR, "uploads.sqlite3"))
+
+    # ---------------------------
+    # Compression Policy
+    # ---------------------------
+    COMPRESSION_ENTROPY_THRESHOLD = float(os.getenv("COMPRESSION_ENTROPY_THRESHOLD", "7.5"))
+    COMPRESSION_SMALL_LIMIT = int(os.getenv("COMPRESSION_SMALL_LIMIT", str(1024 * 1024)))
+    COMPRESSION_LARGE_LIMIT = int(os.getenv("COMPRESSION_LARGE_LIMIT", str(64 * 1024 * 1024)))
+    COMPRESSION_LEVELS = tuple(int(level) for level in os.getenv("COMPRESSION_LEVELS", "9,6,3").split(","))
+    TAR_XZ_PRESET = int(os.getenv("TAR_XZ_PRESET", "6"))
+    TAR_ZSTD_LEVEL = int(os.getenv("TAR_ZSTD_LEVEL", "10"))
+    ARCHIVE_MAX_WORKERS = int(os.getenv("ARCHIVE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+    ARCHIVE_BLOCK_SIZE = int(os.getenv("ARCHIVE_BLOCK_SIZE", str(16 * 1024 * 1024)))
+
+    # ---------------------------
+    # Uploads
+    # ---------------------------
+    # Bot API caps uploads at 50 MB; stay under it (raise when using a local Bot API server)
+    TELEGRAM_UPLOAD_LIMIT = int(os.getenv("TELEGRAM_UPLOAD_LIMIT", str(49 * 1024 * 1024)))
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", str(TELEGRAM_UPLOAD_LIMIT)))
+    STREAM_UPLOADS = os.getenv("STREAM_UPLOADS", "false").lower() in ("1", "true", "yes")
+    STREAM_UPLOAD_TIMEOUT = float(os.getenv("STREAM_UPLOAD_TIMEOUT", "300"))
+
+    # ---------------------------
+    # Downloads
+    # ---------------------------
+    DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", "4"))
+    DOWNLOAD_MIN_SEGMENT = int(os.getenv("DOWNLOAD_MIN_SEGMENT", str(8 * 1024 * 1024)))
+    DOWNLOAD_MAX_WORKERS = int(os.getenv("DOWNLOAD_MAX_WORKERS", "8"))
+    DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+    DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+    DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+    DOWNLOAD_PROGRESS_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_INTERVAL", "5"))
+
+    # ---------------------------
+    # Catalog Mirror
+    # ---------------------------
+    CATALOG_STORE_DIR = os.getenv("CATALOG_STORE_DIR", os.path.join(CACHE_DIR, "catalog"))
+    CATALOG_QUOTA_BYTES = int(os.getenv("CATALOG_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+    CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", str(6 * 3600)))
+
+    # ---------------------------
+    # Local Search Index
+    # ---------------------------
+    LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+    LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(CACHE_DIR, "search_index.sqlite3"))
+    LOCAL_INDEX_MIN_RESULTS = int(os.getenv("LOCAL_INDEX_MIN_RESULTS", "5"))
+    LOCAL_INDEX_MAX_AGE = float(os.getenv("LOCAL_INDEX_MAX_AGE", str(7 * 24 * 3600)))
+
+    # ---------------------------
+    # HTTP Server & Webhook
+    # ---------------------------
+    # Render sets PORT automatically
+    PORT = int(os.getenv("PORT", "10000"))
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or (
+        hashlib.sha256(TELEGRAM_BOT_TOKEN.encode()).hexdigest() if TELEGRAM_BOT_TOKEN else ""
+    )
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+    WEB_MAX_CONNECTIONS = int(os.getenv("WEB_MAX_CONNECTIONS", "256"))
+    WEB_REQUEST_TIMEOUT = float(os.getenv("WEB_REQUEST_TIMEOUT", "10"))
+    WEB_MAX_BODY = int(os.getenv("WEB_MAX_BODY", str(1024 * 1024)))
+
+    # ---------------------------
+    # Metrics & Health
+    # ---------------------------
+    LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+    HEALTH_MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "2.0"))
+    HEALTH_ERROR_WINDOW = float(os.getenv("HEALTH_ERROR_WINDOW", "300"))
+
+    # ---------------------------
+    # Startup
+    # ---------------------------
+    # Off: provider SDKs load on the first search that needs them
+    SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "true").lower() in ("1", "true", "yes")
+
+    # ---------------------------
+    # Background Jobs
+    # ---------------------------
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_PER_USER = int(os.getenv("JOB_MAX_PER_USER", "3"))
+    JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "5"))
+
+    # ---------------------------
+    # Temp Folder Watcher
+    # ---------------------------
+    WATCH_ENABLED = os.getenv("WATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+    WATCH_BACKEND = os.getenv("WATCH_BACKEND", "auto")
+    WATCH_SETTLE = float(os.getenv("WATCH_SETTLE", "2.0"))
+    WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
+
+    # ---------------------------
+    # Workers & Shared State
+    # ---------------------------
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+    WORKER_RESTART_BACKOFF = float(os.getenv("WORKER_RESTART_BACKOFF", "30"))
+    WORKER_HEARTBEAT_TIMEOUT = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "30"))
+    # "auto": sqlite with several workers, memory with one
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "auto")
+    STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(CACHE_DIR, "state.sqlite3"))
+    STATE_LOCK_TIMEOUT = float(os.getenv("STATE_LOCK_TIMEOUT", "5"))
+
+    # ---------------------------
+    # Logging
+    # ---------------------------
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+    LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "10"))
+
+    # ---------------------------
+    # Profiling (on demand; idle unless an admin asks)
+    # ---------------------------
+    ADMIN_USER_IDS = frozenset(
+        int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").replace(" ", "").split(",") if user_id
+    )
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+    PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
     
     @classmethod
     def validate(cls):
@@ -65,10 +326,3 @@ class Config:
             os.makedirs(cls.TEMP_DIR, exist_ok=True)
         except OSError as e:
             raise ValueError(f"Failed to create TEMP_DIR at {cls.TEMP_DIR}: {e}")
-
-# Run validation on import to fail fast during startup
-try:
-    Config.validate()
-except Exception as e:
-    # Print is used here because logger might not be initialized yet
-    print(f"CRITICAL CONFIGURATION ERROR: {e}")
@@ -0,0 +1,136 @@
+"""
+Admin access to the Profiler (utils.profiling): a bot command and HTTP routes.
+
+/profile is answered only for ADMIN_USER_IDS (anyone else gets no reply, so
+the command stays invisible); the summary comes back as a message and the
+full result as a document:
+    /profile cpu [seconds] [sample|cprofile]
+    /profile mem start|snapshot|stop
+    /profile tasks
+
+The /debug/* routes on the HTTP port require PROFILE_TOKEN, as
+"Authorization: Bearer <token>" or ?token=, and answer with the summary and
+the path of the written file:
+    GET /debug/profile?seconds=10&mode=sample
+    GET /debug/memory?action=snapshot
+    GET /debug/tasks
+"""
+
+import hmac
+import logging
+from typing import Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import Config
+from utils.profiling import CPU_MODES, ProfileResult, Profiler, ProfilerBusy
+from utils.web_server import Handler, Request, Response, WebServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECONDS = 10.0
+# Telegram caps messages at 4096 characters
+MAX_SUMMARY_CHARS = 3500
+
+USAGE = (
+    "Usage:\n"
+    "/profile cpu [seconds] [sample|cprofile]\n"
+    "/profile mem start|snapshot|stop\n"
+    "/profile tasks"
+)
+
+
+async def handle_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles /profile for admins: runs the requested profile and sends the result back.
+
+    Args:
+        update (Update): The Telegram update object.
+        context (ContextTypes.DEFAULT_TYPE): The callback context (context.args holds the subcommand).
+    """
+    user = update.effective_user
+    if user is None or user.id not in Config.ADMIN_USER_IDS or update.message is None:
+        return
+    profiler = context.bot_data.get("profiler")
+    if profiler is None:
+        await update.message.reply_text("❌ Profiling is not configured.")
+        return
+
+    args = context.args or []
+    kind = args[0].lower() if args else ""
+    logger.info(f"🔬 Admin {user.id} requested /profile {' '.join(args)}")
+    try:
+        if kind == "cpu":
+            seconds = float(args[1]) if len(args) > 1 else DEFAULT_SECONDS
+            mode = args[2].lower() if len(args) > 2 else CPU_MODES[0]
+            await update.message.reply_text(f"🔬 Profiling CPU ({mode}) for {min(seconds, profiler.max_seconds):g}s...")
+            result = await profiler.profile_cpu(seconds, mode)
+        elif kind == "mem":
+            result = await profiler.memory(args[1].lower() if len(args) > 1 else "snapshot")
+        elif kind == "tasks":
+            result = profiler.dump_tasks()
+        else:
+            await update.message.reply_text(USAGE, parse_mode=None)
+            return
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\n\n{USAGE}", parse_mode=None)
+        return
+    except ProfilerBusy as e:
+        await update.message.reply_text(f"⏳ {e}.")
+        return
+
+    await update.message.reply_text(_truncate(result.summary), parse_mode=None)
+    if result.path:
+        with open(result.path, "rb") as f:
+            await update.message.reply_document(document=f, caption=result.path)
+
+
+def profile_routes(web: WebServer, profiler: Profiler, token: Optional[str] = None):
+    """
+    Registers the /debug/* routes on web (only call this when a token is configured).
+
+    Args:
+        web (WebServer): The HTTP server.
+        profiler (Profiler): This process's profiler.
+        token (Optional[str]): Required token (defaults to Config.PROFILE_TOKEN).
+    """
+    expected = (token or Config.PROFILE_TOKEN).encode()
+
+    def guarded(run) -> Handler:
+        async def handle(request: Request) -> Response:
+            header = request.headers.get("authorization", "")
+            provided = header[7:] if header.lower().startswith("bearer ") else request.query.get("token", [""])[0]
+            if not expected or not hmac.compare_digest(provided.encode(), expected):
+                return Response(403, b"Forbidden")
+            try:
+                result = await run(request)
+            except ValueError as e:
+                return Response(400, f"{e}\n".encode())
+            except ProfilerBusy as e:
+                return Response(409, f"{e}\n".encode())
+            return Response(body=_render(result).encode())
+        return handle
+
+    async def cpu(request: Request) -> ProfileResult:
+        seconds = float(request.query.get("seconds", [str(DEFAULT_SECONDS)])[0])
+        return await profiler.profile_cpu(seconds, request.query.get("mode", [CPU_MODES[0]])[0])
+
+    async def memory(request: Request) -> ProfileResult:
+        return await profiler.memory(request.query.get("action", ["snapshot"])[0])
+
+    async def tasks(request: Request) -> ProfileResult:
+        return profiler.dump_tasks()
+
+    web.route("GET", "/debug/profile", guarded(cpu))
+    web.route("GET", "/debug/memory", guarded(memory))
+    web.route("GET", "/debug/tasks", guarded(tasks))
+
+
+def _render(result: ProfileResult) -> str:
+    written = f"Written to {result.path}\n\n" if result.path else ""
+    return f"{written}{result.summary}\n"
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_SUMMARY_CHARS:
+        return text
+    return text[:MAX_SUMMARY_CHARS] + "\n... (see the attached file)"
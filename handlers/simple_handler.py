@@ -2,21 +2,42 @@
 Core request handlers for the Telegram Bot.
 
 This module implements the two Main Modes of the bot:
-1. Mode 1 (MLparset): Zips and sends contents of the temp folder.
+1. Mode 1 (MLparset): Zips and sends contents of the temp folder
+   ("MLparset xz" / "MLparset zstd" opt into a compressed tar bundle instead).
+   A DATASETS catalog keyword (e.g. "Titanic") sends that entry's files from the local mirror.
+   Both run as background jobs (fair per-user queue, progress edits, Cancel button).
 2. Mode 2 (Search): Performs dataset searches across multiple platforms.
+   Replies carry a "Next" button that pages through further results lazily.
 """
 
 import os
+import asyncio
+import functools
 import logging
-import zipfile
 import tempfile
-import shutil
-from telegram import Update
+from typing import Any, Dict, List, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from config import Config
+from utils.bundle_cache import ManifestItem, manifest_digest, scan_folder
+from services.local_index import CATALOG_PLATFORM
+from utils.archive import stream_zip
+from utils.compression import TAR_CODECS, CompressionPolicy, available_tar_codecs, build_tar_bundle, tar_extension
+from utils.jobs import PRIORITY_BULK, PRIORITY_INTERACTIVE, Job, QueueFull
+from utils.metrics import BYTES_SENT, STAGE_SECONDS, instrument_handler
+from utils.splitter import part_views
+from utils.streaming_upload import IterStream, StreamUploadError, stream_document
 
 logger = logging.getLogger(__name__)
 
+BUNDLE_FILENAME = "ml_datasets_bundle.zip"
+# A worker that dies mid-build holds its build lock at most this long;
+# a live one renews it every BUILD_LOCK_RENEW seconds until it unlocks
+BUILD_LOCK_TTL = 60.0
+BUILD_LOCK_RENEW = BUILD_LOCK_TTL / 3
+BUILD_LOCK_POLL = 1.0
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Router for incoming text messages.
@@ -28,79 +49,431 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip() if update.message.text else ""
     
     # --- MODE 1: MLparset (Secure File Dump) ---
-    if text == "MLparset":
+    # Only "MLparset" and "MLparset <codec>"; other "MLparset ..." texts are searched as before
+    parts = text.split()
+    is_codec = len(parts) == 2 and parts[1].lower() in TAR_CODECS
+    if parts and parts[0] == "MLparset" and (len(parts) == 1 or is_codec):
         logger.info(f"User {update.effective_user.id} requested MLparset dump.")
-        await _handle_mlparset(update, context)
+        if len(parts) == 2:
+            codec = parts[1].lower()
+            codecs = available_tar_codecs()
+            if codec not in codecs:
+                options = " or ".join(f"`MLparset {c}`" for c in codecs)
+                await update.message.reply_text(f"❌ {codec} bundles are not available here. Send `MLparset`, {options}.")
+                return
+            await _submit_job(update, context, f"mlparset-{codec}", PRIORITY_BULK,
+                              functools.partial(_handle_mlparset_tar, update, context, codec))
+        else:
+            await _submit_job(update, context, "mlparset", PRIORITY_BULK,
+                              functools.partial(_handle_mlparset, update, context))
+        return
+
+    # --- MODE 1b: Catalog Keyword (served from the local mirror) ---
+    mirror = context.bot_data.get("catalog_mirror")
+    key = mirror.match(text) if mirror and text else None
+    if key:
+        logger.info(f"User {update.effective_user.id} requested catalog entry {key}.")
+        # Mostly re-sends by file_id, so it goes ahead of bundle builds
+        await _submit_job(update, context, "catalog", PRIORITY_INTERACTIVE,
+                          functools.partial(_handle_catalog, update, context, mirror, key), key=f"catalog:{key}")
         return
 
     # --- MODE 2: Dataset Search (Link Only) ---
     await _handle_search(update, context, text)
 
-async def _handle_mlparset(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def _submit_job(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str, priority: int,
+                      run, key: Optional[str] = None):
     """
-    Mode 1: Zips and sends all files from the temp directory.
-    Uses a temporary file for the zip to avoid concurrency issues with fixed path names.
+    Queues heavy work on the JobScheduler and posts its status message with a Cancel button.
+
+    Args:
+        update (Update): The Telegram update object.
+        context (ContextTypes.DEFAULT_TYPE): The callback context.
+        kind (str): Job kind (metrics label; also the dedup key unless key is given).
+        priority (int): PRIORITY_INTERACTIVE or PRIORITY_BULK.
+        run (Callable[[Job], Awaitable]): The work.
+        key (Optional[str]): Deduplication key within the chat.
+    """
+    jobs = context.bot_data.get("jobs")
+    if jobs is None:
+        logger.error("Job scheduler is not configured.")
+        await update.message.reply_text("❌ This is currently unavailable.")
+        return
+
+    try:
+        job, created = jobs.submit(update.effective_user.id, update.effective_chat.id, kind, run, priority, key)
+    except QueueFull:
+        await update.message.reply_text(
+            f"🚦 You already have {jobs.max_per_user} requests waiting. Please let them finish first."
+        )
+        return
+    if not created:
+        await update.message.reply_text("⏳ Already working on that, see the status message above.")
+        return
+
+    position = jobs.position(job)
+    markup = _cancel_button(job.id)
+    try:
+        status_msg = await update.message.reply_text(
+            f"⏳ Queued ({position} ahead)..." if position else "⏳ Starting...", reply_markup=markup
+        )
+    except Exception:
+        await jobs.cancel(job.id, job.user_id)
+        raise
+    job.attach(status_msg, markup)
+
+@instrument_handler("cancel")
+async def handle_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Callback for the "Cancel" button on a job's status message.
+
+    Args:
+        update (Update): The Telegram update object (a callback query with data "cancel:<job id>").
+        context (ContextTypes.DEFAULT_TYPE): The callback context.
+    """
+    callback = update.callback_query
+    job_id = callback.data.split(":", 1)[1]
+    jobs = context.bot_data.get("jobs")
+    if jobs is not None and await jobs.cancel(job_id, callback.from_user.id):
+        await callback.answer("🚫 Cancelling...")
+        return
+    await callback.answer("Nothing to cancel.")
+    await _drop_button(callback)
+
+async def _folder_manifest(context: ContextTypes.DEFAULT_TYPE, folder: str) -> Tuple[List[ManifestItem], int]:
+    """
+    The files to bundle and how many are still being written.
+
+    Comes from the FolderWatcher's in-memory manifest when it is running (only
+    settled files), else from a scan of the folder.
+    """
+    watcher = context.bot_data.get("folder_watcher")
+    if watcher is not None and watcher.ready:
+        return watcher.snapshot()
+    return await asyncio.to_thread(scan_folder, folder), 0
+
+async def _acquire_bundle(bundle_cache, folder: str, manifest: List[ManifestItem]):
+    """
+    BundleCache.acquire() off the event loop; if the job is cancelled mid-build,
+    the bundle is released as soon as the build thread finishes.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(bundle_cache.acquire, folder, manifest))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        def release(done):
+            if not done.cancelled() and done.exception() is None:
+                asyncio.ensure_future(asyncio.to_thread(bundle_cache.release, done.result()))
+        future.add_done_callback(release)
+        raise
+
+@instrument_handler("mlparset")
+async def _handle_mlparset(update: Update, context: ContextTypes.DEFAULT_TYPE, job: Job):
+    """
+    Mode 1 (background job): Zips and sends all files from the temp directory.
+    The bundle comes from the shared BundleCache, so an unchanged folder is neither
+    recompressed nor (when Telegram still knows its file_id) re-uploaded; with the
+    FolderWatcher running it is usually prebuilt already. Files still being
+    written are left out.
+    With Config.STREAM_UPLOADS, a bundle that isn't built yet is compressed straight
+    into the upload instead, and the cached bundle file is only the fallback.
+    With several workers, one worker at a time builds a given bundle; the others
+    wait and then send the file_id it uploaded.
     """
     temp_dir = Config.TEMP_DIR
+    bundle_cache = context.bot_data["bundle_cache"]
+    registry = context.bot_data["upload_registry"]
+    state = context.bot_data.get("state")
     
     # 1. Validation
     if not os.path.exists(temp_dir):
-        await update.message.reply_text("❌ Temp directory is missing.")
+        await job.finish("❌ Temp directory is missing.")
         return
 
-    files_to_zip = [
-        f for f in os.listdir(temp_dir) 
-        if os.path.isfile(os.path.join(temp_dir, f)) and not f.endswith('.zip')
-    ]
-    
-    if not files_to_zip:
-        await update.message.reply_text("📂 Temp folder is empty. No files to send.")
+    manifest, pending = await _folder_manifest(context, temp_dir)
+    if not manifest:
+        await job.finish(_empty_folder_text(pending))
         return
 
-    status_msg = await update.message.reply_text("📦 Compressing content...")
+    content_hash = f"bundle:{manifest_digest(manifest)}"
+    caption = f"📦 **MLparset Dump**\n✅ Files: {len(manifest)}" + _pending_note(pending)
+    bundle = None
+    lock_token = None
+    renewer = None
     
-    # 2. ZIP Creation (Defensive)
-    # Use a Safe Temporary File for the ZIP
     try:
-        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp_zip:
-            zip_path = tmp_zip.name
-        
-        logger.info(f"Creating zip at {zip_path} with {len(files_to_zip)} files.")
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for filename in files_to_zip:
-                file_path = os.path.join(temp_dir, filename)
-                try:
-                    zf.write(file_path, arcname=filename)
-                except OSError as e:
-                    logger.warning(f"Skipping locked file {filename}: {e}")
-        
-        # 3. Sending
-        await status_msg.edit_text("📤 Uploading bundle...")
-        
-        with open(zip_path, 'rb') as f:
-            await update.message.reply_document(
-                document=f,
-                caption=f"📦 **MLparset Dump**\n✅ Files: {len(files_to_zip)}",
-                filename="ml_datasets_bundle.zip"
-            )
+        if state is not None and state.shared:
+            lock_token = await _claim_build(state, content_hash, job)
+            renewer = asyncio.create_task(_renew_build_lock(state, content_hash, lock_token))
+        # Telegram may already hold this exact bundle (sent earlier, or by another worker)
+        if await _send_document(update, registry, content_hash, None, BUNDLE_FILENAME, caption):
+            await job.dismiss()
+            return
+
+        await job.progress("📦 Compressing content...")
+        if (Config.STREAM_UPLOADS and not await asyncio.to_thread(bundle_cache.is_current, manifest)
+                and await _stream_mlparset(update, context, job, manifest, caption)):
+            return
+
+        # 2. Bundle (built or reused off the event loop)
+        with STAGE_SECONDS.time(stage="zip_build"):
+            bundle = await _acquire_bundle(bundle_cache, temp_dir, manifest)
+        if bundle is None:
+            await job.finish(_empty_folder_text(pending))
+            return
+
+        # 3. Sending (by file_id when Telegram already holds this exact bundle)
+        await job.progress("📤 Uploading bundle...")
+        if bundle.size > Config.TELEGRAM_UPLOAD_LIMIT:
+            await _send_bundle_parts(update, context, registry, bundle, job)
+            await job.dismiss()
+            logger.info("Zip file sent in parts successfully.")
+            return
+        await _send_document(
+            update, registry,
+            content_hash=f"bundle:{bundle.digest}",
+            path=bundle.path,
+            filename=BUNDLE_FILENAME,
+            caption=caption,
+            label="mlparset-bundle"
+        )
+        await job.dismiss()
             
         logger.info("Zip file sent successfully.")
 
+    except StreamUploadError as e:
+        # Part uploads go to a URL holding the bot token: no message or traceback in the log
+        logger.error(f"Failed to send zip parts ({type(e).__name__}, status {e.status})")
+        await job.finish("❌ Error processing request. Please try again.")
+
     except Exception as e:
         logger.error(f"Failed to create/send zip: {e}", exc_info=True)
-        await status_msg.edit_text("❌ Error processing request. Please try again.")
-        
+        await job.finish("❌ Error processing request. Please try again.")
+
+    finally:
+        # 4. Unpin (the cached bundle itself is kept for the next request)
+        await asyncio.to_thread(bundle_cache.release, bundle)
+        if renewer is not None:
+            renewer.cancel()
+        if lock_token is not None:
+            await asyncio.to_thread(state.unlock, content_hash, lock_token)
+
+async def _claim_build(state, name: str, job: Job) -> str:
+    """
+    Takes the cross-worker lock for building name, waiting while another job holds it.
+
+    Returns:
+        str: The lock token to unlock with.
+    """
+    waiting = False
+    while True:
+        token = await asyncio.to_thread(state.try_lock, name, BUILD_LOCK_TTL)
+        if token is not None:
+            return token
+        if not waiting:
+            await job.progress("⏳ Another worker is preparing this bundle...")
+            waiting = True
+        await asyncio.sleep(BUILD_LOCK_POLL)
+
+async def _renew_build_lock(state, name: str, token: str):
+    """
+    Keeps a claimed build lock alive while the build and upload run (cancelled by the holder).
+    """
+    while True:
+        await asyncio.sleep(BUILD_LOCK_RENEW)
+        try:
+            renewed = await asyncio.to_thread(state.try_lock, name, BUILD_LOCK_TTL, token)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to renew build lock {name[:20]}, retrying: {e}")
+            continue
+        if renewed is None:
+            logger.warning(f"⚠️ Build lock {name[:20]} expired and was taken by another worker.")
+            return
+
+async def _stream_mlparset(update: Update, context: ContextTypes.DEFAULT_TYPE, job: Job,
+                           manifest: List[ManifestItem], caption: str) -> bool:
+    """
+    Sends the temp folder as a zip generated during the upload (no file on disk).
+
+    Returns:
+        bool: False if the caller should use the cached-bundle path instead
+        (possibly oversized bundle, or the streamed upload failed).
+    """
+    temp_dir = Config.TEMP_DIR
+    registry = context.bot_data["upload_registry"]
+    # A streamed zip can't be split afterwards; possibly oversized bundles go out in parts
+    if sum(size for _, size, _ in manifest) > Config.TELEGRAM_UPLOAD_LIMIT:
+        return False
+
+    content_hash = f"bundle:{manifest_digest(manifest)}"
+    policy = CompressionPolicy()
+    # Lazy: each member is classified and compressed only as the upload pulls it
+    jobs = ((os.path.join(temp_dir, name), name) + policy.choose(os.path.join(temp_dir, name), size)
+            for name, size, _ in manifest)
+    await job.progress("📤 Compressing and uploading...")
+    try:
+        message = await asyncio.to_thread(
+            stream_document, context.bot.base_url, update.effective_chat.id,
+            IterStream(stream_zip(jobs)), BUNDLE_FILENAME, caption
+        )
+    except StreamUploadError as e:
+        logger.warning(f"Streaming upload failed ({type(e).__name__}, status {e.status}), "
+                       f"falling back to the cached bundle")
+        await job.progress("📦 Compressing content...")
+        return False
+    except Exception as e:
+        logger.warning(f"Streaming upload failed ({type(e).__name__}), falling back to the cached bundle")
+        await job.progress("📦 Compressing content...")
+        return False
+
+    document = message.get("document") or {}
+    if document.get("file_id"):
+        await asyncio.to_thread(registry.record, content_hash, document["file_id"],
+                                document.get("file_size", 0), "mlparset-bundle")
+    await job.dismiss()
+    logger.info("Zip file streamed successfully.")
+    return True
+
+async def _send_bundle_parts(update: Update, context: ContextTypes.DEFAULT_TYPE, registry, bundle, job: Job):
+    """
+    Sends a bundle over Telegram's upload limit as numbered parts (.zip.001, ...).
+
+    Parts are byte ranges read straight from the cached bundle (no part files),
+    and each part is registered on its own, so a retry re-sends only missing parts.
+    """
+    views = part_views(bundle.path, Config.CHUNK_SIZE, name=BUNDLE_FILENAME)
+    total = len(views)
+    try:
+        for index, view in enumerate(views, 1):
+            await job.progress(f"📤 Uploading part {index}/{total}...")
+            content_hash = f"bundle:{bundle.digest}:part{index}/{total}"
+            caption = f"📦 **MLparset Dump** (part {index}/{total})"
+            if index == 1:
+                caption += (f"\n✅ Files: {bundle.file_count}"
+                            f"\n🧩 Join with `cat {view.name[:-4]}.* > {view.name[:-4]}` or open part 1 in 7-Zip.")
+            if await _send_document(update, registry, content_hash, None, view.name, caption):
+                continue
+            message = await asyncio.to_thread(
+                stream_document, context.bot.base_url, update.effective_chat.id,
+                view, view.name, caption, length=view.length
+            )
+            document = message.get("document") or {}
+            if document.get("file_id"):
+                await asyncio.to_thread(registry.record, content_hash, document["file_id"], view.length,
+                                        f"mlparset-bundle-part{index}")
+    finally:
+        for view in views:
+            view.close()
+
+@instrument_handler("mlparset_tar")
+async def _handle_mlparset_tar(update: Update, context: ContextTypes.DEFAULT_TYPE, codec: str, job: Job):
+    """
+    Mode 1 (opt-in, background job): Sends the temp folder as an xz or zstd tar bundle.
+    The tar is only built when Telegram doesn't already hold this exact bundle.
+    The codec is validated by the router before the job is queued.
+    """
+    temp_dir = Config.TEMP_DIR
+    registry = context.bot_data["upload_registry"]
+
+    if not os.path.exists(temp_dir):
+        await job.finish("❌ Temp directory is missing.")
+        return
+
+    manifest, pending = await _folder_manifest(context, temp_dir)
+    if not manifest:
+        await job.finish(_empty_folder_text(pending))
+        return
+
+    content_hash = f"bundle-{codec}:{manifest_digest(manifest)}"
+    filename = f"ml_datasets_bundle{tar_extension(codec)}"
+    caption = f"📦 **MLparset Dump** ({codec})\n✅ Files: {len(manifest)}" + _pending_note(pending)
+    await job.progress(f"📦 Compressing content ({codec})...")
+    tar_path = None
+
+    try:
+        sent = await _send_document(update, registry, content_hash, None, filename, caption)
+        if not sent:
+            fd, tar_path = tempfile.mkstemp(suffix=tar_extension(codec))
+            os.close(fd)
+            files = [(os.path.join(temp_dir, name), name) for name, _, _ in manifest]
+            with STAGE_SECONDS.time(stage="tar_build"):
+                await asyncio.to_thread(build_tar_bundle, files, tar_path, codec)
+
+            await job.progress("📤 Uploading bundle...")
+            await _send_document(update, registry, content_hash, tar_path, filename, caption,
+                                 label=f"mlparset-bundle-{codec}")
+        await job.dismiss()
+        logger.info(f"{codec} tar bundle sent successfully.")
+
+    except Exception as e:
+        logger.error(f"Failed to create/send {codec} tar bundle: {e}", exc_info=True)
+        await job.finish("❌ Error processing request. Please try again.")
+
     finally:
-        # 4. Cleanup
-        # We only remove the TEMPORARY ZIP, not the source files (Mode 1 requirements didn't say to delete source)
-        if 'zip_path' in locals() and os.path.exists(zip_path):
+        if tar_path and os.path.exists(tar_path):
             try:
-                os.remove(zip_path)
-                logger.info(f"Cleaned up temporary zip: {zip_path}")
+                os.remove(tar_path)
             except OSError as e:
-                logger.error(f"Failed to delete temp zip: {e}")
+                logger.error(f"Failed to delete temp tar: {e}")
+
+@instrument_handler("catalog")
+async def _handle_catalog(update: Update, context: ContextTypes.DEFAULT_TYPE, mirror, key: str, job: Job):
+    """
+    Mode 1b (background job): Sends a predefined catalog entry's files.
+    Files come from the local mirror (or by file_id), so only files the mirror
+    hasn't prefetched yet are fetched from the origin.
+    """
+    registry = context.bot_data["upload_registry"]
+    await update.message.reply_text(f"📚 {mirror.describe(key)}")
+    await job.progress(f"📥 Fetching {key}...")
+    files = await asyncio.to_thread(mirror.files, key)
+    for index, item in enumerate(files, 1):
+        await job.progress(f"📤 Sending {item.name} ({index}/{len(files)})...")
+        try:
+            if item.digest and await _send_document(
+                update, registry, f"catalog:{item.digest}", item.path, item.name,
+                caption=f"📄 {key} / {item.name}", label=f"catalog:{item.url}"
+            ):
+                continue
+        except Exception as e:
+            logger.error(f"Failed to send catalog file {item.name}: {e}", exc_info=True)
+        await update.message.reply_text(f"⚠️ {item.name} is unavailable right now. Source: {item.url}")
+    await job.dismiss()
 
+async def _send_document(update: Update, registry, content_hash: str, path: Optional[str],
+                         filename: str, caption: str, label: Optional[str] = None) -> bool:
+    """
+    Sends a document by its registered file_id if known, otherwise uploads it
+    and records the file_id Telegram returns.
+
+    The registry is a SQLite file shared with other workers, so every call
+    into it runs in a thread.
+
+    Returns:
+        bool: False if no usable file_id exists and no path was given to upload.
+    """
+    file_id = await asyncio.to_thread(registry.get, content_hash)
+    if file_id:
+        try:
+            await update.message.reply_document(document=file_id, caption=caption)
+            await asyncio.to_thread(registry.mark_reused, content_hash)
+            logger.info(f"♻️ Sent {filename} by file_id (upload skipped).")
+            return True
+        except BadRequest as e:
+            logger.warning(f"Registered file_id for {filename} rejected, re-uploading: {e}")
+            await asyncio.to_thread(registry.invalidate, content_hash)
+
+    if path is None:
+        return False
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f, STAGE_SECONDS.time(stage="upload"):
+        sent = await update.message.reply_document(document=f, caption=caption, filename=filename)
+    BYTES_SENT.inc(size, kind="document")
+    if sent.document:
+        await asyncio.to_thread(registry.record, content_hash, sent.document.file_id, size, label)
+    return True
+
+@instrument_handler("search")
 async def _handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE, query: str):
     """
     Mode 2: Searches Kaggle, HuggingFace, and GitHub. Returns LINKS ONLY.
@@ -110,44 +483,155 @@ async def _handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE, que
 
     await update.message.reply_text(f"🔍 Searching for '{query}'...")
     
-    services = context.bot_data.get("services", {})
-    results = []
-
-    # Aggregated Search with Error Isolation
-    # 1. Kaggle
-    if services.get("kaggle"):
-        results.extend(services["kaggle"].search_datasets(query))
-
-    # 2. HuggingFace
-    if services.get("hf"):
-        results.extend(services["hf"].search_datasets(query))
+    aggregator = context.bot_data.get("aggregator")
+    if aggregator is None:
+        logger.error("Search aggregator is not configured.")
+        await update.message.reply_text("❌ Search is currently unavailable.")
+        return
 
-    # 3. GitHub
-    if services.get("github"):
-        results.extend(services["github"].search_repositories(query))
+    # Concurrent Fan-out with Error Isolation (slow providers are dropped)
+    outcome = await aggregator.search(query)
+    # Merged across providers: near-duplicates dropped, ranked by relevance and popularity
+    results = outcome.ranked(limit=Config.SEARCH_PAGE_SIZE)
 
     if not results:
-        await update.message.reply_text("❌ No results found. Try a broader keyword.")
+        if outcome.throttled:
+            await update.message.reply_text(
+                f"🚦 {', '.join(outcome.throttled)} is rate limiting us right now. Please try again in a minute."
+            )
+        else:
+            await update.message.reply_text("❌ No results found. Try a broader keyword.")
         return
 
     # Format Output: LINKS ONLY
-    response = f"🔎 **Results for '{query}'**\n\n"
-    
-    # Take top 10 mixed results
-    for i, res in enumerate(results[:10]):
+    response = _format_results(f"🔎 **Results for '{query}'**", results)
+
+    if outcome.source == "local":
+        response += "\n⚡ Instant results from the local index\n"
+    if outcome.timed_out:
+        response += f"\n⚠️ Skipped (too slow): {', '.join(outcome.timed_out)}\n"
+    if outcome.throttled:
+        response += f"\n🚦 Skipped (rate limited): {', '.join(outcome.throttled)}\n"
+
+    # Lazy cursor for further pages; nothing is fetched until "Next" is pressed
+    token = aggregator.open_cursor(outcome, results)
+    await _reply_results(update.message, response, _next_button(token))
+
+@instrument_handler("more")
+async def handle_more(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Callback for the "Next" button under search results: sends the next page.
+
+    Args:
+        update (Update): The Telegram update object (a callback query with data "more:<token>").
+        context (ContextTypes.DEFAULT_TYPE): The callback context.
+    """
+    callback = update.callback_query
+    token = callback.data.split(":", 1)[1]
+    aggregator = context.bot_data.get("aggregator")
+    cursor = aggregator.cursors.get(token) if aggregator and aggregator.cursors else None
+
+    if cursor is None:
+        await callback.answer("⌛ These results have expired. Send the search again.", show_alert=True)
+        await _drop_button(callback)
+        return
+    if cursor.lock.locked():
+        await callback.answer("⏳ Already loading the next page...")
+        return
+
+    await callback.answer()
+    page = await aggregator.next_page(cursor)
+    # The next page (if any) carries its own button
+    await _drop_button(callback)
+
+    if not page.results:
+        if page.throttled:
+            await callback.message.reply_text(
+                f"🚦 {', '.join(page.throttled)} is rate limiting us right now. Please try again in a minute.",
+                reply_markup=_next_button(token)
+            )
+        else:
+            await callback.message.reply_text("✅ No more results.")
+        return
+
+    response = _format_results(f"🔎 **More results for '{cursor.query}'**", page.results, page.start)
+    if page.throttled:
+        response += f"\n🚦 Skipped (rate limited): {', '.join(page.throttled)}\n"
+    await _reply_results(callback.message, response, _next_button(token) if page.has_more or page.throttled else None)
+
+def _format_results(header: str, results: List[Dict[str, Any]], start: int = 0) -> str:
+    """
+    Formats search results as a numbered Markdown list of links.
+
+    Args:
+        header (str): First line of the message.
+        results (List[Dict[str, Any]]): Results to list.
+        start (int): Results shown on earlier pages (numbering continues from there).
+
+    Returns:
+        str: The message text.
+    """
+    response = f"{header}\n\n"
+    for i, res in enumerate(results, start=start + 1):
         # Defensive check for keys
         platform = res.get('platform', 'Unknown')
         title = res.get('title', 'Untitled')
         url = res.get('url', '#')
         
+        if platform == CATALOG_PLATFORM:
+            response += f"{i}. 📚 {title} (send `{title}` to get its files)\n"
+            continue
         platform_icon = "🏆" if platform == 'Kaggle' else "🤗" if platform == 'HuggingFace' else "💻"
         
         # Markdown escaping could be added here if needed, but simple brackets usually safe enough for titles
-        response += f"{i+1}. {platform_icon} [{title}]({url})\n"
+        response += f"{i}. {platform_icon} [{title}]({url})\n"
+    return response
+
+def _next_button(token: Optional[str]) -> Optional[InlineKeyboardMarkup]:
+    """
+    Inline keyboard with a "Next" button for a cursor token (None without a token).
+    """
+    if token is None:
+        return None
+    return InlineKeyboardMarkup([[InlineKeyboardButton("Next ▶️", callback_data=f"more:{token}")]])
+
+def _empty_folder_text(pending: int) -> str:
+    """
+    Status text for a request that found nothing ready to bundle.
+    """
+    if pending:
+        return f"⏳ {pending} file(s) are still being written. Try again in a moment."
+    return "📂 Temp folder is empty. No files to send."
 
+def _pending_note(pending: int) -> str:
+    """
+    Caption suffix noting files left out because they were still being written.
+    """
+    return f"\n⏳ Left out {pending} file(s) still being written." if pending else ""
+
+def _cancel_button(job_id: str) -> InlineKeyboardMarkup:
+    """
+    Inline keyboard with a "Cancel" button for a background job.
+    """
+    return InlineKeyboardMarkup([[InlineKeyboardButton("Cancel ✖️", callback_data=f"cancel:{job_id}")]])
+
+async def _drop_button(callback):
+    """
+    Removes the inline keyboard from the message a callback came from.
+    """
+    try:
+        await callback.edit_message_reply_markup(reply_markup=None)
+    except BadRequest as e:
+        logger.debug(f"Could not remove Next button: {e}")
+
+async def _reply_results(message, response: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+    """
+    Sends formatted results, falling back to plain text if Markdown parsing fails.
+    """
     try:
-        await update.message.reply_markdown(response, disable_web_page_preview=True)
+        await message.reply_markdown(response, disable_web_page_preview=True, reply_markup=reply_markup)
     except Exception as e:
         logger.error(f"Failed to send markdown response: {e}")
         # Fallback to plain text if Markdown parsing fails
-        await update.message.reply_text("⚠️ formatting error, but here are the results:\n" + response.replace('*', ''))
+        await message.reply_text("⚠️ formatting error, but here are the results:\n" + response.replace('*', ''),
+                                 reply_markup=reply_markup)
@@ -0,0 +1,84 @@
+"""
+HTTP handler for Telegram webhook deliveries.
+
+Telegram POSTs each update as JSON with the secret token from setWebhook in
+the X-Telegram-Bot-Api-Secret-Token header. The update is queued on the
+Application and acknowledged immediately; processing happens in the
+Application, bounded by its concurrent update limit, so a slow handler never
+makes Telegram time out and redeliver.
+
+With several workers, the supervisor's handler skips the Application: it
+forwards the raw update to the worker owning its chat (utils.supervisor), and
+answers 503 while that worker's queue is full so Telegram retries later.
+"""
+
+import hmac
+import json
+import logging
+from typing import Optional
+from telegram import Update
+from telegram.ext import Application
+from config import Config
+from utils.supervisor import Supervisor
+from utils.web_server import Handler, Request, Response
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_handler(app: Application, secret: Optional[str] = None) -> Handler:
+    """
+    Builds the route handler Telegram posts updates to.
+
+    Args:
+        app (Application): The running bot application.
+        secret (Optional[str]): Expected secret token (defaults to Config.WEBHOOK_SECRET).
+
+    Returns:
+        Handler: Route handler that checks the secret token and queues the update.
+    """
+    expected = (secret if secret is not None else Config.WEBHOOK_SECRET).encode()
+
+    async def receive(request: Request) -> Response:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "").encode()
+        if not hmac.compare_digest(token, expected):
+            return Response(403, b"Forbidden")
+        try:
+            update = Update.de_json(json.loads(request.body), app.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"⚠️ Rejected malformed webhook update: {e}")
+            return Response(400, b"Bad Request")
+        await app.update_queue.put(update)
+        return Response(body=b"OK")
+
+    return receive
+
+
+def partitioned_webhook_handler(supervisor: Supervisor, secret: Optional[str] = None) -> Handler:
+    """
+    Builds the supervisor's webhook route, forwarding each update to its worker.
+
+    Args:
+        supervisor (Supervisor): Routes updates to the worker processes.
+        secret (Optional[str]): Expected secret token (defaults to Config.WEBHOOK_SECRET).
+
+    Returns:
+        Handler: Route handler that checks the secret token and dispatches the update.
+    """
+    expected = (secret if secret is not None else Config.WEBHOOK_SECRET).encode()
+
+    async def receive(request: Request) -> Response:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "").encode()
+        if not hmac.compare_digest(token, expected):
+            return Response(403, b"Forbidden")
+        try:
+            update = json.loads(request.body)
+        except ValueError as e:
+            logger.warning(f"⚠️ Rejected malformed webhook update: {e}")
+            return Response(400, b"Bad Request")
+        if not isinstance(update, dict):
+            return Response(400, b"Bad Request")
+        if not supervisor.dispatch(update):
+            return Response(503, b"Busy")
+        return Response(body=b"OK")
+
+    return receive
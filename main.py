@@ -2,62 +2,267 @@
 Application Entry Point (Production/Render Ready).
 
 This script initializes the Telegram Bot, verifies configuration,
-sets up necessary services, starts a background health-check HTTP server
-(to satisfy Render's port binding requirement), and runs the bot polling loop.
+sets up necessary services and runs them on one event loop together with an
+asyncio HTTP server on PORT (health checks, /healthz, /stats and Prometheus
+/metrics; it also satisfies Render's port binding requirement). With WEBHOOK_URL set, Telegram pushes
+updates to that same server; otherwise the bot long-polls.
+
+With WORKERS > 1 this process becomes a supervisor: it takes updates in the
+same way and partitions them by chat id across worker processes, each running
+the bot (see utils.supervisor); the workers share caches, rate limits and
+locks through the state backend (see utils.state).
 """
 
+import asyncio
+import json
 import logging
 import os
-import threading
-import http.server
-import socketserver
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes, Defaults
+import signal
+from contextlib import ExitStack
+from typing import Optional
+from telegram import Bot, Update
+from telegram.ext import (
+    Application, ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters,
+    ContextTypes, Defaults, TypeHandler, Updater
+)
 from config import Config
-from utils.logger import setup_logger
-from services.kaggle_service import KaggleService
-from services.huggingface_service import HuggingFaceService
-from services.github_service import GitHubService
-from handlers.simple_handler import handle_message
+from utils.logger import logging_stats, set_request_id, setup_logging
+from services.registry import ServiceRegistry
+from services.search_aggregator import SearchAggregator
+from services.catalog_mirror import CatalogMirror
+from services.local_index import LocalIndex
+from utils.cache import SearchCache
+from utils.bundle_cache import BundleCache
+from utils.folder_watcher import FolderWatcher
+from utils.upload_registry import UploadRegistry
+from utils.pagination import CursorStore
+from utils.jobs import JobScheduler
+from utils.http_client import close_http_session
+from utils.rate_limiter import get_rate_limiter
+from utils.metrics import REGISTRY, LoopLagMonitor, stats_collector
+from utils.profiling import Profiler
+from utils.state import get_state_backend
+from utils.supervisor import Supervisor, WorkerLink, start_inbox_reader
+from utils.web_server import Request, Response, WebServer
+from handlers.simple_handler import handle_cancel, handle_message, handle_more
+from handlers.profile_handler import handle_profile, profile_routes
+from handlers.webhook_handler import partitioned_webhook_handler, webhook_handler
+
+# Handlers are attached by setup_logging() in main() / run_worker()
+logger = logging.getLogger("Bot")
 
-# Setup Logger
-logger = setup_logger()
+# name -> zero-arg callable returning a JSON-serializable dict (served on GET /stats)
+stats_sources = {}
 
 # ---------------------------------------------------------
-# 1. Minimal HTTP Health Server (For Render Port Binding)
+# 1. HTTP Server (Health, Stats and Webhook)
 # ---------------------------------------------------------
-class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
+
+async def health(request: Request) -> Response:
+    """
+    Answers 200 so Render (and any uptime probe) sees a live web service.
     """
-    Minimal Request Handler that returns 200 OK.
-    Use this to trick Render into thinking we are a web service.
+    return Response(body=b"Bot is running.")
+
+async def stats(request: Request) -> Response:
+    """
+    Returns JSON counters from the registered stats sources.
+
+    Collected off the event loop: several sources read SQLite or take component locks.
     """
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(b"Bot is running.")
+    def collect() -> str:
+        return json.dumps({name: source() for name, source in list(stats_sources.items())})
 
-    def log_message(self, format, *args):
-        # Silence HTTP logs to keep console clean
-        pass
+    body = await asyncio.to_thread(collect)
+    return Response(body=body.encode(), content_type="application/json")
 
-def start_health_server():
+async def metrics(request: Request) -> Response:
     """
-    Starts a background HTTP server on the port defined by existing environment variables.
-    Render sets the 'PORT' variable automatically.
+    Serves every metric in the Prometheus text format (rendered off the event loop, like /stats).
     """
-    port = int(os.environ.get("PORT", 10000))
-    try:
-        # Allow reuse address to prevent 'Address already in use' on restarts
-        socketserver.TCPServer.allow_reuse_address = True
-        with socketserver.TCPServer(("0.0.0.0", port), HealthCheckHandler) as httpd:
-            logger.info(f"🌍 Health check server listening on port {port}")
-            httpd.serve_forever()
-    except Exception as e:
-        logger.critical(f"Failed to start health server: {e}")
+    body = await asyncio.to_thread(REGISTRY.render)
+    return Response(body=body.encode(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def healthz_handler(aggregator: SearchAggregator, lag_monitor: LoopLagMonitor):
+    """
+    Builds the /healthz handler.
+
+    Reports provider availability and event loop lag. Status is "ok" when every
+    provider is available, "degraded" when some are (HTTP 200 for both), and
+    "unhealthy" (HTTP 503) when none are or the loop lags beyond HEALTH_MAX_LOOP_LAG.
+    """
+    async def healthz(request: Request) -> Response:
+        providers = aggregator.provider_health()
+        available = sum(1 for provider in providers.values() if provider["available"])
+        if lag_monitor.lag > Config.HEALTH_MAX_LOOP_LAG or (providers and not available):
+            status = "unhealthy"
+        elif available < len(providers):
+            status = "degraded"
+        else:
+            status = "ok"
+        body = json.dumps({
+            "status": status,
+            "providers": providers,
+            "event_loop_lag": round(lag_monitor.lag, 4),
+        })
+        return Response(503 if status == "unhealthy" else 200, body.encode(), content_type="application/json")
+    return healthz
+
+def build_web_server(app: Application, aggregator: SearchAggregator, lag_monitor: LoopLagMonitor,
+                     host: str = "0.0.0.0", port: Optional[int] = None, webhook: bool = True) -> WebServer:
+    """
+    Creates the HTTP server with the health, metrics, stats, (in webhook mode) webhook
+    and (with PROFILE_TOKEN) profiling routes.
+    """
+    web = WebServer(host=host, port=port)
+    web.route("GET", "/", health)
+    web.route("GET", "/healthz", healthz_handler(aggregator, lag_monitor))
+    web.route("GET", "/metrics", metrics)
+    web.route("GET", "/stats", stats)
+    if webhook and Config.WEBHOOK_URL:
+        web.route("POST", Config.WEBHOOK_PATH, webhook_handler(app))
+    if Config.PROFILE_TOKEN:
+        profile_routes(web, app.bot_data["profiler"])
+    stats_sources["http"] = web.stats
+    return web
+
+async def set_webhook(bot: Bot):
+    """
+    Points Telegram at WEBHOOK_URL + WEBHOOK_PATH.
+    """
+    await bot.set_webhook(
+        url=f"{Config.WEBHOOK_URL}{Config.WEBHOOK_PATH}",
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=True,
+        secret_token=Config.WEBHOOK_SECRET,
+        max_connections=Config.WEBHOOK_MAX_CONNECTIONS,
+    )
+    logger.info(f"🪝 Webhook set to {Config.WEBHOOK_URL}{Config.WEBHOOK_PATH}")
+
+def stop_event() -> asyncio.Event:
+    """
+    Returns an event set on SIGINT/SIGTERM.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+async def serve(app: Application, web: WebServer, lag_monitor: LoopLagMonitor,
+                services: Optional[ServiceRegistry] = None, jobs: Optional[JobScheduler] = None,
+                link: Optional[WorkerLink] = None):
+    """
+    Runs the bot and the HTTP server until SIGINT/SIGTERM.
+
+    Args:
+        app (Application): The bot application (without an Updater in webhook and worker mode).
+        web (WebServer): The HTTP server.
+        lag_monitor (LoopLagMonitor): Event loop lag sampler (runs alongside).
+        services (Optional[ServiceRegistry]): Provider services to warm up once updates flow.
+        jobs (Optional[JobScheduler]): Background job workers (run alongside).
+        link (Optional[WorkerLink]): Worker mode: the pipes to the supervisor, which sends
+            updates on them (its STOP message also ends the run).
+    """
+    stop = stop_event()
+
+    async with app:
+        lag_monitor.start()
+        if jobs is not None:
+            await jobs.start()
+        await web.start()
+        try:
+            if link is not None:
+                start_inbox_reader(app, link, stop)
+            elif Config.WEBHOOK_URL:
+                await set_webhook(app.bot)
+            else:
+                await app.updater.start_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+            await app.start()
+            if services is not None and Config.SERVICE_WARMUP:
+                # Updates are already being accepted; SDK imports and auth happen off the loop
+                services.warm()
+            await stop.wait()
+            logger.info("🛑 Shutting down...")
+        finally:
+            await web.stop()
+            if jobs is not None:
+                await jobs.stop()
+            await lag_monitor.stop()
+            if app.updater is not None and app.updater.running:
+                await app.updater.stop()
+            if app.running:
+                await app.stop()
+
+# ---------------------------------------------------------
+# 2. Supervisor (WORKERS > 1)
+# ---------------------------------------------------------
+
+def supervisor_healthz(supervisor: Supervisor):
+    """
+    Builds the supervisor's /healthz handler: "ok" with every worker running,
+    "degraded" with some, "unhealthy" (HTTP 503) with none.
+    """
+    async def healthz(request: Request) -> Response:
+        alive = supervisor.alive()
+        status = "ok" if alive == supervisor.count else "degraded" if alive else "unhealthy"
+        body = json.dumps({"status": status, "workers": supervisor.count, "alive": alive})
+        return Response(503 if status == "unhealthy" else 200, body.encode(), content_type="application/json")
+    return healthz
+
+async def forward_updates(updater: Updater, supervisor: Supervisor):
+    """
+    Hands updates fetched by long polling to their workers.
+    """
+    while True:
+        update = await updater.update_queue.get()
+        await supervisor.dispatch_wait(update.to_dict())
+
+async def supervise(supervisor: Supervisor):
+    """
+    Runs the supervisor until SIGINT/SIGTERM: worker processes, update intake
+    (long polling or webhook) and the HTTP server on PORT.
+    """
+    stop = stop_event()
+    web = WebServer()
+    web.route("GET", "/", health)
+    web.route("GET", "/healthz", supervisor_healthz(supervisor))
+    web.route("GET", "/metrics", metrics)
+    web.route("GET", "/stats", stats)
+    if Config.WEBHOOK_URL:
+        web.route("POST", Config.WEBHOOK_PATH, partitioned_webhook_handler(supervisor))
+    stats_sources["http"] = web.stats
+    stats_sources["supervisor"] = supervisor.stats
+    stats_sources["logging"] = logging_stats
+    REGISTRY.add_collector(stats_collector(stats_sources))
+
+    bot = Bot(Config.TELEGRAM_BOT_TOKEN, base_url=Config.TELEGRAM_API_URL)
+    updater = None if Config.WEBHOOK_URL else Updater(bot, asyncio.Queue())
+    pump = None
+    async with bot:
+        await supervisor.start()
+        await web.start()
+        try:
+            if updater is None:
+                await set_webhook(bot)
+            else:
+                await updater.initialize()
+                await updater.start_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+                pump = asyncio.create_task(forward_updates(updater, supervisor))
+            await stop.wait()
+            logger.info("🛑 Shutting down...")
+        finally:
+            if updater is not None:
+                if updater.running:
+                    await updater.stop()
+                await updater.shutdown()
+            if pump is not None:
+                pump.cancel()
+            await web.stop()
+            await supervisor.stop()
 
 # ---------------------------------------------------------
-# 2. Bot Logic
+# 3. Bot Logic
 # ---------------------------------------------------------
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -67,7 +272,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "🤖 **Production Bot Ready**\n\n"
         "1. Send `MLparset` to get a ZIP of the temp folder.\n"
-        "2. Send ANY text to search datasets (Links Only)."
+        "2. Send a catalog keyword (e.g. `Titanic`) to get its files.\n"
+        "3. Send ANY text to search datasets (Links Only; tap Next ▶️ for more)."
     )
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -76,10 +282,149 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     """
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
 
+async def tag_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Tags everything logged while handling update (its jobs and threads included) with its id.
+    """
+    set_request_id(str(update.update_id))
+
+def build_app(cleanup: ExitStack, worker: Optional[int] = None) -> Application:
+    """
+    Builds the services and the bot application.
+
+    Args:
+        cleanup (ExitStack): Receives the shutdown callbacks of everything built.
+        worker (Optional[int]): Worker index in multi-worker mode (None for a single process).
+            Workers get updates from the supervisor (no Updater) and their own bundle
+            cache; only worker 0 prefetches the catalog and prebuilds bundles.
+
+    Returns:
+        Application: The bot, with its services in bot_data.
+    """
+    cleanup.callback(close_http_session)
+    leader = worker in (None, 0)
+
+    # 1. Initialize Services (provider SDKs load on first use or in the background warm-up)
+    stats_sources["logging"] = logging_stats
+    state = get_state_backend()
+    stats_sources["state"] = state.stats
+    services = ServiceRegistry()
+    stats_sources["services"] = services.stats
+    # With a shared backend, workers see each other's results through the second cache tier
+    cache = SearchCache(store=state if state.shared else None)
+    cleanup.callback(cache.close)
+    index = LocalIndex() if Config.LOCAL_INDEX_ENABLED else None
+    if index is not None:
+        cleanup.callback(index.close)
+    cursors = CursorStore()
+    aggregator = SearchAggregator(services, cache=cache, index=index, cursors=cursors, state=state)
+    stats_sources["search_cache"] = cache.stats
+    stats_sources["search_flights"] = aggregator.flights.stats
+    stats_sources["search_cursors"] = cursors.stats
+    if index is not None:
+        stats_sources["local_index"] = index.stats
+    stats_sources["rate_limits"] = get_rate_limiter().stats
+    # Bundles are rewritten in place, so each worker keeps its own
+    bundle_dir = Config.BUNDLE_CACHE_DIR if worker is None else os.path.join(Config.BUNDLE_CACHE_DIR, f"worker-{worker}")
+    bundle_cache = BundleCache(cache_dir=bundle_dir)
+    stats_sources["bundle_cache"] = bundle_cache.stats
+    folder_watcher = None
+    if Config.WATCH_ENABLED:
+        folder_watcher = FolderWatcher(Config.TEMP_DIR, bundle_cache if leader else None)
+        folder_watcher.start()
+        cleanup.callback(folder_watcher.stop)
+        stats_sources["folder_watcher"] = folder_watcher.stats
+    upload_registry = UploadRegistry()
+    cleanup.callback(upload_registry.close)
+    stats_sources["uploads"] = upload_registry.stats
+    jobs = JobScheduler()
+    stats_sources["jobs"] = jobs.stats
+    profiler = Profiler()
+    stats_sources["profiler"] = profiler.stats
+    catalog_mirror = CatalogMirror()
+    if leader:
+        catalog_mirror.start()
+    cleanup.callback(catalog_mirror.stop)
+    stats_sources["catalog_mirror"] = catalog_mirror.stats
+    cleanup.callback(aggregator.shutdown)
+
+    # 2. Initialize Bot with Network Hardening
+    # Hardened Network Settings for Unstable Free Tier
+    builder = (
+        ApplicationBuilder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .base_url(Config.TELEGRAM_API_URL)
+        # Connection Hardening
+        .connect_timeout(60.0)      # Wait longer for initial connection
+        .read_timeout(60.0)         # Wait longer for data (Render latency)
+        .write_timeout(60.0)        # Wait longer to send data
+        .get_updates_read_timeout(60.0) # Specific for polling loop
+        .pool_timeout(60.0)         # Wait longer for pool slot
+        .connection_pool_size(1024) # Allow many concurrent connections
+        # Don't serialize users behind one slow search, but bound the work in flight
+        .concurrent_updates(Config.UPDATE_CONCURRENCY)
+    )
+    if Config.WEBHOOK_URL or worker is not None:
+        # Updates arrive over HTTP or from the supervisor; no getUpdates loop
+        builder = builder.updater(None)
+    app = builder.build()
+    
+    # Store services
+    app.bot_data["state"] = state
+    app.bot_data["services"] = services
+    app.bot_data["aggregator"] = aggregator
+    app.bot_data["bundle_cache"] = bundle_cache
+    app.bot_data["folder_watcher"] = folder_watcher
+    app.bot_data["upload_registry"] = upload_registry
+    app.bot_data["catalog_mirror"] = catalog_mirror
+    app.bot_data["jobs"] = jobs
+    app.bot_data["profiler"] = profiler
+    
+    # Handlers (group -1 runs first, in the same task as the handler that answers)
+    app.add_handler(TypeHandler(Update, tag_update), group=-1)
+    app.add_handler(CommandHandler("start", start))
+    if Config.ADMIN_USER_IDS:
+        app.add_handler(CommandHandler("profile", handle_profile))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    app.add_handler(CallbackQueryHandler(handle_more, pattern=r"^more:"))
+    app.add_handler(CallbackQueryHandler(handle_cancel, pattern=r"^cancel:"))
+    
+    # Error Handler
+    app.add_error_handler(error_handler)
+    return app
+
+def run_worker(index: int, link: WorkerLink):
+    """
+    Entry point of a worker process in multi-worker mode (started by the Supervisor).
+
+    Runs the bot on the updates the supervisor partitions to this worker, with
+    health, stats and metrics served on 127.0.0.1:PORT+1+index.
+
+    Args:
+        index (int): Worker index.
+        link (WorkerLink): Pipes to the supervisor (updates in, acknowledgements and heartbeats out).
+    """
+    setup_logging()
+    Config.validate()
+    with ExitStack() as cleanup:
+        try:
+            app = build_app(cleanup, worker=index)
+            lag_monitor = LoopLagMonitor()
+            web = build_web_server(app, app.bot_data["aggregator"], lag_monitor,
+                                   host="127.0.0.1", port=Config.PORT + 1 + index, webhook=False)
+            REGISTRY.add_collector(stats_collector(stats_sources))
+            logger.info(f"✅ Worker {index} started.")
+            asyncio.run(serve(app, web, lag_monitor, app.bot_data["services"], app.bot_data["jobs"], link))
+        except Exception as e:
+            logger.critical(f"Fatal error in worker {index}: {e}", exc_info=True)
+            raise
+
 def main():
     """
     Main execution function.
     """
+    setup_logging()
+
     # 1. Validate Configuration
     try:
         Config.validate()
@@ -88,54 +433,26 @@ def main():
         logger.critical(f"Config Error: {e}")
         return
 
-    # 2. Start Health Server (Background Thread)
-    # This must run continuously to keep the container alive on Render
-    health_thread = threading.Thread(target=start_health_server, daemon=True)
-    health_thread.start()
-
-    # 3. Initialize Services
-    services = {
-        "kaggle": KaggleService(),
-        "hf": HuggingFaceService(),
-        "github": GitHubService()
-    }
-    
-    # 4. Initialize Bot with Network Hardening
-    try:
-        # Hardened Network Settings for Unstable Free Tier
-        app = (
-            ApplicationBuilder()
-            .token(Config.TELEGRAM_BOT_TOKEN)
-            # Connection Hardening
-            .connect_timeout(60.0)      # Wait longer for initial connection
-            .read_timeout(60.0)         # Wait longer for data (Render latency)
-            .write_timeout(60.0)        # Wait longer to send data
-            .get_updates_read_timeout(60.0) # Specific for polling loop
-            .pool_timeout(60.0)         # Wait longer for pool slot
-            .connection_pool_size(1024) # Allow many concurrent connections
-            .build()
-        )
-        
-        # Store services
-        app.bot_data["services"] = services
-        
-        # Handlers
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        
-        # Error Handler
-        app.add_error_handler(error_handler)
-        
-        logger.info("✅ Bot started in Render-Ready mode.")
-        
-        # Run Polling with Robustness
-        app.run_polling(
-            allowed_updates=Update.ALL_TYPES,
-            drop_pending_updates=True
-        )
-        
-    except Exception as e:
-        logger.critical(f"Fatal error during bot startup: {e}", exc_info=True)
+    mode = "webhook" if Config.WEBHOOK_URL else "polling"
+    if Config.WORKERS > 1:
+        # This process only takes updates in and hands them to the workers
+        logger.info(f"✅ Bot started in Render-Ready {mode} mode with {Config.WORKERS} workers.")
+        asyncio.run(supervise(Supervisor(run_worker)))
+        return
+
+    # 2. Services, bot and HTTP server in this process
+    with ExitStack() as cleanup:
+        try:
+            app = build_app(cleanup)
+            logger.info(f"✅ Bot started in Render-Ready {mode} mode.")
+            
+            lag_monitor = LoopLagMonitor()
+            REGISTRY.add_collector(stats_collector(stats_sources))
+            web = build_web_server(app, app.bot_data["aggregator"], lag_monitor)
+            asyncio.run(serve(app, web, lag_monitor, app.bot_data["services"], app.bot_data["jobs"]))
+            
+        except Exception as e:
+            logger.critical(f"Fatal error during bot startup: {e}", exc_info=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,355 @@
+"""
+Local mirror of the predefined DATASETS catalog.
+
+Catalog files are prefetched in the background, at startup and then on a
+schedule, into a content-addressed store (objects named by SHA-256, so
+identical files are kept once). Refreshes revalidate with If-None-Match /
+If-Modified-Since, so unchanged files cost a 304. The store stays under a disk
+quota by evicting the least recently served objects. A keyword hit is then
+answered from local disk (or from a Telegram file_id, via the UploadRegistry)
+instead of a cold fetch from the origin.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import requests
+from config import Config
+from utils.datasets import DATASETS
+from utils.http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFSIZE = 1024 * 1024
+
+
+@dataclass
+class MirroredFile:
+    """
+    A catalog file and its local copy.
+
+    Attributes:
+        name (str): File name shown to users.
+        url (str): Origin URL.
+        digest (Optional[str]): SHA-256 of the mirrored content, if mirrored.
+        path (Optional[str]): Local object path, if mirrored.
+        size (int): Size of the mirrored content in bytes.
+    """
+    name: str
+    url: str
+    digest: Optional[str] = None
+    path: Optional[str] = None
+    size: int = 0
+
+
+class CatalogMirror:
+    """
+    Prefetches and serves DATASETS files from a local content-addressed store.
+    """
+
+    def __init__(self, catalog: Optional[Dict] = None, store_dir: Optional[str] = None,
+                 quota_bytes: Optional[int] = None, refresh_interval: Optional[float] = None,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize the mirror.
+
+        Args:
+            catalog (Optional[Dict]): Catalog to mirror (defaults to DATASETS).
+            store_dir (Optional[str]): Store location (defaults to Config.CATALOG_STORE_DIR).
+            quota_bytes (Optional[int]): Disk quota for mirrored objects.
+            refresh_interval (Optional[float]): Seconds between background refreshes.
+            session (Optional[requests.Session]): HTTP session (defaults to the shared one).
+        """
+        self.catalog = catalog if catalog is not None else DATASETS
+        self.store_dir = store_dir or Config.CATALOG_STORE_DIR
+        self.quota_bytes = quota_bytes or Config.CATALOG_QUOTA_BYTES
+        self.refresh_interval = refresh_interval or Config.CATALOG_REFRESH_INTERVAL
+        self.session = session or get_http_session()
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # Case-insensitive keyword -> catalog key
+        self._keywords = {key.casefold(): key for key in self.catalog}
+
+        self._lock = threading.Lock()
+        # One fetch per URL at a time (background refresh vs. a cold request)
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._db = sqlite3.connect(os.path.join(self.store_dir, "mirror.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, digest TEXT, etag TEXT, last_modified TEXT, checked_at REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL)"
+        )
+        self._db.commit()
+        self._counters = {
+            "hits": 0, "cold_fetches": 0, "revalidated": 0, "updated": 0,
+            "evictions": 0, "refresh_errors": 0,
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------------------------------------------------
+    # Serving
+    # ---------------------------------------------------------
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Returns the catalog key text refers to (case-insensitive), if any.
+        """
+        return self._keywords.get(text.strip().casefold())
+
+    def files(self, key: str, fetch_missing: bool = True) -> List[MirroredFile]:
+        """
+        Returns the files of a catalog entry, fetching any not yet mirrored (blocking).
+
+        Args:
+            key (str): Catalog key (see match()).
+            fetch_missing (bool): Fetch files missing from the store from the origin.
+
+        Returns:
+            List[MirroredFile]: Files in catalog order; unmirrored ones have no path.
+        """
+        result = []
+        for item in self.catalog[key]["files"]:
+            mirrored = self._local(item["name"], item["url"])
+            if mirrored.path is None and fetch_missing:
+                self._counters["cold_fetches"] += 1
+                try:
+                    self.fetch(item["url"])
+                except Exception as e:
+                    logger.error(f"❌ Catalog fetch failed for {item['url']}: {e}")
+                mirrored = self._local(item["name"], item["url"])
+            elif mirrored.path is not None:
+                self._counters["hits"] += 1
+            if mirrored.digest:
+                self._touch(mirrored.digest)
+            result.append(mirrored)
+        return result
+
+    def describe(self, key: str) -> str:
+        """
+        Catalog description for key.
+        """
+        return self.catalog[key].get("description", key)
+
+    # ---------------------------------------------------------
+    # Mirroring
+    # ---------------------------------------------------------
+
+    def refresh(self):
+        """
+        Revalidates every catalog file, most recently served first, within the quota.
+        """
+        started = time.monotonic()
+        for url in self._urls_by_recency():
+            if self._stop.is_set():
+                return
+            known = self._row(url)
+            if (known is None or known[0] is None) and self._used_bytes() >= self.quota_bytes:
+                logger.info(f"💾 Catalog store is at its quota; not prefetching {url}")
+                continue
+            try:
+                self.fetch(url)
+            except Exception as e:
+                self._counters["refresh_errors"] += 1
+                logger.warning(f"⚠️ Catalog refresh failed for {url}: {e}")
+        logger.info(f"🔄 Catalog mirror refreshed in {time.monotonic() - started:.1f}s")
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        Fetches or revalidates one URL into the store.
+
+        Args:
+            url (str): Origin URL.
+
+        Returns:
+            Optional[str]: Digest of the current content.
+        """
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(url, threading.Lock())
+        with fetch_lock:
+            known = self._row(url)
+            headers = {}
+            if known and known[0] and os.path.exists(self._object_path(known[0])):
+                if known[1]:
+                    headers["If-None-Match"] = known[1]
+                if known[2]:
+                    headers["If-Modified-Since"] = known[2]
+
+            timeout = (Config.DOWNLOAD_CONNECT_TIMEOUT, Config.DOWNLOAD_READ_TIMEOUT)
+            with self.session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304:
+                    self._counters["revalidated"] += 1
+                    with self._lock:
+                        self._db.execute("UPDATE urls SET checked_at = ? WHERE url = ?", (time.time(), url))
+                        self._db.commit()
+                    return known[0]
+                response.raise_for_status()
+                digest, size = self._store(response)
+
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO urls (url, digest, etag, last_modified, checked_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, digest, response.headers.get("ETag"), response.headers.get("Last-Modified"), time.time())
+                )
+                self._db.execute(
+                    "INSERT OR IGNORE INTO objects (digest, size, last_access) VALUES (?, ?, ?)",
+                    (digest, size, time.time())
+                )
+                self._db.commit()
+            self._counters["updated"] += 1
+            if known and known[0] and known[0] != digest:
+                logger.info(f"🆕 Catalog file changed upstream: {url}")
+            self._collect_garbage(protect=digest)
+            return digest
+
+    def _store(self, response: requests.Response):
+        """
+        Streams a response body into the store, returning (digest, size).
+        """
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=COPY_BUFSIZE):
+                    f.write(chunk)
+                    sha.update(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            path = self._object_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def _collect_garbage(self, protect: Optional[str] = None):
+        """
+        Drops unreferenced objects, then evicts least recently served ones over the quota.
+        """
+        with self._lock:
+            referenced = "SELECT digest FROM urls WHERE digest IS NOT NULL"
+            victims = [row[0] for row in self._db.execute(
+                f"SELECT digest FROM objects WHERE digest NOT IN ({referenced})"
+            )]
+            live = self._db.execute(
+                f"SELECT digest, size FROM objects WHERE digest IN ({referenced}) ORDER BY last_access ASC"
+            ).fetchall()
+            used = sum(size for _, size in live)
+            for digest, size in live:
+                if used <= self.quota_bytes:
+                    break
+                if digest == protect:
+                    continue
+                victims.append(digest)
+                used -= size
+                self._counters["evictions"] += 1
+
+            for digest in victims:
+                self._db.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                # Forget validators too: the next fetch must download the body
+                self._db.execute(
+                    "UPDATE urls SET digest = NULL, etag = NULL, last_modified = NULL WHERE digest = ?", (digest,)
+                )
+            self._db.commit()
+
+        for digest in victims:
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ Failed to remove catalog object {digest[:12]}: {e}")
+
+    # ---------------------------------------------------------
+    # Background schedule
+    # ---------------------------------------------------------
+
+    def start(self):
+        """
+        Starts the background thread (refresh now, then every refresh_interval).
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread and closes the database.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            self._db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Catalog refresh crashed: {e}", exc_info=True)
+            self._stop.wait(self.refresh_interval)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit/fetch/eviction counters and store usage.
+        """
+        with self._lock:
+            objects, used = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            stats = dict(self._counters)
+        stats.update({"objects": objects, "bytes": used, "quota_bytes": self.quota_bytes})
+        return stats
+
+    # ---------------------------------------------------------
+    # Helpers
+    # ---------------------------------------------------------
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _row(self, url: str):
+        with self._lock:
+            return self._db.execute(
+                "SELECT digest, etag, last_modified FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _local(self, name: str, url: str) -> MirroredFile:
+        known = self._row(url)
+        if known and known[0]:
+            path = self._object_path(known[0])
+            if os.path.exists(path):
+                return MirroredFile(name, url, known[0], path, os.path.getsize(path))
+        return MirroredFile(name, url)
+
+    def _touch(self, digest: str):
+        with self._lock:
+            self._db.execute("UPDATE objects SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            self._db.commit()
+
+    def _used_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _urls_by_recency(self) -> List[str]:
+        """
+        Catalog URLs, most recently served first (never-served ones last, in catalog order).
+        """
+        urls = list(dict.fromkeys(item["url"] for entry in self.catalog.values() for item in entry["files"]))
+        with self._lock:
+            access = dict(self._db.execute(
+                "SELECT urls.url, objects.last_access FROM urls JOIN objects ON urls.digest = objects.digest"
+            ).fetchall())
+        return sorted(urls, key=lambda url: -(access.get(url) or 0))
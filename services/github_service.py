@@ -4,27 +4,43 @@ Service for interacting with the GitHub API.
 
 import requests
 import logging
-from typing import List, Dict
+from itertools import islice
+from typing import Any, Iterator, List, Dict, Optional
 from config import Config
+from utils.http_client import get_http_session
+from utils.rate_limiter import ProviderThrottled, RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+GITHUB_MAX_PER_PAGE = 100
+# The search API never returns more than this many results per query
+GITHUB_MAX_RESULTS = 1000
+
 class GitHubService:
     """
     Handles interactions with GitHub API for repository searching.
     """
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, api_url: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         """
         Initialize GitHub service with options auth headers.
+
+        Args:
+            session (Optional[requests.Session]): HTTP session to use (defaults to the shared pool).
+            api_url (Optional[str]): API base URL (defaults to Config.GITHUB_API_URL).
+            rate_limiter (Optional[RateLimiter]): Limiter to use (defaults to the shared one).
         """
+        self.session = session or get_http_session()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.api_url = (api_url or Config.GITHUB_API_URL).rstrip("/")
         self.headers = {
             "Accept": "application/vnd.github.v3+json"
         }
         if Config.GITHUB_TOKEN:
             self.headers["Authorization"] = f"token {Config.GITHUB_TOKEN}"
 
-    def search_repositories(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    def search_repositories(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
         Search for repositories on GitHub.
 
@@ -33,44 +49,79 @@ class GitHubService:
             max_results (int): Maximum number of results to return.
 
         Returns:
-            List[Dict[str, str]]: A list of dictionaries containing title and url.
+            List[Dict[str, Any]]: Dictionaries with platform, title, url, stars and forks.
+
+        Raises:
+            ProviderThrottled: If GitHub's rate limit is exhausted.
         """
-        url = "https://api.github.com/search/repositories"
+        try:
+            return list(islice(self.iter_repositories(query, per_page=max_results), max_results))
+        except ProviderThrottled:
+            raise
+        except requests.RequestException as e:
+            logger.error(f"Network error searching GitHub repositories: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Unexpected error searching GitHub repositories: {e}", exc_info=True)
+            return []
+
+    def iter_repositories(self, query: str, start: int = 0,
+                          per_page: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yields GitHub results, requesting one search page at a time.
+
+        Args:
+            query (str): The search query.
+            start (int): Number of leading results to skip (resumes at the page containing it).
+            per_page (Optional[int]): Results per request (defaults to Config.SEARCH_PAGE_SIZE, max 100).
+
+        Yields:
+            Dict[str, Any]: Results in the same shape as search_repositories().
+
+        Raises:
+            ProviderThrottled: If GitHub's rate limit is exhausted.
+            requests.RequestException: On network errors.
+        """
+        url = f"{self.api_url}/search/repositories"
+        per_page = min(per_page or Config.SEARCH_PAGE_SIZE, GITHUB_MAX_PER_PAGE)
+        page, skip = divmod(start, per_page)
+        page += 1
         # Optimize query for dataset-like repos
-        q_enhanced = f"{query} topic:dataset OR topic:data" 
-        
         params = {
-            "q": q_enhanced,
+            "q": f"{query} topic:dataset OR topic:data",
             "sort": "stars",
             "order": "desc",
-            "per_page": max_results
+            "per_page": per_page,
         }
-        
-        try:
-            # First attempt: Specific dataset query
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Second attempt: Broaden if no results
-            if not data.get("items"):
-                 params["q"] = f"{query} topic:machine-learning"
-                 response = requests.get(url, headers=self.headers, params=params, timeout=10)
-                 response.raise_for_status()
-                 data = response.json()
 
-            results = []
-            for item in data.get("items", []):
-                results.append({
+        first_request = True
+        while (page - 1) * per_page < GITHUB_MAX_RESULTS:
+            params["page"] = page
+            items = self._get(url, params).json().get("items", [])
+            # Broaden if the dataset query has nothing here (a resumed stream may have been broadened before)
+            if not items and first_request:
+                params["q"] = f"{query} topic:machine-learning"
+                first_request = False
+                continue
+            first_request = False
+            for item in items[skip:]:
+                yield {
                     "platform": "GitHub",
                     "title": item["full_name"],
                     "url": item["html_url"],
-                })
-            return results
-            
-        except requests.RequestException as e:
-            logger.error(f"Network error searching GitHub repositories: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error searching GitHub repositories: {e}", exc_info=True)
-            return []
+                    "stars": item.get("stargazers_count", 0),
+                    "forks": item.get("forks_count", 0),
+                }
+            if len(items) < per_page:
+                return
+            page, skip = page + 1, 0
+
+    def _get(self, url: str, params: Dict) -> requests.Response:
+        """
+        Rate-limited GET that feeds quota headers back to the limiter.
+        """
+        self.rate_limiter.acquire("github")
+        response = self.session.get(url, headers=self.headers, params=params, timeout=10)
+        self.rate_limiter.check_response("github", response.status_code, response.headers)
+        response.raise_for_status()
+        return response
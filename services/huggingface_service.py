@@ -1,11 +1,15 @@
 """
 Service for interacting with the HuggingFace Hub API.
+
+huggingface_hub is imported on first use (or by warm()) rather than at
+startup.
 """
 
 import logging
-from typing import List, Dict
-from huggingface_hub import HfApi, list_datasets
+from itertools import count
+from typing import Any, Iterator, List, Dict, Optional
 from config import Config
+from utils.rate_limiter import RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +18,38 @@ class HuggingFaceService:
     Handles interactions with HuggingFace Hub for dataset searching.
     """
     
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None):
         """
-        Initialize the HuggingFace API client.
+        Initialize the service; the HuggingFace API client is created on first use.
+
+        Args:
+            rate_limiter (Optional[RateLimiter]): Limiter to use (defaults to the shared one).
         """
-        self.api = HfApi(token=Config.HF_TOKEN)
         self.token = Config.HF_TOKEN
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._api = None
+
+    @property
+    def api(self):
+        """
+        The HfApi client (importing huggingface_hub the first time).
+        """
+        if self._api is None:
+            from huggingface_hub import HfApi
+            self._api = HfApi(token=self.token)
+        return self._api
 
-    def search_datasets(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    def warm(self) -> bool:
+        """
+        Imports huggingface_hub ahead of the first search.
+
+        Returns:
+            bool: Always True (the Hub needs no authentication step).
+        """
+        from huggingface_hub.utils import paginate  # noqa: F401
+        return self.api is not None
+
+    def search_datasets(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
         Search for datasets on HuggingFace Hub.
 
@@ -30,29 +58,70 @@ class HuggingFaceService:
             max_results (int): Maximum number of results to return.
 
         Returns:
-            List[Dict[str, str]]: A list of dictionaries containing title and url.
+            List[Dict[str, Any]]: Dictionaries with platform, title, url, downloads and likes.
+
+        Raises:
+            ProviderThrottled: If the Hub is rate limiting us.
         """
+        self.rate_limiter.acquire("hf")
         try:
             # Use robust search params; 'direction' is removed as it's deprecated elsewhere
-            datasets = list_datasets(
+            datasets = self.api.list_datasets(
                 search=query, 
                 limit=max_results, 
                 token=self.token,
                 sort="downloads"
             )
-            
-            results = []
-            for ds in datasets:
-                ds_id = getattr(ds, 'id', 'Unknown')
-                url = f"https://huggingface.co/datasets/{ds_id}"
-                
-                results.append({
-                    "platform": "HuggingFace",
-                    "title": ds_id,
-                    "url": url
-                })
-            return results
+            return [self._to_result(getattr(ds, 'id', 'Unknown'), getattr(ds, 'downloads', 0), getattr(ds, 'likes', 0)) for ds in datasets]
             
         except Exception as e:
+            self.rate_limiter.check_exception("hf", e)
             logger.error(f"Error searching HF datasets: {e}", exc_info=True)
             return []
+
+    def iter_datasets(self, query: str, start: int = 0, per_page: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yields HuggingFace results, following the Hub's Link-header pages.
+
+        Args:
+            query (str): The search query.
+            start (int): Number of leading results to skip (the Hub has no offset, so they are read and dropped).
+            per_page (Optional[int]): Results per Hub request (defaults to Config.SEARCH_PAGE_SIZE).
+
+        Yields:
+            Dict[str, Any]: Results in the same shape as search_datasets().
+
+        Raises:
+            ProviderThrottled: If the Hub is rate limiting us.
+        """
+        from huggingface_hub.utils import build_hf_headers, paginate
+        per_page = per_page or Config.SEARCH_PAGE_SIZE
+        params = {"search": query, "sort": "downloads", "limit": per_page}
+        # paginate() only requests the next page once the previous one is consumed
+        items = paginate(f"{self.api.endpoint}/api/datasets", params=params,
+                         headers=build_hf_headers(token=self.token))
+        for position in count():
+            if position % per_page == 0:
+                self.rate_limiter.acquire("hf")
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            except Exception as e:
+                self.rate_limiter.check_exception("hf", e)
+                raise
+            if position >= start:
+                yield self._to_result(item.get("id", "Unknown"), item.get("downloads"), item.get("likes"))
+
+    @staticmethod
+    def _to_result(ds_id: str, downloads: Optional[int], likes: Optional[int]) -> Dict[str, Any]:
+        """
+        Builds a result dictionary for a Hub dataset id.
+        """
+        return {
+            "platform": "HuggingFace",
+            "title": ds_id,
+            "url": f"https://huggingface.co/datasets/{ds_id}",
+            "downloads": downloads or 0,
+            "likes": likes or 0,
+        }
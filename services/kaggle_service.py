@@ -1,33 +1,64 @@
 """
 Service for interacting with the Kaggle API.
+
+The SDK is imported and authenticated on first use (or by warm()): importing
+it alone takes a large share of the bot's startup time.
 """
 
 import logging
-from typing import List, Dict, Any
-from kaggle.api.kaggle_api_extended import KaggleApi
+import threading
+from itertools import islice
+from typing import Iterator, List, Dict, Any, Optional
+from utils.rate_limiter import ProviderThrottled, RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+# Results per dataset_list() page (fixed by the API)
+KAGGLE_PAGE_SIZE = 20
+
 class KaggleService:
     """
     Handles interactions with Kaggle API for dataset searching.
     """
     
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None):
         """
-        Initialize and authenticate the Kaggle API client.
+        Initialize the service; the API client is created and authenticated on first use.
+
+        Args:
+            rate_limiter (Optional[RateLimiter]): Limiter to use (defaults to the shared one).
         """
-        self.api = KaggleApi()
-        self.available = False
-        try:
-            self.api.authenticate()
-            logger.info("Kaggle API authenticated successfully.")
-            self.available = True
-        except Exception as e:
-            logger.error(f"Failed to authenticate Kaggle API: {e}")
-            self.available = False
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.api = None
+        # None until authentication has been attempted
+        self.available: Optional[bool] = None
+        self._init_lock = threading.Lock()
 
-    def search_datasets(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    def warm(self) -> bool:
+        """
+        Imports the SDK and authenticates the API client (once; blocking).
+
+        Returns:
+            bool: Whether the Kaggle API is usable.
+        """
+        if self.available is not None:
+            return self.available
+        with self._init_lock:
+            if self.available is None:
+                try:
+                    from kaggle.api.kaggle_api_extended import KaggleApi
+                    api = KaggleApi()
+                    api.authenticate()
+                    self.api = api
+                    logger.info("Kaggle API authenticated successfully.")
+                    self.available = True
+                # The SDK calls sys.exit() when it finds no credentials
+                except (Exception, SystemExit) as e:
+                    logger.error(f"Failed to authenticate Kaggle API: {e!r}")
+                    self.available = False
+        return self.available
+
+    def search_datasets(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
         Search for datasets on Kaggle.
 
@@ -36,31 +67,68 @@ class KaggleService:
             max_results (int): Maximum number of results to return.
 
         Returns:
-            List[Dict[str, str]]: A list of dictionaries containing title and url.
+            List[Dict[str, Any]]: Dictionaries with platform, title, url, downloads and votes.
+
+        Raises:
+            ProviderThrottled: If Kaggle is rate limiting us.
         """
-        if not self.available:
+        if not self.warm():
             logger.warning("Kaggle service unavailable, skipping search.")
             return []
         
         try:
-            # Using sort_by='votes' for better quality default
-            datasets = self.api.dataset_list(search=query, sort_by='votes', page=1)
-            results = []
-            
-            # Use strict slicing to ensure we respect max_results
-            for ds in datasets[:max_results]:
-                # Safe attribute access with defaults
-                ref = getattr(ds, 'ref', '')
-                title = getattr(ds, 'title', ref)
-                url = getattr(ds, 'url', f"https://www.kaggle.com/{ref}")
-                
-                results.append({
-                    "platform": "Kaggle",
-                    "title": title,
-                    "url": url
-                })
-            return results
-            
+            return list(islice(self.iter_datasets(query), max_results))
+        except ProviderThrottled:
+            raise
         except Exception as e:
             logger.error(f"Error searching Kaggle datasets: {e}", exc_info=True)
             return []
+
+    def iter_datasets(self, query: str, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yields Kaggle results, fetching one API page at a time.
+
+        Args:
+            query (str): The search query.
+            start (int): Number of leading results to skip.
+
+        Yields:
+            Dict[str, Any]: Results in the same shape as search_datasets().
+
+        Raises:
+            ProviderThrottled: If Kaggle is rate limiting us.
+        """
+        if not self.warm():
+            return
+        # Kaggle's page size is fixed, so an offset resumes at its page
+        page, skip = divmod(start, KAGGLE_PAGE_SIZE)
+        page += 1
+        while True:
+            self.rate_limiter.acquire("kaggle")
+            try:
+                # Using sort_by='votes' for better quality default
+                datasets = self.api.dataset_list(search=query, sort_by='votes', page=page) or []
+            except Exception as e:
+                self.rate_limiter.check_exception("kaggle", e)
+                raise
+            for ds in datasets[skip:]:
+                yield self._to_result(ds)
+            if len(datasets) < KAGGLE_PAGE_SIZE:
+                return
+            page, skip = page + 1, 0
+
+    @staticmethod
+    def _to_result(ds) -> Dict[str, Any]:
+        """
+        Converts an SDK dataset object into a result dictionary.
+        """
+        # Safe attribute access with defaults
+        ref = getattr(ds, 'ref', '')
+        return {
+            "platform": "Kaggle",
+            "title": getattr(ds, 'title', ref),
+            "url": getattr(ds, 'url', f"https://www.kaggle.com/{ref}"),
+            # Older SDKs expose camelCase counters
+            "downloads": getattr(ds, 'download_count', None) or getattr(ds, 'downloadCount', 0) or 0,
+            "votes": getattr(ds, 'vote_count', None) or getattr(ds, 'voteCount', 0) or 0,
+        }
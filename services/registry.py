@@ -0,0 +1,143 @@
+"""
+Lazy registry of the search provider services.
+
+Importing the provider SDKs (kaggle, huggingface_hub) and authenticating
+used to make up most of the bot's startup time. The registry only records
+where each service lives; a service module is imported and its class built
+on first lookup, and the services themselves defer their SDK import and
+authentication to their first call. warm() does that expensive part in a
+background thread once the bot is already taking updates, so the first
+search rarely pays for it.
+
+The registry is a read-only mapping, so it can stand in for the plain
+services dict in bot_data["services"] and the SearchAggregator.
+"""
+
+import importlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Provider key -> "module:Class"
+SERVICE_FACTORIES = {
+    "kaggle": "services.kaggle_service:KaggleService",
+    "hf": "services.huggingface_service:HuggingFaceService",
+    "github": "services.github_service:GitHubService",
+}
+
+Factory = Union[str, Callable[[], object]]
+
+
+def _resolve(factory: Factory) -> Callable[[], object]:
+    """
+    Turns a "module:Class" path into a callable (importing the module).
+    """
+    if callable(factory):
+        return factory
+    module_name, _, attr = factory.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class ServiceRegistry(Mapping):
+    """
+    Mapping of provider key to service, building each service on first access.
+    """
+
+    def __init__(self, factories: Optional[Dict[str, Factory]] = None):
+        """
+        Initialize the registry (nothing is imported or built yet).
+
+        Args:
+            factories (Optional[Dict[str, Factory]]): Key -> "module:Class" path or
+                zero-argument callable (defaults to SERVICE_FACTORIES).
+        """
+        self._factories: Dict[str, Factory] = dict(SERVICE_FACTORIES if factories is None else factories)
+        self._services: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        # key -> {"build_ms": ..., "warm_ms": ...}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._warm_thread: Optional[threading.Thread] = None
+
+    def register(self, key: str, factory: Factory):
+        """
+        Adds (or replaces) a provider factory; any service already built for key is dropped.
+        """
+        with self._lock:
+            self._factories[key] = factory
+            self._services.pop(key, None)
+
+    def __getitem__(self, key: str) -> object:
+        service = self._services.get(key)
+        if service is not None:
+            return service
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                factory = self._factories[key]
+                started = time.perf_counter()
+                service = _resolve(factory)()
+                self._timings.setdefault(key, {})["build_ms"] = (time.perf_counter() - started) * 1000
+                self._services[key] = service
+        return service
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def is_loaded(self, key: str) -> bool:
+        """
+        Whether the service for key has been built.
+        """
+        return key in self._services
+
+    def warm(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Builds every service and runs its warm() hook (SDK import, authentication).
+
+        Args:
+            background (bool): Run in a daemon thread and return it, instead of blocking.
+
+        Returns:
+            Optional[threading.Thread]: The warm-up thread when running in the background.
+        """
+        if not background:
+            self._warm_all()
+            return None
+        if self._warm_thread is None or not self._warm_thread.is_alive():
+            self._warm_thread = threading.Thread(target=self._warm_all, name="service-warmup", daemon=True)
+            self._warm_thread.start()
+        return self._warm_thread
+
+    def _warm_all(self):
+        started = time.perf_counter()
+        for key in list(self._factories):
+            try:
+                service = self[key]
+                warm = getattr(service, "warm", None)
+                if warm is not None:
+                    warm_started = time.perf_counter()
+                    warm()
+                    self._timings.setdefault(key, {})["warm_ms"] = (time.perf_counter() - warm_started) * 1000
+            except Exception as e:
+                logger.error(f"❌ Warming up the {key} service failed: {e}", exc_info=True)
+        logger.info(f"🔥 Provider services warmed up in {time.perf_counter() - started:.2f}s")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns per-provider load state and build/warm-up durations in milliseconds.
+        """
+        report = {}
+        for key in self._factories:
+            service = self._services.get(key)
+            entry = {"loaded": service is not None}
+            if service is not None:
+                entry["available"] = getattr(service, "available", True)
+            entry.update({name: round(value, 1) for name, value in self._timings.get(key, {}).items()})
+            report[key] = entry
+        return report
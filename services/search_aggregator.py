@@ -0,0 +1,388 @@
+"""
+Concurrent search fan-out across Kaggle, HuggingFace and GitHub.
+
+The provider clients are synchronous, so every call is pushed onto a bounded
+thread pool and awaited with a per-provider deadline. The event loop stays
+free for other updates, and a slow provider is dropped from the reply instead
+of holding up the whole response. Results are served from the shared
+SearchCache when one is configured; identical concurrent queries share one
+upstream call per provider, and expired entries are served stale while a
+background refresh runs. With a shared StateBackend (several workers), that
+coalescing extends across processes: one worker makes the call under a lock
+and the others wait for its result in the shared cache. With a LocalIndex
+configured, confident local matches are answered without any provider call,
+and live results feed the index. With a CursorStore configured, live first
+pages are read from the providers' lazy result streams, which stay open for
+"Next" pages (see utils.pagination).
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+from config import Config
+from services.local_index import LocalIndex
+from utils.cache import SearchCache, make_key
+from utils.pagination import CursorStore, ProviderCursor, ResultPage, SearchCursor
+from utils.ranking import merge_results
+from utils.metrics import PROVIDER_CALLS, PROVIDER_IN_FLIGHT, PROVIDER_SECONDS
+from utils.rate_limiter import ProviderThrottled, get_rate_limiter
+from utils.singleflight import SingleFlight
+from utils.state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+# How often a worker waiting on another worker's provider call checks for its result
+FLIGHT_POLL_INTERVAL = 0.05
+
+# (service key in bot_data["services"], search method, lazy iterator method, display name)
+PROVIDERS = (
+    ("kaggle", "search_datasets", "iter_datasets", "Kaggle"),
+    ("hf", "search_datasets", "iter_datasets", "HuggingFace"),
+    ("github", "search_repositories", "iter_repositories", "GitHub"),
+)
+
+
+@dataclass
+class SearchOutcome:
+    """
+    Aggregated result of one fan-out search.
+
+    Attributes:
+        by_provider (Dict[str, List[Dict[str, str]]]): Results per provider key, in provider order.
+        timed_out (List[str]): Display names of providers that missed their deadline.
+        throttled (List[str]): Display names of providers that are rate limited.
+        source (str): "live" for a provider fan-out, "local" when answered from the LocalIndex.
+        query (str): The query the outcome answers (used for ranking).
+    """
+    by_provider: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    throttled: List[str] = field(default_factory=list)
+    source: str = "live"
+    query: str = ""
+
+    @property
+    def results(self) -> List[Dict[str, str]]:
+        """
+        Flattened results in provider order (Kaggle, HuggingFace, GitHub).
+        """
+        merged = []
+        for items in self.by_provider.values():
+            merged.extend(items)
+        return merged
+
+    def ranked(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Deduplicated results ranked across providers (see utils.ranking).
+
+        Args:
+            limit (Optional[int]): Maximum results to return.
+
+        Returns:
+            List[Dict[str, Any]]: Best results first.
+        """
+        return merge_results(self.by_provider, self.query, limit)
+
+
+class SearchAggregator:
+    """
+    Runs all provider searches in parallel off the event loop.
+    """
+
+    def __init__(self, services: Dict[str, object], max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None, cache: Optional[SearchCache] = None,
+                 index: Optional[LocalIndex] = None, cursors: Optional[CursorStore] = None,
+                 state: Optional[StateBackend] = None):
+        """
+        Initialize the aggregator.
+
+        Args:
+            services (Dict[str, object]): Provider services keyed like bot_data["services"].
+            max_workers (Optional[int]): Upper bound on concurrent provider calls.
+            timeout (Optional[float]): Per-provider deadline in seconds.
+            cache (Optional[SearchCache]): Shared result cache (disabled if None).
+            index (Optional[LocalIndex]): Local full-text index consulted first (disabled if None).
+            cursors (Optional[CursorStore]): Store for "Next" page cursors (pagination disabled if None).
+            state (Optional[StateBackend]): Shared backend for cross-worker call locks
+                (only used when it is shared and a cache is configured).
+        """
+        self.services = services
+        self.cache = cache
+        self.index = index
+        self.cursors = cursors
+        self.flights = SingleFlight()
+        self.state = state if state is not None and state.shared and cache is not None else None
+        # provider key -> (outcome, time.time()) of its latest call, for /healthz
+        self.last_outcome: Dict[str, tuple] = {}
+        self.timeout = timeout if timeout is not None else Config.SEARCH_PROVIDER_TIMEOUT
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.SEARCH_MAX_WORKERS,
+            thread_name_prefix="search"
+        )
+
+    async def search(self, query: str, max_results: int = 5) -> SearchOutcome:
+        """
+        Query every configured provider concurrently.
+
+        Args:
+            query (str): The search query.
+            max_results (int): Maximum number of results per provider.
+
+        Returns:
+            SearchOutcome: Results per provider plus the providers that timed out or were throttled.
+        """
+        if self.index is not None:
+            # Usually sub-millisecond, but it waits out any add() batch holding the index lock
+            match = await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(self.index.search, query, limit=max_results * len(PROVIDERS))
+            )
+            if match.confident:
+                logger.info(f"⚡ Answered '{query}' from the local index in {match.elapsed_ms:.2f}ms")
+                return SearchOutcome(by_provider={"local": match.results}, source="local", query=query)
+
+        calls = []
+        for key, method, iter_method, name in PROVIDERS:
+            service = self.services.get(key)
+            if service:
+                func = getattr(service, method)
+                if self.cursors is not None and hasattr(service, iter_method):
+                    func = functools.partial(self._first_page, key)
+                calls.append((key, name, self._fetch(key, func, query, max_results)))
+
+        gathered = await asyncio.gather(*(call for _, _, call in calls), return_exceptions=True)
+
+        outcome = SearchOutcome(query=query)
+        for (key, name, _), result in zip(calls, gathered):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"⏱️ {name} search for '{query}' exceeded {self.timeout}s, dropping it.")
+                PROVIDER_CALLS.inc(provider=key, outcome="timeout")
+                outcome.timed_out.append(name)
+            elif isinstance(result, ProviderThrottled):
+                logger.warning(f"🚦 {name} search for '{query}' throttled: {result}")
+                outcome.throttled.append(name)
+            elif isinstance(result, Exception):
+                logger.error(f"Unexpected error from {name} search: {result}", exc_info=result)
+            else:
+                outcome.by_provider[key] = result
+
+        if self.index is not None and outcome.by_provider:
+            asyncio.get_running_loop().run_in_executor(self.executor, self.index.add, outcome.results, query)
+        return outcome
+
+    async def _fetch(self, key: str, func, query: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Serve one provider from the cache, falling back to a coalesced live call.
+        """
+        cache_key = make_key(key, query, max_results)
+        if self.cache is not None:
+            cached, fresh = self.cache.lookup_memory(cache_key)
+            if cached is None and self.cache.has_store:
+                # The shared tier can wait on other workers' SQLite writes: not on the loop
+                cached, fresh = await asyncio.to_thread(self.cache.lookup, cache_key)
+            if cached is not None:
+                if not fresh:
+                    self.flights.start(cache_key, lambda: self._load(key, cache_key, func, query, max_results))
+                return cached
+
+        # The deadline applies per waiter; the shared call keeps running and
+        # still fills the cache for the next request if this one gives up.
+        call = self.flights.do(cache_key, lambda: self._load(key, cache_key, func, query, max_results))
+        return await asyncio.wait_for(call, timeout=self.timeout)
+
+    async def _load(self, key: str, cache_key: str, func, query: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Run one blocking provider call on the pool and store the result.
+        """
+        loop = asyncio.get_running_loop()
+        if self.state is not None:
+            return await loop.run_in_executor(self.executor, self._call_shared, key, cache_key, func,
+                                              query, max_results)
+        results = await loop.run_in_executor(self.executor, self._call, key, func, query, max_results)
+        # Services swallow errors and return [], so empty lists are not cached
+        if results and self.cache is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, results)
+        return results
+
+    def _call_shared(self, key: str, cache_key: str, func, *args):
+        """
+        Runs one provider call unless another worker is already making it, in
+        which case waits (up to the deadline) for its result in the shared cache.
+        """
+        lock = f"flight:{cache_key}"
+        token = self.state.try_lock(lock, ttl=self.timeout)
+        if token is None:
+            deadline = time.monotonic() + self.timeout
+            while self.state.is_locked(lock) and time.monotonic() < deadline:
+                time.sleep(FLIGHT_POLL_INTERVAL)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            # The other worker failed, found nothing or is stuck: call the provider ourselves
+            return self._call(key, func, *args)
+        try:
+            results = self._call(key, func, *args)
+            # Stored before unlocking, so waiting workers find it
+            if results:
+                self.cache.set(cache_key, results)
+            return results
+        finally:
+            self.state.unlock(lock, token)
+
+    def _call(self, key: str, func, *args):
+        """
+        Runs one blocking provider call, recording its duration and outcome.
+        """
+        outcome = "error"
+        try:
+            with PROVIDER_IN_FLIGHT.track_inprogress(provider=key), PROVIDER_SECONDS.time(provider=key):
+                result = func(*args)
+            outcome = "ok"
+            return result
+        except ProviderThrottled:
+            outcome = "throttled"
+            raise
+        finally:
+            PROVIDER_CALLS.inc(provider=key, outcome=outcome)
+            self.last_outcome[key] = (outcome, time.time())
+
+    def provider_health(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Reports whether each configured provider can currently serve searches.
+
+        A provider is unavailable if its service says so (e.g. Kaggle failed to
+        authenticate; one that has not tried yet counts as available), if it is
+        rate limiting us, or if its latest call failed within
+        Config.HEALTH_ERROR_WINDOW.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Display name -> available, reason and last call details.
+        """
+        limiter = get_rate_limiter()
+        report = {}
+        for key, _, _, name in PROVIDERS:
+            service = self.services.get(key)
+            if service is None:
+                continue
+            outcome, at = self.last_outcome.get(key, (None, None))
+            age = time.time() - at if at else None
+            blocked_for = limiter.blocked_for(key)
+            reason = None
+            if getattr(service, "available", True) is False:
+                reason = "unavailable"
+            elif blocked_for > 0:
+                reason = "rate_limited"
+            elif outcome == "error" and age < Config.HEALTH_ERROR_WINDOW:
+                reason = "failing"
+            report[name] = {
+                "available": reason is None,
+                "reason": reason,
+                "last_outcome": outcome,
+                "last_call_age": round(age, 1) if age is not None else None,
+                "blocked_for": round(blocked_for, 1),
+            }
+        return report
+
+    def _first_page(self, key: str, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """
+        Reads a first page from the provider's lazy stream and parks the open stream for "Next".
+        """
+        iterator = self._open_iterator(key, query, 0)
+        # Errors propagate (unlike search_*), so they are counted and logged per provider by search()
+        results = list(islice(iterator, max_results))
+        if len(results) == max_results:
+            self.cursors.park(make_key(key, query, max_results), iterator)
+        return results
+
+    def _open_iterator(self, key: str, query: str, start: int) -> Iterator[Dict[str, Any]]:
+        """
+        Opens a provider's result stream at an offset.
+        """
+        service = self.services[key]
+        iter_method = next(iter_method for k, _, iter_method, _ in PROVIDERS if k == key)
+        return getattr(service, iter_method)(query, start=start)
+
+    def _resume(self, key: str, query: str, start: int) -> Iterator[Dict[str, Any]]:
+        """
+        Continues a provider stream: the parked one from a live first page, else a fresh one at start.
+        """
+        parked = self.cursors.unpark(make_key(key, query, start)) if start else None
+        return parked if parked is not None else self._open_iterator(key, query, start)
+
+    def open_cursor(self, outcome: SearchOutcome, shown: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Creates a pagination cursor for a search reply.
+
+        Args:
+            outcome (SearchOutcome): The first-page outcome.
+            shown (List[Dict[str, Any]]): Results shown on the first page.
+
+        Returns:
+            Optional[str]: Cursor token for a "Next" button, or None if pagination is disabled.
+        """
+        if self.cursors is None:
+            return None
+        shown_ids = {id(result) for result in shown}
+        providers = []
+        for key, _, iter_method, name in PROVIDERS:
+            service = self.services.get(key)
+            if not service or not hasattr(service, iter_method):
+                continue
+            fetched = outcome.by_provider.get(key, [])
+            providers.append(ProviderCursor(
+                key, name,
+                functools.partial(self._resume, key, outcome.query),
+                consumed=len(fetched),
+                # Fetched but ranked off the first page: served first on the next one
+                pending=[result for result in fetched if id(result) not in shown_ids],
+            ))
+        if not providers:
+            return None
+        return self.cursors.put(SearchCursor(outcome.query, providers, shown))
+
+    async def next_page(self, cursor: SearchCursor, size: Optional[int] = None) -> ResultPage:
+        """
+        Fetches the next page of a cursor, pulling only the missing results from each provider.
+
+        Args:
+            cursor (SearchCursor): Cursor from open_cursor() (via the CursorStore).
+            size (Optional[int]): Page size (defaults to Config.SEARCH_PAGE_SIZE).
+
+        Returns:
+            ResultPage: The page and whether more may follow.
+        """
+        size = size or Config.SEARCH_PAGE_SIZE
+        loop = asyncio.get_running_loop()
+        async with cursor.lock:
+            active = [provider for provider in cursor.providers if provider.has_more]
+            page = ResultPage(start=cursor.shown)
+            if not active:
+                return page
+            # A little over an even share, so ranking and dedup still have a choice
+            share = -(-size // len(active)) + 2
+            taken = await asyncio.gather(
+                *(loop.run_in_executor(self.executor, self._call, provider.key, provider.take, share)
+                  for provider in active),
+                return_exceptions=True
+            )
+            pulled = {}
+            for provider, result in zip(active, taken):
+                if isinstance(result, ProviderThrottled):
+                    logger.warning(f"🚦 {provider.name} page for '{cursor.query}' throttled: {result}")
+                    page.throttled.append(provider.name)
+                elif isinstance(result, Exception):
+                    logger.error(f"Unexpected error paging {provider.name}: {result}", exc_info=result)
+                else:
+                    pulled[provider.name] = result
+            page.results = cursor.assemble(pulled, size)
+            page.has_more = cursor.has_more
+        return page
+
+    def shutdown(self):
+        """
+        Release the worker pool without waiting for abandoned provider calls.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
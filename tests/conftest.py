@@ -0,0 +1,10 @@
+"""
+Shared test setup: the repo root is importable, as it is for main.py.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
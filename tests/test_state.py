@@ -0,0 +1,143 @@
+"""
+StateBackend lock semantics, for both in-tree backends.
+
+The SQLite backend is also checked across real processes, since that is
+what several bot workers sharing one state file rely on.
+"""
+
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from utils.state import KEEP, MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        state = MemoryBackend()
+    else:
+        state = SQLiteBackend(str(tmp_path / "state.sqlite3"))
+    yield state
+    state.close()
+
+
+def try_lock_elsewhere(db_path: str, name: str) -> bool:
+    """
+    Child process entry point: whether a fresh process can take the lock.
+    """
+    state = SQLiteBackend(db_path)
+    try:
+        return state.try_lock(name, ttl=5) is not None
+    finally:
+        state.close()
+
+
+def add_elsewhere(db_path: str, times: int):
+    """
+    Child process entry point: increments the shared counter times times.
+    """
+    state = SQLiteBackend(db_path)
+    for _ in range(times):
+        state.update("counter", lambda value: ((value or 0) + 1, None))
+    state.close()
+
+
+def test_holder_excludes_other_callers(backend):
+    token = backend.try_lock("build", ttl=5)
+    assert token is not None
+    assert backend.is_locked("build")
+    # Same process, no token: still someone else
+    assert backend.try_lock("build", ttl=5) is None
+
+
+def test_each_hold_gets_its_own_token(backend):
+    first = backend.try_lock("a", ttl=5)
+    second = backend.try_lock("b", ttl=5)
+    assert first != second
+    assert first.startswith(backend.owner)
+
+
+def test_token_extends_the_hold(backend):
+    token = backend.try_lock("build", ttl=0.3)
+    time.sleep(0.2)
+    assert backend.try_lock("build", ttl=0.3, token=token) == token
+    time.sleep(0.2)
+    # Would have expired without the extension
+    assert backend.is_locked("build")
+    assert backend.try_lock("build", ttl=5, token="someone:else") is None
+
+
+def test_unlock_needs_the_holders_token(backend):
+    token = backend.try_lock("build", ttl=5)
+    backend.unlock("build", "someone:else")
+    assert backend.is_locked("build")
+    backend.unlock("build", token)
+    assert not backend.is_locked("build")
+    assert backend.try_lock("build", ttl=5) is not None
+
+
+def test_stale_unlock_leaves_the_next_holder_alone(backend):
+    stale = backend.try_lock("build", ttl=0.1)
+    time.sleep(0.2)
+    current = backend.try_lock("build", ttl=5)
+    assert current is not None and current != stale
+    backend.unlock("build", stale)
+    assert backend.is_locked("build")
+
+
+def test_expired_lock_can_be_taken(backend):
+    backend.try_lock("build", ttl=0.1)
+    time.sleep(0.2)
+    assert not backend.is_locked("build")
+    assert backend.try_lock("build", ttl=5) is not None
+
+
+def test_update_keep_leaves_value_and_ttl(backend):
+    backend.set("key", "value", ttl=0.3)
+    assert backend.update("key", lambda value: (KEEP, value)) == "value"
+    time.sleep(0.4)
+    assert backend.get("key") is None
+
+
+def test_update_is_atomic_across_threads(backend):
+    def add():
+        for _ in range(100):
+            backend.update("counter", lambda value: ((value or 0) + 1, None))
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.get("counter") == 400
+
+
+def test_sqlite_lock_is_seen_by_other_processes(tmp_path):
+    db_path = str(tmp_path / "state.sqlite3")
+    state = SQLiteBackend(db_path)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        token = state.try_lock("build", ttl=5)
+        assert pool.apply(try_lock_elsewhere, (db_path, "build")) is False
+        state.unlock("build", token)
+        assert pool.apply(try_lock_elsewhere, (db_path, "build")) is True
+    # The child never unlocked: only the TTL frees a dead holder's lock
+    assert state.is_locked("build")
+    state.close()
+
+
+def test_sqlite_update_is_atomic_across_processes(tmp_path):
+    db_path = str(tmp_path / "state.sqlite3")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=add_elsewhere, args=(db_path, 50)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    state = SQLiteBackend(db_path)
+    assert state.get("counter") == 150
+    state.close()
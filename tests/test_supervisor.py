@@ -0,0 +1,157 @@
+"""
+Supervisor restart path: a replaced worker keeps receiving its partition's updates.
+
+The workers are real spawned processes running start_inbox_reader() against a
+stand-in Application; each received update id is appended to a file the test reads.
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.supervisor import Supervisor, WorkerLink, start_inbox_reader
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses SIGKILL")
+
+WAIT = 20.0
+
+
+def fake_worker(index: int, link: WorkerLink):
+    """
+    Worker entry point: records update ids in $SUPERVISOR_TEST_DIR/received.
+
+    Behaviour for testing, keyed on marker files in the same directory:
+    - "exit-once": the first incarnation exits at once, before reading anything;
+    - update id 666: the loop blocks for good (no more heartbeats).
+    """
+    folder = os.environ["SUPERVISOR_TEST_DIR"]
+    marker = os.path.join(folder, "exit-once")
+    if os.path.exists(marker):
+        os.remove(marker)
+        time.sleep(0.5)
+        os._exit(1)
+
+    async def run():
+        app = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+        stop = asyncio.Event()
+        start_inbox_reader(app, link, stop)
+        with open(os.path.join(folder, "received"), "a") as out:
+            while not stop.is_set():
+                try:
+                    update = await asyncio.wait_for(app.update_queue.get(), 0.1)
+                except asyncio.TimeoutError:
+                    continue
+                if update.update_id == 666:
+                    time.sleep(3600)
+                out.write(f"{os.getpid()} {update.update_id}\n")
+                out.flush()
+
+    asyncio.run(run())
+
+
+def received(folder) -> list:
+    path = os.path.join(folder, "received")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(map(int, line.split())) for line in f if line.strip()]
+
+
+async def wait_for(condition, timeout: float = WAIT):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    # Inherited by the spawned workers
+    monkeypatch.setenv("SUPERVISOR_TEST_DIR", str(tmp_path))
+    return str(tmp_path)
+
+
+def run_supervised(test, restart_backoff: float = 1, **options):
+    async def main():
+        supervisor = Supervisor(fake_worker, workers=1, queue_size=100, restart_backoff=restart_backoff, **options)
+        await supervisor.start()
+        try:
+            await test(supervisor)
+        finally:
+            await supervisor.stop()
+    asyncio.run(main())
+
+
+def update(update_id: int) -> dict:
+    return {"update_id": update_id}
+
+
+def test_killed_worker_is_replaced_and_keeps_receiving(folder):
+    async def test(supervisor):
+        for update_id in (1, 2, 3):
+            assert supervisor.dispatch(update(update_id))
+        await wait_for(lambda: len(received(folder)) == 3)
+        first_pid = supervisor._workers[0].process.pid
+
+        # Killed while idle in recv(), where the old queue-based reader held its read lock
+        os.kill(first_pid, signal.SIGKILL)
+        for update_id in (4, 5, 6):
+            assert supervisor.dispatch(update(update_id))
+
+        await wait_for(lambda: len(received(folder)) == 6)
+        pids = {pid for pid, _ in received(folder)[3:]}
+        assert pids and first_pid not in pids
+        assert [update_id for _, update_id in received(folder)] == [1, 2, 3, 4, 5, 6]
+        assert supervisor.stats()["restarts"] == 1
+        await wait_for(lambda: supervisor.alive() == 1)
+
+    run_supervised(test)
+
+
+def test_unacknowledged_updates_are_resent(folder):
+    open(os.path.join(folder, "exit-once"), "w").close()
+
+    async def test(supervisor):
+        # Sent to the first incarnation, which exits without reading them
+        for update_id in (1, 2, 3):
+            assert supervisor.dispatch(update(update_id))
+        await wait_for(lambda: len(received(folder)) == 3)
+        assert [update_id for _, update_id in received(folder)] == [1, 2, 3]
+        assert supervisor.stats()["replayed"] >= 1
+
+    run_supervised(test)
+
+
+def test_worker_without_heartbeats_is_killed_and_restarted(folder):
+    async def test(supervisor):
+        assert supervisor.dispatch(update(1))
+        await wait_for(lambda: len(received(folder)) == 1)
+        assert supervisor.alive() == 1
+
+        assert supervisor.dispatch(update(666))
+        await wait_for(lambda: supervisor.stats()["hung"] == 1)
+        await wait_for(lambda: supervisor.stats()["restarts"] == 1)
+        assert supervisor.dispatch(update(2))
+        await wait_for(lambda: 2 in [update_id for _, update_id in received(folder)])
+
+    run_supervised(test, heartbeat_timeout=2)
+
+
+def test_full_buffer_rejects_while_worker_is_down(folder):
+    async def test(supervisor):
+        await wait_for(lambda: supervisor.alive() == 1)
+        worker = supervisor._workers[0]
+        os.kill(worker.process.pid, signal.SIGKILL)
+        await wait_for(lambda: not worker.process.is_alive())
+        accepted = sum(supervisor.dispatch(update(update_id)) for update_id in range(150))
+        # The buffer, plus at most one update the dead incarnation's sender had taken
+        assert accepted <= 100 + 1
+        assert supervisor.stats()["rejected"] >= 49
+
+    # Long backoff: the worker stays down for the whole test
+    run_supervised(test, restart_backoff=30)
@@ -0,0 +1,613 @@
+"""
+Low-level ZIP writer for incremental bundles.
+
+zipfile can only add members by running them through its own compressor.
+ZipBuilder can also copy an already-compressed member byte-for-byte out of a
+previous archive, so rebuilding a bundle after one file changes only
+recompresses that file. The output is a standard ZIP (with ZIP64 records when
+needed) that zipfile and unzip read normally.
+
+ParallelCompressor prepares members on a shared, bounded thread pool (zlib
+releases the GIL). Large files are split into blocks and deflated in
+parallel, pigz-style. The prepared members are then written in
+deterministic order.
+
+stream_zip() produces an archive as a generator of byte chunks, using data
+descriptors, so it can be uploaded while it is compressed without touching
+disk.
+"""
+
+import functools
+import os
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+from config import Config
+
+# Same threshold zipfile uses before switching to ZIP64 fields
+ZIP64_LIMIT = (1 << 31) - 1
+COPY_BUFSIZE = 1024 * 1024
+
+_LOCAL = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL = struct.Struct("<4s4B4HL2L5H2L")
+_END = struct.Struct("<4s4H2LH")
+_END64 = struct.Struct("<4sQ2H2L4Q")
+_END64_LOCATOR = struct.Struct("<4sLQL")
+_UTF8_FLAG = 0x800
+_DATA_DESCRIPTOR_FLAG = 0x08
+_DATA_DESCRIPTOR_SIGNATURE = 0x08074B50
+_UNIX_FILE_ATTR = (0o100644 & 0xFFFF) << 16
+
+
+@dataclass
+class ZipEntry:
+    """
+    Metadata of one member as written into an archive.
+
+    Attributes:
+        arcname (str): Name inside the archive.
+        method (int): zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED.
+        crc (int): CRC-32 of the uncompressed data.
+        file_size (int): Uncompressed size in bytes.
+        compress_size (int): Size of the stored payload in bytes.
+        mtime (float): Modification time recorded for the member.
+        header_offset (int): Offset of the local file header in the archive.
+        data_offset (int): Offset of the payload in the archive.
+        flags (int): General purpose bit flags (data descriptor bit for streamed members).
+    """
+    arcname: str
+    method: int
+    crc: int
+    file_size: int
+    compress_size: int
+    mtime: float
+    header_offset: int = 0
+    data_offset: int = 0
+    flags: int = _UTF8_FLAG
+
+
+@dataclass
+class PreparedMember:
+    """
+    A member compressed ahead of time, ready to be written by ZipBuilder.add_prepared().
+
+    Attributes:
+        arcname (str): Name inside the archive.
+        method (int): zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED.
+        crc (int): CRC-32 of the uncompressed data.
+        file_size (int): Uncompressed size in bytes.
+        compress_size (int): Payload size in bytes.
+        mtime (float): Modification time of the source.
+        source (str): Source path (stored members are copied straight from it).
+        blocks (List[BinaryIO]): Compressed payload pieces, in order (empty when stored).
+    """
+    arcname: str
+    method: int
+    crc: int
+    file_size: int
+    compress_size: int
+    mtime: float
+    source: str
+    blocks: List[BinaryIO] = field(default_factory=list)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+        self.blocks = []
+
+
+def _dos_datetime(mtime: float):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return (1 << 5) | 1, 0
+    date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return date, dostime
+
+
+def _needs_zip64(size: int) -> bool:
+    # Deflate can slightly expand incompressible data, so leave headroom
+    return size * 1.05 > ZIP64_LIMIT
+
+
+class ZipBuilder:
+    """
+    Writes ZIP members and the central directory to a binary file object.
+    """
+
+    def __init__(self, fp: BinaryIO, start_offset: int = 0, entries: Optional[List[ZipEntry]] = None):
+        """
+        Initialize the builder.
+
+        Args:
+            fp (BinaryIO): Destination, positioned at start_offset.
+            start_offset (int): Archive offset fp is positioned at (non-zero when appending).
+            entries (Optional[List[ZipEntry]]): Members already present before start_offset.
+        """
+        self.fp = fp
+        self.offset = start_offset
+        self.entries: List[ZipEntry] = list(entries or [])
+
+    def _write(self, data: bytes):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    def _local_header(self, entry: ZipEntry, zip64: bool) -> bytes:
+        name = entry.arcname.encode("utf-8")
+        date, dostime = _dos_datetime(entry.mtime)
+        extra = b""
+        file_size, compress_size = entry.file_size, entry.compress_size
+        if zip64:
+            extra = struct.pack("<HHQQ", 1, 16, file_size, compress_size)
+            file_size = compress_size = 0xFFFFFFFF
+        version = 45 if zip64 else 20
+        return _LOCAL.pack(
+            b"PK\003\004", version, 0, entry.flags, entry.method, dostime, date,
+            entry.crc, compress_size, file_size, len(name), len(extra)
+        ) + name + extra
+
+    def add_file(self, path: str, arcname: str, method: int = zipfile.ZIP_DEFLATED,
+                 level: int = 6, st: Optional[os.stat_result] = None) -> ZipEntry:
+        """
+        Compresses a file into the archive. fp must be seekable.
+
+        Args:
+            path (str): Source file path.
+            arcname (str): Name inside the archive.
+            method (int): zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED.
+            level (int): Deflate level (ignored for stored members).
+            st (Optional[os.stat_result]): Stat of the source, if already known.
+
+        Returns:
+            ZipEntry: The written member.
+        """
+        st = st or os.stat(path)
+        entry = ZipEntry(arcname, method, 0, st.st_size, 0, st.st_mtime, header_offset=self.offset)
+        zip64 = _needs_zip64(st.st_size)
+        self._write(self._local_header(entry, zip64))
+        entry.data_offset = self.offset
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method == zipfile.ZIP_DEFLATED else None
+        crc = file_size = 0
+        start = self.offset
+        with open(path, "rb") as src:
+            while True:
+                chunk = src.read(COPY_BUFSIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                self._write(compressor.compress(chunk) if compressor else chunk)
+            if compressor:
+                self._write(compressor.flush())
+
+        entry.crc = crc
+        entry.file_size = file_size
+        entry.compress_size = self.offset - start
+        if not zip64 and (file_size > ZIP64_LIMIT or entry.compress_size > ZIP64_LIMIT):
+            raise zipfile.LargeZipFile(f"{path} grew past the ZIP64 limit while being compressed")
+
+        # Patch sizes and CRC into the header now that they are known
+        end = self.offset
+        self.fp.seek(entry.header_offset)
+        self.fp.write(self._local_header(entry, zip64))
+        self.fp.seek(end)
+
+        self.entries.append(entry)
+        return entry
+
+    def iter_add_file(self, path: str, arcname: str, method: int = zipfile.ZIP_DEFLATED,
+                      level: int = 6) -> Iterator[None]:
+        """
+        Compresses a file without seeking, yielding after every chunk written.
+
+        Sizes and CRC go in a data descriptor after the payload, so this works on
+        non-seekable outputs; stream_zip() drains its sink at each yield.
+
+        Args:
+            path (str): Source file path.
+            arcname (str): Name inside the archive.
+            method (int): zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED.
+            level (int): Deflate level (ignored for stored members).
+        """
+        st = os.stat(path)
+        entry = ZipEntry(arcname, method, 0, 0, 0, st.st_mtime, header_offset=self.offset,
+                         flags=_UTF8_FLAG | _DATA_DESCRIPTOR_FLAG)
+        zip64 = _needs_zip64(st.st_size)
+        self._write(self._local_header(entry, zip64))
+        entry.data_offset = self.offset
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method == zipfile.ZIP_DEFLATED else None
+        with open(path, "rb") as src:
+            while True:
+                chunk = src.read(COPY_BUFSIZE)
+                if not chunk:
+                    break
+                entry.crc = zlib.crc32(chunk, entry.crc)
+                entry.file_size += len(chunk)
+                self._write(compressor.compress(chunk) if compressor else chunk)
+                yield
+            if compressor:
+                self._write(compressor.flush())
+        entry.compress_size = self.offset - entry.data_offset
+        if not zip64 and (entry.file_size > ZIP64_LIMIT or entry.compress_size > ZIP64_LIMIT):
+            raise zipfile.LargeZipFile(f"{path} grew past the ZIP64 limit while being streamed")
+
+        fmt = "<LLQQ" if zip64 else "<LLLL"
+        self._write(struct.pack(fmt, _DATA_DESCRIPTOR_SIGNATURE, entry.crc, entry.compress_size, entry.file_size))
+        self.entries.append(entry)
+        yield
+
+    def add_prepared(self, member: PreparedMember) -> ZipEntry:
+        """
+        Writes a member compressed by ParallelCompressor. Works on non-seekable outputs.
+
+        Args:
+            member (PreparedMember): The prepared member (its payload blocks are closed).
+
+        Returns:
+            ZipEntry: The written member.
+        """
+        entry = ZipEntry(member.arcname, member.method, member.crc, member.file_size,
+                         member.compress_size, member.mtime, header_offset=self.offset)
+        self._write(self._local_header(entry, _needs_zip64(member.file_size)))
+        entry.data_offset = self.offset
+        try:
+            if member.blocks:
+                for block in member.blocks:
+                    block.seek(0)
+                    self._copy(block, None)
+            else:
+                with open(member.source, "rb") as src:
+                    self._copy(src, member.compress_size)
+        finally:
+            member.close()
+        if self.offset - entry.data_offset != member.compress_size:
+            raise zipfile.BadZipFile(f"{member.source} changed size while being archived")
+        self.entries.append(entry)
+        return entry
+
+    def _copy(self, src: BinaryIO, length: Optional[int]):
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = src.read(COPY_BUFSIZE if remaining is None else min(COPY_BUFSIZE, remaining))
+            if not chunk:
+                break
+            self._write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    def add_raw(self, entry: ZipEntry, src: BinaryIO) -> ZipEntry:
+        """
+        Copies an already-compressed member from another archive without recompressing.
+
+        Args:
+            entry (ZipEntry): The member as it sits in src.
+            src (BinaryIO): Seekable source archive.
+
+        Returns:
+            ZipEntry: The member at its new position.
+        """
+        copied = replace(entry, header_offset=self.offset, flags=_UTF8_FLAG)
+        self._write(self._local_header(copied, _needs_zip64(entry.file_size)))
+        copied.data_offset = self.offset
+
+        src.seek(entry.data_offset)
+        self._copy(src, entry.compress_size)
+        if self.offset - copied.data_offset != entry.compress_size:
+            raise zipfile.BadZipFile(f"Truncated payload for {entry.arcname}")
+
+        self.entries.append(copied)
+        return copied
+
+    def finish(self) -> int:
+        """
+        Writes the central directory and end records.
+
+        Returns:
+            int: Offset of the central directory (where a later append starts).
+        """
+        cd_offset = self.offset
+        for entry in self.entries:
+            self._write(self._central_header(entry))
+        cd_size = self.offset - cd_offset
+        count = len(self.entries)
+
+        if count >= 0xFFFF or cd_offset > ZIP64_LIMIT or cd_size > ZIP64_LIMIT:
+            end64_offset = self.offset
+            self._write(_END64.pack(b"PK\006\006", 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self._write(_END64_LOCATOR.pack(b"PK\006\007", 0, end64_offset, 1))
+            self._write(_END.pack(b"PK\005\006", 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0))
+        else:
+            self._write(_END.pack(b"PK\005\006", 0, 0, count, count, cd_size, cd_offset, 0))
+        return cd_offset
+
+    def _central_header(self, entry: ZipEntry) -> bytes:
+        name = entry.arcname.encode("utf-8")
+        date, dostime = _dos_datetime(entry.mtime)
+        extra_fields = []
+        file_size, compress_size, header_offset = entry.file_size, entry.compress_size, entry.header_offset
+        if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+            extra_fields += [file_size, compress_size]
+            file_size = compress_size = 0xFFFFFFFF
+        if header_offset > ZIP64_LIMIT:
+            extra_fields.append(header_offset)
+            header_offset = 0xFFFFFFFF
+        extra = b""
+        if extra_fields:
+            extra = struct.pack(f"<HH{len(extra_fields)}Q", 1, 8 * len(extra_fields), *extra_fields)
+        version = 45 if extra_fields else 20
+        return _CENTRAL.pack(
+            b"PK\001\002", version, 3, version, 0, entry.flags, entry.method, dostime, date,
+            entry.crc, compress_size, file_size, len(name), len(extra), 0, 0, 0,
+            _UNIX_FILE_ATTR, header_offset
+        ) + name + extra
+
+
+def read_entries(path: str) -> List[ZipEntry]:
+    """
+    Reads member metadata (including payload offsets) from an existing archive.
+
+    Args:
+        path (str): Archive path.
+
+    Returns:
+        List[ZipEntry]: Members in central directory order.
+    """
+    entries = []
+    with open(path, "rb") as fp, zipfile.ZipFile(fp) as zf:
+        for info in zf.infolist():
+            fp.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<2H", fp.read(4))
+            entries.append(ZipEntry(
+                arcname=info.filename,
+                method=info.compress_type,
+                crc=info.CRC,
+                file_size=info.file_size,
+                compress_size=info.compress_size,
+                mtime=time.mktime(info.date_time + (0, 0, -1)),
+                header_offset=info.header_offset,
+                data_offset=info.header_offset + 30 + name_len + extra_len,
+            ))
+    return entries
+
+
+class _ChunkSink:
+    """
+    Write-only buffer that stream_zip() drains between chunks.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes):
+        if data:
+            self._chunks.append(data)
+            self.size += len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def stream_zip(jobs: Iterable[Tuple[str, str, int, int]]) -> Iterator[bytes]:
+    """
+    Generates a ZIP archive as byte chunks (about COPY_BUFSIZE each).
+
+    Args:
+        jobs (Iterable[Tuple[str, str, int, int]]): (path, arcname, method, level) per member.
+
+    Yields:
+        bytes: Consecutive pieces of the archive.
+    """
+    sink = _ChunkSink()
+    builder = ZipBuilder(sink)
+    for path, arcname, method, level in jobs:
+        for _ in builder.iter_add_file(path, arcname, method, level):
+            if sink.size >= COPY_BUFSIZE:
+                yield sink.drain()
+    builder.finish()
+    yield sink.drain()
+
+
+# ---------------------------------------------------------
+# Parallel compression
+# ---------------------------------------------------------
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_archive_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide compression pool, so concurrent builds share one worker cap.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.ARCHIVE_MAX_WORKERS, thread_name_prefix="archive")
+    return _executor
+
+
+def _gf2_times(matrix, vector: int) -> int:
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+
+def _gf2_square(matrix) -> List[int]:
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+@functools.lru_cache(maxsize=64)
+def _zeros_operator(length: int) -> Tuple[int, ...]:
+    """
+    GF(2) matrix that advances a CRC-32 over length zero bytes (cached per length).
+    """
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    operator = [1 << n for n in range(32)]
+    while True:
+        even = _gf2_square(odd)
+        if length & 1:
+            operator = [_gf2_times(even, column) for column in operator]
+        length >>= 1
+        if not length:
+            break
+        odd = _gf2_square(even)
+        if length & 1:
+            operator = [_gf2_times(odd, column) for column in operator]
+        length >>= 1
+        if not length:
+            break
+    return tuple(operator)
+
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    """
+    CRC-32 of A+B given crc(A), crc(B) and len(B) (as zlib's crc32_combine).
+    """
+    if len2 <= 0:
+        return crc1
+    return _gf2_times(_zeros_operator(len2), crc1) ^ crc2
+
+
+def _compress_block(path: str, offset: int, length: int, method: int, level: int,
+                    final: bool) -> Tuple[int, int, Optional[BinaryIO]]:
+    """
+    Compresses one block of a file (worker side).
+
+    Non-final deflate blocks end with a sync flush so the pieces concatenate into
+    one valid stream; each block is primed with the previous 32 KiB as dictionary.
+
+    Returns:
+        Tuple[int, int, Optional[BinaryIO]]: (crc, bytes read, payload spool or None if stored).
+    """
+    with open(path, "rb") as src:
+        compressor = None
+        out = None
+        if method == zipfile.ZIP_DEFLATED:
+            zdict = b""
+            if offset:
+                start = max(0, offset - 32 * 1024)
+                src.seek(start)
+                zdict = src.read(offset - start)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict) if zdict \
+                else zlib.compressobj(level, zlib.DEFLATED, -15)
+            out = tempfile.TemporaryFile(prefix="zipblock-")
+
+        src.seek(offset)
+        crc = read = 0
+        while read < length:
+            chunk = src.read(min(COPY_BUFSIZE, length - read))
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            read += len(chunk)
+            if compressor:
+                out.write(compressor.compress(chunk))
+        if compressor:
+            out.write(compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH))
+    return crc, read, out
+
+
+class ParallelCompressor:
+    """
+    Compresses archive members concurrently and yields them in submission order.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, block_size: Optional[int] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Initialize the compressor.
+
+        Args:
+            max_workers (Optional[int]): Members kept in flight ahead of the writer is twice this.
+            block_size (Optional[int]): Files larger than this are split into blocks of this size.
+            executor (Optional[ThreadPoolExecutor]): Pool to run on (defaults to the shared one).
+        """
+        self.executor = executor or get_archive_executor()
+        self.window = 2 * (max_workers or Config.ARCHIVE_MAX_WORKERS)
+        self.block_size = block_size or Config.ARCHIVE_BLOCK_SIZE
+
+    def imap(self, jobs: Iterable[Tuple[str, str, int, int]]) -> Iterator[PreparedMember]:
+        """
+        Compresses (path, arcname, method, level) jobs in parallel.
+
+        Args:
+            jobs (Iterable[Tuple[str, str, int, int]]): Members to prepare, in archive order.
+
+        Yields:
+            PreparedMember: Members in the same order as jobs.
+        """
+        pending = deque()
+        jobs = iter(jobs)
+        try:
+            for job in jobs:
+                pending.append(self._submit(*job))
+                if len(pending) >= self.window:
+                    break
+            while pending:
+                member = self._collect(*pending.popleft())
+                job = next(jobs, None)
+                if job is not None:
+                    pending.append(self._submit(*job))
+                yield member
+        finally:
+            # Abandoned early (error or consumer stopped): release spooled payloads
+            for _, _, _, futures in pending:
+                for future in futures:
+                    if not future.cancel() and future.exception() is None:
+                        spool = future.result()[2]
+                        if spool is not None:
+                            spool.close()
+
+    def _submit(self, path: str, arcname: str, method: int, level: int):
+        st = os.stat(path)
+        size = st.st_size
+        offsets = list(range(0, size, self.block_size)) or [0]
+        futures = [
+            self.executor.submit(
+                _compress_block, path, offset, min(self.block_size, size - offset), method, level,
+                offset + self.block_size >= size
+            )
+            for offset in offsets
+        ]
+        return path, (arcname, method, st.st_mtime), offsets, futures
+
+    @staticmethod
+    def _collect(path: str, meta: Tuple[str, int, float], offsets: List[int],
+                 futures: List[Future]) -> PreparedMember:
+        arcname, method, mtime = meta
+        crc = file_size = 0
+        blocks = []
+        try:
+            for future in futures:
+                block_crc, read, spool = future.result()
+                crc = crc32_combine(crc, block_crc, read)
+                file_size += read
+                if spool is not None:
+                    blocks.append(spool)
+        except Exception:
+            for spool in blocks:
+                spool.close()
+            raise
+        compress_size = sum(block.seek(0, os.SEEK_END) for block in blocks) if blocks else file_size
+        return PreparedMember(arcname, method, crc, file_size, compress_size, mtime, path, blocks)
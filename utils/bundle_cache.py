@@ -0,0 +1,372 @@
+"""
+Content-addressed cache for the MLparset bundle.
+
+The bundle is keyed on the (name, size, mtime) manifest of the temp folder.
+An unchanged folder reuses the existing archive (and, through the
+UploadRegistry, the Telegram file_id it was last sent with). When files are only added, the new members are appended
+in place. When files change or disappear, the archive is reassembled:
+unchanged members are copied as raw compressed bytes, and only new or
+modified files go through the compressor, in parallel on the shared
+archive pool.
+
+Builds are serialized by their own lock. The state lock only guards pins,
+counters and which bundle is current, and is never held during I/O, so
+is_current(), release() and stats() stay cheap on the event loop while a
+build runs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from utils.archive import ParallelCompressor, ZipBuilder, ZipEntry, read_entries
+from utils.compression import CompressionPolicy
+
+logger = logging.getLogger(__name__)
+
+# (filename, size, mtime_ns)
+ManifestItem = Tuple[str, int, int]
+
+# Names of files that are still being written (our downloader's .part files,
+# browser downloads, editors); rsync/scp temp files are dot-prefixed
+IN_PROGRESS_SUFFIXES = (".part", ".part.json", ".partial", ".crdownload", ".download", ".tmp", "~")
+
+
+@dataclass
+class Bundle:
+    """
+    A ready-to-send bundle.
+
+    Attributes:
+        path (str): Archive path on disk.
+        digest (str): SHA-256 of the folder manifest the archive was built from.
+        file_count (int): Number of members.
+        size (int): Archive size in bytes.
+    """
+    path: str
+    digest: str
+    file_count: int
+    size: int
+
+
+def is_bundle_member(name: str) -> bool:
+    """
+    Whether a file name belongs in the bundle (not a zip, hidden or in-progress file).
+    """
+    return not (name.startswith(".") or name.endswith(".zip") or name.endswith(IN_PROGRESS_SUFFIXES))
+
+
+def scan_folder(folder: str) -> List[ManifestItem]:
+    """
+    Lists the bundle members of a folder (see is_bundle_member) with size and mtime.
+
+    Args:
+        folder (str): Folder to scan.
+
+    Returns:
+        List[ManifestItem]: Manifest sorted by filename.
+    """
+    manifest = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not is_bundle_member(entry.name) or not entry.is_file():
+                continue
+            st = entry.stat()
+            manifest.append((entry.name, st.st_size, st.st_mtime_ns))
+    manifest.sort()
+    return manifest
+
+
+def manifest_digest(manifest: List[ManifestItem]) -> str:
+    """
+    Content address of a manifest.
+    """
+    digest = hashlib.sha256()
+    for name, size, mtime_ns in manifest:
+        digest.update(f"{name}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BundleCache:
+    """
+    Keeps one up-to-date bundle of a folder and rebuilds it incrementally.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, policy: Optional[CompressionPolicy] = None,
+                 compressor: Optional[ParallelCompressor] = None):
+        """
+        Initialize the cache, adopting a bundle left by a previous run if valid.
+
+        Args:
+            cache_dir (Optional[str]): Where bundles and the index live.
+            policy (Optional[CompressionPolicy]): Chooses method and level per member.
+            compressor (Optional[ParallelCompressor]): Compresses new members in parallel.
+        """
+        self.cache_dir = cache_dir or Config.BUNDLE_CACHE_DIR
+        self.policy = policy or CompressionPolicy()
+        self.compressor = compressor or ParallelCompressor()
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Held for a whole build; _lock guards pins, counters and the current bundle
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._digest: Optional[str] = None
+        self._path: Optional[str] = None
+        self._manifest: List[ManifestItem] = []
+        self._entries: List[ZipEntry] = []
+        self._cd_offset = 0
+        # Bundles currently being read by senders, and superseded ones to delete once free
+        self._pins: Dict[str, int] = {}
+        self._retired: set = set()
+        self._counters = {
+            "hits": 0, "appends": 0, "rebuilds": 0,
+            "compressed_members": 0, "stored_members": 0, "copied_members": 0,
+        }
+        self._load_index()
+
+    def acquire(self, folder: str, manifest: Optional[List[ManifestItem]] = None) -> Optional[Bundle]:
+        """
+        Returns an up-to-date bundle for folder and pins it until release().
+
+        Args:
+            folder (str): Folder to bundle.
+            manifest (Optional[List[ManifestItem]]): Files to bundle, sorted by name
+                (defaults to a fresh scan_folder(); the FolderWatcher passes its settled files).
+
+        Returns:
+            Optional[Bundle]: The bundle, or None if the folder has no files.
+        """
+        if manifest is None:
+            manifest = scan_folder(folder)
+        if not manifest:
+            return None
+        digest = manifest_digest(manifest)
+
+        bundle = self._pin_current(digest)
+        if bundle is not None:
+            return bundle
+        with self._build_lock:
+            # Another caller may have built it while this one waited
+            bundle = self._pin_current(digest)
+            if bundle is None:
+                self._update(folder, manifest, digest)
+                bundle = self._pin_current(digest, hit=False)
+            return bundle
+
+    def is_current(self, manifest: List[ManifestItem]) -> bool:
+        """
+        Whether the cached bundle was built from exactly this manifest (acquire() would be a hit).
+        """
+        digest = manifest_digest(manifest)
+        with self._lock:
+            path = self._path if digest == self._digest else None
+        return path is not None and os.path.exists(path)
+
+    def release(self, bundle: Optional[Bundle]):
+        """
+        Unpins a bundle returned by acquire(), deleting it if it was superseded.
+        """
+        if bundle is None:
+            return
+        with self._lock:
+            self._pins[bundle.path] -= 1
+            if self._pins[bundle.path] > 0:
+                return
+            del self._pins[bundle.path]
+            if bundle.path not in self._retired:
+                return
+            self._retired.discard(bundle.path)
+        self._remove(bundle.path)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns reuse/append/rebuild counters.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def _pin_current(self, digest: str, hit: bool = True) -> Optional[Bundle]:
+        """
+        Pins and returns the current bundle if it was built from digest.
+        """
+        with self._lock:
+            if digest != self._digest or self._path is None:
+                return None
+            path, file_count = self._path, len(self._entries)
+            self._pins[path] = self._pins.get(path, 0) + 1
+        bundle = Bundle(path, digest, file_count, 0)
+        try:
+            bundle.size = os.path.getsize(path)
+        except OSError:
+            # Deleted underneath the cache: rebuild
+            self.release(bundle)
+            return None
+        if hit:
+            with self._lock:
+                self._counters["hits"] += 1
+        return bundle
+
+    def _update(self, folder: str, manifest: List[ManifestItem], digest: str):
+        """
+        Brings the bundle up to date with manifest (caller holds the build lock).
+
+        Only builders change the current bundle, so it is read here without
+        the state lock and replaced under it.
+        """
+        old = {name: (size, mtime_ns) for name, size, mtime_ns in self._manifest}
+        new = {name: (size, mtime_ns) for name, size, mtime_ns in manifest}
+        have_bundle = self._path is not None and os.path.exists(self._path)
+        unchanged = [name for name in new if old.get(name) == new[name]] if have_bundle else []
+        only_additions = have_bundle and len(unchanged) == len(old)
+
+        with self._lock:
+            appending = only_additions and not self._pins.get(self._path)
+            if appending:
+                # The archive changes in place: nobody may pin it until the append is done
+                self._digest = None
+        try:
+            if appending:
+                self._append(folder, [item for item in manifest if item[0] not in old], digest)
+            else:
+                self._rebuild(folder, manifest, set(unchanged), digest)
+        except Exception:
+            # A failed in-place append leaves a truncated archive; start over next time
+            if appending:
+                self._remove(self._path)
+                with self._lock:
+                    self._path, self._digest, self._entries, self._manifest = None, None, [], []
+            raise
+        self._manifest = manifest
+        self._save_index()
+
+    def _append(self, folder: str, added: List[ManifestItem], digest: str):
+        """
+        Appends new members in place, overwriting the old central directory.
+        """
+        logger.info(f"📎 Appending {len(added)} new file(s) to {os.path.basename(self._path)}")
+        with open(self._path, "r+b") as fp:
+            fp.seek(self._cd_offset)
+            fp.truncate()
+            builder = ZipBuilder(fp, start_offset=self._cd_offset, entries=self._entries)
+            for member in self.compressor.imap(self._jobs(folder, [name for name, _, _ in added])):
+                builder.add_prepared(member)
+            self._cd_offset = builder.finish()
+        self._entries = builder.entries
+
+        path = self._bundle_path(digest)
+        os.replace(self._path, path)
+        with self._lock:
+            self._path, self._digest = path, digest
+            self._counters["appends"] += 1
+
+    def _rebuild(self, folder: str, manifest: List[ManifestItem], unchanged: set, digest: str):
+        """
+        Writes a new archive, copying unchanged members and compressing the rest.
+        """
+        logger.info(f"🗜️ Building bundle {digest[:12]}: {len(manifest) - len(unchanged)} to compress, "
+                    f"{len(unchanged)} reused")
+        path = self._bundle_path(digest)
+        tmp_path = f"{path}.tmp"
+        old_entries = {entry.arcname: entry for entry in self._entries}
+        src = open(self._path, "rb") if unchanged else None
+        # New/changed members compress in the background while unchanged ones are copied
+        prepared = self.compressor.imap(
+            self._jobs(folder, [name for name, _, _ in manifest if name not in unchanged])
+        )
+        try:
+            with open(tmp_path, "wb") as fp:
+                builder = ZipBuilder(fp)
+                for name, _, _ in manifest:
+                    if name in unchanged:
+                        builder.add_raw(old_entries[name], src)
+                        with self._lock:
+                            self._counters["copied_members"] += 1
+                    else:
+                        builder.add_prepared(next(prepared))
+                cd_offset = builder.finish()
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        finally:
+            prepared.close()
+            if src is not None:
+                src.close()
+
+        previous = self._path
+        with self._lock:
+            self._path, self._digest = path, digest
+            self._entries, self._cd_offset = builder.entries, cd_offset
+            self._counters["rebuilds"] += 1
+        if previous and previous != path:
+            self._retire(previous)
+
+    def _jobs(self, folder: str, names: List[str]):
+        """
+        Yields ParallelCompressor jobs with the policy's method and level per file.
+        """
+        for name in names:
+            file_path = os.path.join(folder, name)
+            method, level = self.policy.choose(file_path)
+            with self._lock:
+                self._counters["stored_members" if method == zipfile.ZIP_STORED else "compressed_members"] += 1
+            yield file_path, name, method, level
+
+    def _bundle_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"bundle-{digest[:16]}.zip")
+
+    def _retire(self, path: str):
+        with self._lock:
+            if self._pins.get(path):
+                self._retired.add(path)
+                return
+        self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to remove old bundle {path}: {e}")
+
+    def _save_index(self):
+        index = {
+            "digest": self._digest,
+            "path": os.path.basename(self._path),
+            "cd_offset": self._cd_offset,
+            "manifest": self._manifest,
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _load_index(self):
+        """
+        Adopts the bundle recorded by a previous run, ignoring it if unreadable.
+        """
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            path = os.path.join(self.cache_dir, index["path"])
+            entries = read_entries(path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            logger.warning(f"⚠️ Ignoring unreadable bundle index: {e}")
+            return
+
+        self._digest = index["digest"]
+        self._path = path
+        self._cd_offset = index["cd_offset"]
+        self._manifest = [tuple(item) for item in index["manifest"]]
+        self._entries = entries
+        logger.info(f"♻️ Reusing bundle {self._digest[:12]} from previous run ({len(entries)} files)")
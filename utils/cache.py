@@ -0,0 +1,275 @@
+"""
+Search result cache shared across users.
+
+Results are cached per provider under a normalized query key, so
+"MNIST digits", "digits  mnist" and "mnist Digits" all hit the same entry.
+The in-memory tier is an LRU bounded by entry count and serialized bytes;
+an optional second tier on a StateBackend keeps entries across process
+restarts (a SQLite file) and, with a shared backend, across workers. Entries past
+their TTL are kept for a further stale window so callers can serve them
+while a refresh runs in the background (stale-while-revalidate).
+
+The second tier may wait on another process's write lock, so on the event
+loop only lookup_memory() is safe; lookup() and set() belong in a thread
+whenever has_store is true.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+from utils.state import SQLiteBackend, StateBackend
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query for cache keys (case, whitespace and token order).
+
+    Args:
+        query (str): Raw user query.
+
+    Returns:
+        str: Casefolded, whitespace-collapsed tokens in sorted order.
+    """
+    return " ".join(sorted(query.casefold().split()))
+
+
+def make_key(provider: str, query: str, max_results: int) -> str:
+    """
+    Builds a provider-scoped cache key.
+
+    Args:
+        provider (str): Provider key (e.g. "kaggle").
+        query (str): Raw user query.
+        max_results (int): Result limit the provider was called with.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{provider}:{max_results}:{normalize_query(query)}"
+
+
+class SearchCache:
+    """
+    TTL + LRU cache with an optional persistent or shared second tier.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, db_path: Optional[str] = None,
+                 stale_ttl: Optional[float] = None, store: Optional[StateBackend] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (Optional[float]): Seconds an entry stays fresh.
+            max_entries (Optional[int]): Maximum number of in-memory entries.
+            max_bytes (Optional[int]): Maximum serialized size of in-memory entries.
+            db_path (Optional[str]): SQLite file for the persistent tier (disabled if empty).
+            stale_ttl (Optional[float]): Seconds an expired entry may still be served stale.
+            store (Optional[StateBackend]): Backend for the second tier instead of db_path
+                (the shared state backend when running several workers).
+        """
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTL
+        self.stale_ttl = stale_ttl if stale_ttl is not None else Config.CACHE_STALE_TTL
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.CACHE_MAX_BYTES
+        db_path = db_path if db_path is not None else Config.CACHE_DB_PATH
+
+        # key -> (value, size_bytes, expires_at); kept until expires_at + stale_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self._store = store
+        self._owns_store = False
+        if store is None and db_path:
+            self._store = self._open_db(db_path)
+            self._owns_store = self._store is not None
+
+    def _open_db(self, db_path: str) -> Optional[StateBackend]:
+        """
+        Opens the SQLite tier, disabling it on failure rather than crashing.
+        """
+        try:
+            store = SQLiteBackend(db_path)
+            logger.info(f"🗄️ Search cache persisted at {db_path}")
+            return store
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to open search cache database {db_path}: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns a fresh cached value, or None on a miss.
+
+        Args:
+            key (str): Cache key from make_key().
+
+        Returns:
+            Optional[Any]: The cached value, or None.
+        """
+        value, fresh = self.lookup(key)
+        return value if fresh else None
+
+    @property
+    def has_store(self) -> bool:
+        """
+        Whether a second tier is configured (lookups may then block on I/O).
+        """
+        return self._store is not None
+
+    def lookup_memory(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Like lookup(), but only consults the in-memory tier (never blocks on I/O).
+
+        A miss is counted only when there is no second tier; otherwise the
+        caller follows up with lookup() off the event loop.
+        """
+        with self._lock:
+            hit = self._memory_get(key, time.time())
+            if hit is None and self._store is None:
+                self._counters["misses"] += 1
+        return hit if hit is not None else (None, False)
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Returns a cached value along with whether it is still fresh.
+
+        Args:
+            key (str): Cache key from make_key().
+
+        Returns:
+            Tuple[Optional[Any], bool]: (value, is_fresh); value is None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            hit = self._memory_get(key, now)
+            if hit is not None:
+                return hit
+
+        # The second tier may be another process's database; don't hold the lock across it
+        row = self._store_get(key, now)
+        with self._lock:
+            if row is None:
+                self._counters["misses"] += 1
+                return None, False
+            self._counters["disk_hits"] += 1
+            return self._count_hit(*row)
+
+    def _memory_get(self, key: str, now: float) -> Optional[Tuple[Any, bool]]:
+        """
+        Memory-tier hit as (value, is_fresh), or None (caller holds the lock).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at + self.stale_ttl > now:
+            self._entries.move_to_end(key)
+            return self._count_hit(value, expires_at > now)
+        self._drop(key)
+        self._counters["expirations"] += 1
+        return None
+
+    def _count_hit(self, value: Any, fresh: bool) -> Tuple[Any, bool]:
+        self._counters["hits" if fresh else "stale_hits"] += 1
+        return value, fresh
+
+    def set(self, key: str, value: Any):
+        """
+        Stores a value in both tiers.
+
+        Args:
+            key (str): Cache key from make_key().
+            value (Any): JSON-serializable value.
+        """
+        payload = json.dumps(value, separators=(",", ":"))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(key, value, len(payload), expires_at)
+        self._store_set(key, value, expires_at)
+
+    def _put(self, key: str, value: Any, size: int, expires_at: float):
+        """
+        Inserts into the memory tier and evicts least recently used entries.
+        """
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store_get(self, key: str, now: float) -> Optional[Tuple[Any, bool]]:
+        if self._store is None:
+            return None
+        try:
+            entry = self._store.get(f"search:{key}")
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache read failed: {e}")
+            return None
+        if entry is None:
+            return None
+        value, expires_at = entry["value"], entry["expires_at"]
+        size = len(json.dumps(value, separators=(",", ":")))
+        with self._lock:
+            self._put(key, value, size, expires_at)
+        return value, expires_at > now
+
+    def _store_set(self, key: str, value: Any, expires_at: float):
+        if self._store is None:
+            return
+        try:
+            # Kept through the stale window, then the backend expires it
+            self._store.set(f"search:{key}", {"value": value, "expires_at": expires_at},
+                            ttl=expires_at + self.stale_ttl - time.time())
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns cache counters and current occupancy for sizing.
+
+        Returns:
+            Dict[str, Any]: Hit/miss/eviction counters, entries, bytes and hit ratio
+            (stale hits count as served).
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        served = stats["hits"] + stats["stale_hits"]
+        lookups = served + stats["misses"]
+        stats["hit_ratio"] = round(served / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self):
+        """
+        Closes the SQLite tier if this cache opened it (a shared store is closed by its owner).
+        """
+        with self._lock:
+            if self._owns_store:
+                self._store.close()
+            self._store = None
@@ -0,0 +1,157 @@
+"""
+Per-member compression policy and optional tar bundles.
+
+Deflating PDFs, images, parquet or nested archives burns CPU for almost no
+size gain. The policy stores such members as-is, detected by extension or by
+the byte entropy of a few sampled blocks. Everything else is deflated at a
+level picked by size: small files get the best ratio, and huge files trade a
+little ratio for throughput. Users who opt in can get the folder as a tar
+bundle with xz or zstd instead (zstd needs the optional `zstandard` package).
+"""
+
+import logging
+import math
+import os
+import tarfile
+import zipfile
+from typing import List, Optional, Tuple
+from config import Config
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Formats that are already compressed (or encrypted) internally
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".lz4",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".mp4", ".m4a", ".mkv", ".mov", ".avi", ".webm", ".ogg", ".flac",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".epub", ".jar", ".whl",
+    ".parquet", ".orc", ".avro", ".feather", ".arrow", ".npz", ".h5", ".hdf5", ".pt", ".safetensors",
+}
+ENTROPY_SAMPLE_SIZE = 16 * 1024
+ENTROPY_SAMPLES = 3
+
+TAR_CODECS = ("xz", "zstd")
+
+
+def sample_entropy(path: str, size: Optional[int] = None) -> float:
+    """
+    Estimates Shannon entropy (bits per byte) from blocks at the start, middle and end.
+
+    Args:
+        path (str): File to sample.
+        size (Optional[int]): File size, if already known.
+
+    Returns:
+        float: Entropy between 0 (constant) and 8 (random).
+    """
+    size = size if size is not None else os.path.getsize(path)
+    if size == 0:
+        return 0.0
+    offsets = {0, max(0, size // 2 - ENTROPY_SAMPLE_SIZE // 2), max(0, size - ENTROPY_SAMPLE_SIZE)}
+    counts = [0] * 256
+    total = 0
+    with open(path, "rb") as f:
+        for offset in sorted(offsets)[:ENTROPY_SAMPLES]:
+            f.seek(offset)
+            block = f.read(ENTROPY_SAMPLE_SIZE)
+            for byte_value in range(256):
+                counts[byte_value] += block.count(byte_value)
+            total += len(block)
+    return -sum((c / total) * math.log2(c / total) for c in counts if c)
+
+
+class CompressionPolicy:
+    """
+    Chooses ZIP method and deflate level per member.
+    """
+
+    def __init__(self, entropy_threshold: Optional[float] = None, small_limit: Optional[int] = None,
+                 large_limit: Optional[int] = None, levels: Optional[Tuple[int, int, int]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            entropy_threshold (Optional[float]): Sampled bits/byte above which a member is stored.
+            small_limit (Optional[int]): Files below this size use the small-file level.
+            large_limit (Optional[int]): Files at or above this size use the large-file level.
+            levels (Optional[Tuple[int, int, int]]): Deflate levels for (small, medium, large) files.
+        """
+        self.entropy_threshold = entropy_threshold or Config.COMPRESSION_ENTROPY_THRESHOLD
+        self.small_limit = small_limit or Config.COMPRESSION_SMALL_LIMIT
+        self.large_limit = large_limit or Config.COMPRESSION_LARGE_LIMIT
+        self.levels = levels or Config.COMPRESSION_LEVELS
+
+    def choose(self, path: str, size: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Picks the ZIP method and deflate level for a file.
+
+        Args:
+            path (str): File to classify.
+            size (Optional[int]): File size, if already known.
+
+        Returns:
+            Tuple[int, int]: (zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED, level).
+        """
+        size = size if size is not None else os.path.getsize(path)
+        if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+            return zipfile.ZIP_STORED, 0
+        if size >= ENTROPY_SAMPLE_SIZE and sample_entropy(path, size) > self.entropy_threshold:
+            return zipfile.ZIP_STORED, 0
+
+        small_level, medium_level, large_level = self.levels
+        if size < self.small_limit:
+            return zipfile.ZIP_DEFLATED, small_level
+        if size < self.large_limit:
+            return zipfile.ZIP_DEFLATED, medium_level
+        return zipfile.ZIP_DEFLATED, large_level
+
+
+def available_tar_codecs() -> List[str]:
+    """
+    Tar codecs usable in this environment.
+    """
+    return [codec for codec in TAR_CODECS if codec != "zstd" or zstandard is not None]
+
+
+def build_tar_bundle(files: List[Tuple[str, str]], output_path: str, codec: str) -> str:
+    """
+    Writes files into a compressed tar bundle.
+
+    Args:
+        files (List[Tuple[str, str]]): (source path, archive name) pairs, in archive order.
+        output_path (str): Destination path.
+        codec (str): "xz" or "zstd".
+
+    Returns:
+        str: output_path.
+
+    Raises:
+        ValueError: If the codec is unknown or its library is not installed.
+    """
+    if codec not in available_tar_codecs():
+        raise ValueError(f"Unsupported tar codec: {codec}")
+
+    if codec == "xz":
+        with tarfile.open(output_path, "w:xz", preset=Config.TAR_XZ_PRESET) as tar:
+            for path, arcname in files:
+                tar.add(path, arcname=arcname)
+        return output_path
+
+    compressor = zstandard.ZstdCompressor(level=Config.TAR_ZSTD_LEVEL, threads=-1)
+    with open(output_path, "wb") as raw, compressor.stream_writer(raw) as writer:
+        with tarfile.open(fileobj=writer, mode="w|") as tar:
+            for path, arcname in files:
+                tar.add(path, arcname=arcname)
+    return output_path
+
+
+def tar_extension(codec: str) -> str:
+    """
+    File extension for a tar codec.
+    """
+    return {"xz": ".tar.xz", "zstd": ".tar.zst"}[codec]
@@ -0,0 +1,397 @@
+"""
+Parallel, resumable HTTP downloads.
+
+A probe learns the size, Range support and validator (ETag or Last-Modified)
+of the resource. When ranges are supported, the file is fetched as several
+Range segments on a shared, bounded pool, and each segment writes into a
+preallocated `.part` file with os.pwrite. Segment progress is saved next to it
+(`.part.json`), so an interrupted download resumes where it stopped, as long as
+the validator still matches. Servers without ranges get a single stream.
+Reads use an adaptive buffer, progress is logged on a timer, and the result is
+checked against the expected size (and SHA-256, when given) before it is moved
+into place.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import List, Optional
+import requests
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from config import Config
+from utils.http_client import get_http_session
+from utils.metrics import BYTES_DOWNLOADED, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MIN_BUFFER = 64 * 1024
+MAX_BUFFER = 4 * 1024 * 1024
+HASH_BUFSIZE = 1024 * 1024
+
+# Errors worth retrying a segment for (connection drops, timeouts, short reads)
+RETRYABLE_ERRORS = (requests.RequestException, Urllib3HTTPError, OSError)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """
+    Raised when a download cannot be completed or fails verification.
+    """
+
+
+class ResourceChanged(DownloadError):
+    """
+    Raised when the server stops honouring If-Range, i.e. the file changed mid-download.
+    """
+
+
+@dataclass
+class RemoteFile:
+    """
+    What the probe learned about a URL.
+
+    Attributes:
+        url (str): Final URL after redirects.
+        size (Optional[int]): Size in bytes, if the server reported it.
+        ranges (bool): Whether the server honours byte ranges.
+        validator (Optional[str]): Strong ETag or Last-Modified, for If-Range and resume checks.
+    """
+    url: str
+    size: Optional[int]
+    ranges: bool
+    validator: Optional[str]
+
+
+def get_download_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide segment pool, so concurrent downloads share one connection cap.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.DOWNLOAD_MAX_WORKERS,
+                                               thread_name_prefix="download")
+    return _executor
+
+
+class _Progress:
+    """
+    Thread-safe byte counter that logs (and checkpoints) on a timer.
+    """
+
+    def __init__(self, name: str, total: Optional[int], done: int = 0, checkpoint=None):
+        self.name = name
+        self.total = total
+        self.done = done
+        self.checkpoint = checkpoint
+        self.started = time.monotonic()
+        self._start_done = done
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        BYTES_DOWNLOADED.inc(n)
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            if now - self._last_report < Config.DOWNLOAD_PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+            rate = (self.done - self._start_done) / (now - self.started) / (1024 * 1024)
+            if self.total:
+                logger.info(f"⏳ Downloading {self.name}: {self.done * 100 // self.total}% "
+                            f"({self.done // (1024 * 1024)}MB / {self.total // (1024 * 1024)}MB) at {rate:.1f}MB/s")
+            else:
+                logger.info(f"⏳ Downloading {self.name}: {self.done // (1024 * 1024)}MB at {rate:.1f}MB/s")
+            if self.checkpoint:
+                self.checkpoint()
+
+
+class Downloader:
+    """
+    Downloads URLs to disk with parallel Range segments and resume.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, executor: Optional[ThreadPoolExecutor] = None,
+                 segments: Optional[int] = None, min_segment: Optional[int] = None, retries: Optional[int] = None):
+        """
+        Initialize the downloader.
+
+        Args:
+            session (Optional[requests.Session]): HTTP session (defaults to the shared one).
+            executor (Optional[ThreadPoolExecutor]): Segment pool (defaults to the shared one).
+            segments (Optional[int]): Maximum parallel segments per file.
+            min_segment (Optional[int]): Smallest segment worth its own connection.
+            retries (Optional[int]): Attempts per segment after a dropped connection.
+        """
+        self.session = session or get_http_session()
+        self.executor = executor or get_download_executor()
+        self.segments = segments or Config.DOWNLOAD_SEGMENTS
+        self.min_segment = min_segment or Config.DOWNLOAD_MIN_SEGMENT
+        self.retries = retries if retries is not None else Config.DOWNLOAD_RETRIES
+        self.timeout = (Config.DOWNLOAD_CONNECT_TIMEOUT, Config.DOWNLOAD_READ_TIMEOUT)
+
+    def download(self, url: str, dest_path: str, expected_size: Optional[int] = None,
+                 sha256: Optional[str] = None) -> str:
+        """
+        Downloads url to dest_path, resuming a previous partial download if possible.
+
+        Args:
+            url (str): Source URL.
+            dest_path (str): Final file path.
+            expected_size (Optional[int]): Size the file must have.
+            sha256 (Optional[str]): Hex digest the file must have.
+
+        Returns:
+            str: dest_path.
+
+        Raises:
+            DownloadError: If the transfer fails or the result doesn't verify.
+        """
+        with STAGE_SECONDS.time(stage="download"):
+            return self._download(url, dest_path, expected_size, sha256)
+
+    def _download(self, url: str, dest_path: str, expected_size: Optional[int], sha256: Optional[str]) -> str:
+        remote = self.probe(url)
+        if expected_size is not None and remote.size is not None and remote.size != expected_size:
+            raise DownloadError(f"Server reports {remote.size} bytes for {url}, expected {expected_size}")
+
+        part_path = f"{dest_path}.part"
+        state_path = f"{dest_path}.part.json"
+        name = os.path.basename(dest_path)
+
+        if remote.ranges and remote.size:
+            self._download_segmented(remote, url, part_path, state_path, name)
+        else:
+            self._download_stream(remote, part_path, name)
+
+        self._verify(part_path, remote.size if remote.size is not None else expected_size, expected_size, sha256)
+        os.replace(part_path, dest_path)
+        self._remove(state_path)
+        return dest_path
+
+    def probe(self, url: str) -> RemoteFile:
+        """
+        Learns size, Range support and validator of url (HEAD, then a 1-byte Range GET).
+
+        Args:
+            url (str): URL to probe.
+
+        Returns:
+            RemoteFile: What the server reported.
+        """
+        headers = {"Accept-Encoding": "identity"}
+        response = self.session.head(url, headers=headers, allow_redirects=True, timeout=self.timeout)
+        if response.ok and response.headers.get("Accept-Ranges") == "bytes" and "Content-Length" in response.headers:
+            return RemoteFile(response.url, int(response.headers["Content-Length"]), True,
+                              self._validator(response.headers))
+
+        # Some servers (and signed CDN URLs) reject HEAD or omit Accept-Ranges
+        with self.session.get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True,
+                              timeout=self.timeout) as response:
+            response.raise_for_status()
+            validator = self._validator(response.headers)
+            if response.status_code == 206 and "/" in response.headers.get("Content-Range", ""):
+                total = response.headers["Content-Range"].rsplit("/", 1)[1]
+                return RemoteFile(response.url, int(total) if total.isdigit() else None, True, validator)
+            length = response.headers.get("Content-Length")
+            return RemoteFile(response.url, int(length) if length and length.isdigit() else None, False, validator)
+
+    def _download_segmented(self, remote: RemoteFile, url: str, part_path: str, state_path: str, name: str):
+        """
+        Fetches remote as parallel Range segments into part_path.
+        """
+        segments = self._load_state(state_path, part_path, url, remote)
+        if segments is None:
+            segments = self._plan(remote.size)
+            with open(part_path, "wb") as f:
+                f.truncate(remote.size)
+        done = sum(segment[2] for segment in segments)
+        if done:
+            logger.info(f"↩️ Resuming {name} at {done // (1024 * 1024)}MB / {remote.size // (1024 * 1024)}MB")
+        else:
+            logger.info(f"⬇️ Starting download: {url} -> {part_path} ({len(segments)} segments)")
+
+        state_lock = threading.Lock()
+
+        def checkpoint():
+            with state_lock:
+                self._save_state(state_path, url, remote, segments)
+
+        progress = _Progress(name, remote.size, done, checkpoint)
+        checkpoint()
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            futures = [
+                self.executor.submit(self._fetch_segment, remote, fd, segment, progress)
+                for segment in segments if segment[2] < segment[1] - segment[0]
+            ]
+            wait(futures)
+            for future in futures:
+                future.result()
+        except ResourceChanged:
+            # A resume would mix two versions of the file
+            self._remove(state_path)
+            raise
+        finally:
+            os.close(fd)
+            if os.path.exists(state_path):
+                checkpoint()
+
+    def _fetch_segment(self, remote: RemoteFile, fd: int, segment: List[int], progress: _Progress):
+        """
+        Downloads one [start, end) segment, retrying from where it stopped.
+
+        Only attempts that make no progress count against the retry budget, so a
+        flaky connection that keeps delivering data is never given up on.
+        """
+        start, end = segment[0], segment[1]
+        failures = 0
+        while start + segment[2] < end:
+            headers = {"Range": f"bytes={start + segment[2]}-{end - 1}", "Accept-Encoding": "identity"}
+            if remote.validator:
+                headers["If-Range"] = remote.validator
+            before = segment[2]
+            try:
+                with self.session.get(remote.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 200:
+                        raise ResourceChanged(f"Range request answered with the full body; "
+                                              f"{remote.url} changed or stopped serving ranges")
+                    response.raise_for_status()
+                    for chunk in self._iter_adaptive(response.raw):
+                        chunk = chunk[:end - start - segment[2]]
+                        os.pwrite(fd, chunk, start + segment[2])
+                        segment[2] += len(chunk)
+                        progress.add(len(chunk))
+                        if start + segment[2] >= end:
+                            break
+            except DownloadError:
+                raise
+            except RETRYABLE_ERRORS as e:
+                if segment[2] > before:
+                    failures = 0
+                    logger.warning(f"⚠️ Segment {start}-{end - 1} interrupted ({e}); resuming at byte "
+                                   f"{start + segment[2]}")
+                    continue
+                failures += 1
+                if failures > self.retries:
+                    raise DownloadError(f"Segment {start}-{end - 1} failed after {failures} attempts: {e}") from e
+                time.sleep(min(2 ** failures * 0.5, 10))
+                continue
+            if segment[2] == before:
+                failures += 1
+                if failures > self.retries:
+                    raise DownloadError(f"Segment {start}-{end - 1} made no progress")
+
+    def _download_stream(self, remote: RemoteFile, part_path: str, name: str):
+        """
+        Fetches remote over a single connection (no usable ranges), retrying from zero.
+        """
+        logger.info(f"⬇️ Starting download: {remote.url} -> {part_path} (single stream)")
+        failures = 0
+        while True:
+            progress = _Progress(name, remote.size)
+            try:
+                with self.session.get(remote.url, stream=True, timeout=self.timeout) as response, \
+                        open(part_path, "wb") as f:
+                    response.raise_for_status()
+                    for chunk in self._iter_adaptive(response.raw):
+                        f.write(chunk)
+                        progress.add(len(chunk))
+                return
+            except RETRYABLE_ERRORS as e:
+                failures += 1
+                if failures > self.retries:
+                    raise DownloadError(f"Download of {remote.url} failed after {failures} attempts: {e}") from e
+                logger.warning(f"⚠️ Download of {name} interrupted ({e}); restarting")
+                time.sleep(min(2 ** failures * 0.5, 10))
+
+    @staticmethod
+    def _iter_adaptive(raw):
+        """
+        Reads a response body, growing the buffer while reads fill quickly.
+        """
+        size = MIN_BUFFER
+        while True:
+            started = time.monotonic()
+            chunk = raw.read(size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+            elapsed = time.monotonic() - started
+            if len(chunk) == size and elapsed < 0.05 and size < MAX_BUFFER:
+                size *= 2
+            elif elapsed > 0.5 and size > MIN_BUFFER:
+                size //= 2
+
+    def _plan(self, size: int) -> List[List[int]]:
+        """
+        Splits size into [start, end, done] segments.
+        """
+        count = max(1, min(self.segments, size // self.min_segment))
+        step = -(-size // count)
+        return [[start, min(start + step, size), 0] for start in range(0, size, step)]
+
+    @staticmethod
+    def _validator(headers) -> Optional[str]:
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return headers.get("Last-Modified")
+
+    @staticmethod
+    def _verify(path: str, size: Optional[int], expected_size: Optional[int], sha256: Optional[str]):
+        """
+        Checks the finished .part file against the known size and hash.
+        """
+        actual = os.path.getsize(path)
+        for wanted in (size, expected_size):
+            if wanted is not None and actual != wanted:
+                raise DownloadError(f"Downloaded {actual} bytes, expected {wanted}")
+        if sha256:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(HASH_BUFSIZE), b""):
+                    digest.update(block)
+            if digest.hexdigest() != sha256.lower():
+                os.remove(path)
+                raise DownloadError(f"SHA-256 mismatch for {path}")
+
+    @staticmethod
+    def _load_state(state_path: str, part_path: str, url: str, remote: RemoteFile) -> Optional[List[List[int]]]:
+        """
+        Returns saved segments if they belong to the same, unchanged resource.
+        """
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if (state["url"] != url or state["size"] != remote.size or not remote.validator
+                    or state["validator"] != remote.validator or os.path.getsize(part_path) != remote.size):
+                return None
+            return [list(segment) for segment in state["segments"]]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _save_state(state_path: str, url: str, remote: RemoteFile, segments: List[List[int]]):
+        state = {"url": url, "size": remote.size, "validator": remote.validator,
+                 "segments": [list(segment) for segment in segments]}
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
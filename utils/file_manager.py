@@ -1,10 +1,13 @@
 import os
 import shutil
-import zipfile
 import requests
 import logging
 from typing import List, Optional
 from config import Config
+from utils.compression import CompressionPolicy
+from utils.archive import ParallelCompressor, ZipBuilder
+from utils.splitter import split_file
+from utils.downloader import Downloader
 
 logger = logging.getLogger(__name__)
 
@@ -14,28 +17,17 @@ class FileManager:
     """
 
     @staticmethod
-    def download_file(url: str, dest_filename: str) -> Optional[str]:
+    def download_file(url: str, dest_filename: str, session: Optional[requests.Session] = None,
+                      expected_size: Optional[int] = None, sha256: Optional[str] = None) -> Optional[str]:
         """
         Downloads a file from a URL to the TEMP_DIR.
+        Uses parallel Range segments when the server supports them and resumes
+        an interrupted download from its .part file. The result is checked
+        against the expected size and SHA-256 when given.
         """
+        local_path = os.path.join(Config.TEMP_DIR, dest_filename)
         try:
-            local_path = os.path.join(Config.TEMP_DIR, dest_filename)
-            logger.info(f"⬇️ Starting download: {url} -> {local_path}")
-            
-            with requests.get(url, stream=True) as r:
-                r.raise_for_status()
-                total_length = int(r.headers.get('content-length', 0))
-                downloaded = 0
-                
-                with open(local_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        # Log progress every 5MB roughly
-                        if total_length > 0 and downloaded % (5 * 1024 * 1024) < 10000:
-                            percent = int((downloaded / total_length) * 100)
-                            logger.info(f"⏳ Downloading {dest_filename}: {percent}% ({downloaded//(1024*1024)}MB / {total_length//(1024*1024)}MB)")
-            
+            Downloader(session=session).download(url, local_path, expected_size=expected_size, sha256=sha256)
             logger.info(f"✅ Download complete: {local_path} ({os.path.getsize(local_path)//(1024*1024)}MB)")
             return local_path
         except Exception as e:
@@ -43,20 +35,33 @@ class FileManager:
             return None
 
     @staticmethod
-    def zip_directory(dir_path: str, output_name: str) -> Optional[str]:
+    def zip_directory(dir_path: str, output_name: str, policy: Optional[CompressionPolicy] = None) -> Optional[str]:
         """
         Zips a directory into a single file.
+        Each member is stored or deflated according to the compression policy,
+        and members are compressed in parallel on the shared archive pool.
         """
         try:
             zip_path = os.path.join(Config.TEMP_DIR, f"{output_name}.zip")
             logger.info(f"🗜️ Zipping directory {dir_path} -> {zip_path}...")
+            policy = policy or CompressionPolicy()
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(dir_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, dir_path)
-                        zipf.write(file_path, arcname)
+            jobs = []
+            for root, dirs, files in os.walk(dir_path):
+                dirs.sort()
+                for file in sorted(files):
+                    file_path = os.path.join(root, file)
+                    if os.path.abspath(file_path) == os.path.abspath(zip_path):
+                        continue
+                    arcname = os.path.relpath(file_path, dir_path).replace(os.sep, "/")
+                    method, level = policy.choose(file_path)
+                    jobs.append((file_path, arcname, method, level))
+
+            with open(zip_path, 'wb') as fp:
+                builder = ZipBuilder(fp)
+                for member in ParallelCompressor().imap(jobs):
+                    builder.add_prepared(member)
+                builder.finish()
             
             size_mb = os.path.getsize(zip_path) // (1024 * 1024)
             logger.info(f"✅ Zipping complete: {zip_path} ({size_mb}MB)")
@@ -66,33 +71,14 @@ class FileManager:
             return None
 
     @staticmethod
-    def split_large_file(file_path: str, limit_bytes: int = Config.CHUNK_SIZE) -> List[str]:
+    def split_large_file(file_path: str, limit_bytes: Optional[int] = None) -> List[str]:
         """
-        Splits a file into chunks if it exceeds the limit.
+        Splits a file into numbered parts (file.001, file.002, ...) if it exceeds the limit.
+        Parts are copied in the kernel where possible, so memory use stays constant.
         Returns a list of chunk paths.
         """
-        file_size = os.path.getsize(file_path)
-        if file_size <= limit_bytes:
-            return [file_path]
-        
-        chunk_paths = []
         try:
-            logger.info(f"✂️ Splitting large file: {file_path} ({file_size//(1024*1024)}MB) into {limit_bytes//(1024*1024)}MB chunks")
-            with open(file_path, 'rb') as f:
-                chunk_idx = 0
-                while True:
-                    chunk = f.read(limit_bytes)
-                    if not chunk:
-                        break
-                    
-                    chunk_name = f"{file_path}.part{chunk_idx+1}"
-                    with open(chunk_name, 'wb') as chunk_file:
-                        chunk_file.write(chunk)
-                    chunk_paths.append(chunk_name)
-                    chunk_idx += 1
-                    logger.info(f"   Created chunk {chunk_idx}: {chunk_name}")
-            
-            return chunk_paths
+            return split_file(file_path, limit_bytes or Config.CHUNK_SIZE)
         except Exception as e:
             logger.error(f"❌ Failed to split file {file_path}: {e}")
             return []
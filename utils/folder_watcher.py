@@ -0,0 +1,416 @@
+"""
+Live watcher of the MLparset temp folder.
+
+Keeps an in-memory manifest of the folder so requests don't have to scan it,
+and rebuilds the cached bundle in the background once changes settle, so the
+next MLparset finds a finished archive and only has to send it.
+
+Changes are picked up with inotify (through ctypes, no extra dependency) on
+Linux, and by an os.scandir stat poll elsewhere or if inotify is unavailable.
+inotify also triggers a full rescan every RESCAN_INTERVAL and after a queue
+overflow, in case events were missed.
+
+A file only enters the manifest once it is settled:
+- its name is not a hidden or in-progress name (see is_bundle_member);
+- its size and mtime have not changed for WATCH_SETTLE seconds;
+- with inotify, the writer has closed it (or left it untouched for
+  OPEN_WRITE_GRACE seconds).
+Settled files are then hashed in chunks (SHA-256, CHUNK_SIZE at a time). A file
+whose mtime changed but whose content did not (touched, or copied over with
+identical bytes) keeps its previous manifest entry, so it triggers no rebuild.
+The bundle is rebuilt once nothing is pending and the manifest has been
+unchanged for WATCH_SETTLE seconds, so a batch of copies costs one build.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import logging
+import os
+import select
+import stat
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from config import Config
+from utils.bundle_cache import BundleCache, ManifestItem, is_bundle_member
+from utils.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Seconds after which a file still open for writing but untouched is treated as finished
+OPEN_WRITE_GRACE = 60.0
+# Seconds between safety rescans in inotify mode
+RESCAN_INTERVAL = 60.0
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """
+    Minimal ctypes binding for one inotify watch on a directory.
+    """
+
+    def __init__(self, path: str):
+        """
+        Creates the inotify instance and watches path.
+
+        Raises:
+            OSError: If inotify is unavailable or the watch cannot be added.
+        """
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout: float) -> List[Tuple[int, str]]:
+        """
+        Waits up to timeout seconds and returns (mask, name) events.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+@dataclass
+class FileState:
+    """
+    What the watcher knows about one file.
+
+    Attributes:
+        size (int): Size at the last stat.
+        mtime_ns (int): Modification time at the last stat.
+        changed_at (float): Monotonic time the current (size, mtime) was first seen.
+        digest (Optional[str]): SHA-256 of the content, once settled and hashed.
+        entry (Optional[ManifestItem]): Manifest item published for this file (None until settled).
+        settled (Optional[ManifestItem]): Last entry published for the content in digest
+            (kept while the file changes, so an unchanged re-settle can reuse it).
+    """
+    size: int
+    mtime_ns: int
+    changed_at: float
+    digest: Optional[str] = None
+    entry: Optional[ManifestItem] = None
+    settled: Optional[ManifestItem] = None
+
+
+def hash_file(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    SHA-256 of a file read in chunk_size pieces.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderWatcher:
+    """
+    Maintains the settled-file manifest of a folder and prebuilds its bundle.
+    """
+
+    def __init__(self, folder: str, bundle_cache: Optional[BundleCache] = None,
+                 settle: Optional[float] = None, poll_interval: Optional[float] = None,
+                 backend: Optional[str] = None):
+        """
+        Initialize the watcher (nothing runs until start()).
+
+        Args:
+            folder (str): Folder to watch.
+            bundle_cache (Optional[BundleCache]): Cache to prebuild into (no prebuilds if None).
+            settle (Optional[float]): Quiet seconds before a file (and a rebuild) counts as settled.
+            poll_interval (Optional[float]): Seconds between stat polls in polling mode.
+            backend (Optional[str]): "auto", "inotify" or "poll".
+        """
+        self.folder = folder
+        self.bundle_cache = bundle_cache
+        self.settle = settle if settle is not None else Config.WATCH_SETTLE
+        self.poll_interval = poll_interval or Config.WATCH_POLL_INTERVAL
+        self.backend = (backend or Config.WATCH_BACKEND).lower()
+        self.mode: Optional[str] = None
+
+        self._files: Dict[str, FileState] = {}
+        # name -> monotonic time of the last write event, until IN_CLOSE_WRITE
+        self._writing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._inotify: Optional[Inotify] = None
+        # Settled manifest: when it last changed and what the bundle was last built from
+        self._published: List[ManifestItem] = []
+        self._published_at = 0.0
+        self._built: Optional[List[ManifestItem]] = None
+        self._counters = {"events": 0, "scans": 0, "hashed_files": 0, "hashed_bytes": 0,
+                          "touch_only": 0, "prebuilds": 0, "prebuild_errors": 0}
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the watcher is running and has finished its initial scan (snapshot() is meaningful).
+        """
+        return self._ready.is_set() and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Scans the folder and starts the background thread.
+        """
+        if self.backend in ("auto", "inotify"):
+            try:
+                self._inotify = Inotify(self.folder)
+                self.mode = "inotify"
+            except OSError as e:
+                if self.backend == "inotify":
+                    raise
+                logger.info(f"inotify unavailable ({e}), polling {self.folder} instead.")
+        if self._inotify is None:
+            self.mode = "poll"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"👀 Watching {self.folder} ({self.mode}, settle {self.settle}s)")
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        self._ready.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def snapshot(self) -> Tuple[List[ManifestItem], int]:
+        """
+        Returns the settled manifest (sorted by name) and the number of files still being written.
+        """
+        with self._lock:
+            manifest = [state.entry for state in self._files.values() if state.entry is not None]
+            pending = len(self._files) - len(manifest)
+        manifest.sort()
+        return manifest, pending
+
+    def _run(self):
+        self._scan()
+        self._settle()
+        self._ready.set()
+        last_scan = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                if self._inotify is not None:
+                    # Wake up often enough to notice files settling
+                    dirty = self._read_events(min(self.poll_interval, max(self.settle / 2, 0.05)))
+                    if dirty is None or time.monotonic() - last_scan >= RESCAN_INTERVAL:
+                        self._scan()
+                        last_scan = time.monotonic()
+                    else:
+                        self._refresh(dirty)
+                else:
+                    self._stop.wait(self.poll_interval)
+                    self._scan()
+                self._settle()
+                self._maybe_prebuild()
+            except Exception as e:
+                logger.error(f"❌ Folder watcher error: {e}", exc_info=True)
+                self._stop.wait(self.poll_interval)
+
+    def _read_events(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Reads inotify events; returns the names to re-stat, or None when a full rescan is needed.
+        """
+        events = self._inotify.read(timeout)
+        now = time.monotonic()
+        dirty = set()
+        for mask, name in events:
+            self._counters["events"] += 1
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                logger.warning(f"⚠️ Watched folder {self.folder} went away; falling back to polling.")
+                self._inotify.close()
+                self._inotify = None
+                self.mode = "poll"
+                return None
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if not name:
+                continue
+            if mask & (IN_CREATE | IN_MODIFY):
+                self._writing[name] = now
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM):
+                self._writing.pop(name, None)
+            dirty.add(name)
+        return dirty
+
+    def _scan(self):
+        """
+        Re-stats every file in the folder.
+        """
+        self._counters["scans"] += 1
+        try:
+            with os.scandir(self.folder) as it:
+                names = {entry.name for entry in it if is_bundle_member(entry.name)}
+        except FileNotFoundError:
+            names = set()
+        with self._lock:
+            names |= set(self._files)
+        self._refresh(names)
+
+    def _refresh(self, names: Set[str]):
+        """
+        Re-stats the given files, resetting the settle timer of any that changed.
+        """
+        now = time.monotonic()
+        for name in names:
+            if not is_bundle_member(name):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+                is_file = stat.S_ISREG(st.st_mode)
+            except FileNotFoundError:
+                is_file = False
+            with self._lock:
+                state = self._files.get(name)
+                if not is_file:
+                    self._files.pop(name, None)
+                    self._writing.pop(name, None)
+                elif state is None:
+                    # A file first seen with an old mtime has been quiet that long already
+                    age = max(0.0, time.time() - st.st_mtime_ns / 1e9)
+                    self._files[name] = FileState(st.st_size, st.st_mtime_ns, now - age)
+                elif (state.size, state.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    state.size, state.mtime_ns, state.changed_at = st.st_size, st.st_mtime_ns, now
+                    state.entry = None
+
+    def _settle(self):
+        """
+        Hashes files that have been quiet for settle seconds and publishes them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [(name, state.size, state.mtime_ns) for name, state in self._files.items()
+                          if state.entry is None and self._is_quiet(name, state, now)]
+        for name, size, mtime_ns in candidates:
+            if self._stop.is_set():
+                return
+            path = os.path.join(self.folder, name)
+            try:
+                digest = hash_file(path)
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            self._counters["hashed_files"] += 1
+            self._counters["hashed_bytes"] += size
+            with self._lock:
+                state = self._files.get(name)
+                # Changed while we were reading it: wait for it to settle again
+                if state is None or (st.st_size, st.st_mtime_ns) != (size, mtime_ns) \
+                        or (state.size, state.mtime_ns) != (size, mtime_ns):
+                    continue
+                if state.settled is not None and digest == state.digest:
+                    # Same bytes under a new mtime: keep the entry the bundle was built from
+                    state.entry = state.settled
+                    self._counters["touch_only"] += 1
+                else:
+                    state.entry = state.settled = (name, size, mtime_ns)
+                state.digest = digest
+        self._publish()
+
+    def _is_quiet(self, name: str, state: FileState, now: float) -> bool:
+        """
+        Whether a file is unchanged for settle seconds and not (recently) open for writing.
+        """
+        if now - state.changed_at < self.settle:
+            return False
+        written = self._writing.get(name)
+        return written is None or now - written >= OPEN_WRITE_GRACE
+
+    def _publish(self):
+        manifest, _ = self.snapshot()
+        if manifest != self._published:
+            self._published = manifest
+            self._published_at = time.monotonic()
+
+    def _maybe_prebuild(self):
+        """
+        Rebuilds the bundle once no file is pending and the settled manifest has
+        been unchanged for settle seconds.
+        """
+        self._publish()
+        if self.bundle_cache is None or self._published == self._built:
+            return
+        with self._lock:
+            if any(state.entry is None for state in self._files.values()):
+                return
+        if time.monotonic() - self._published_at < self.settle:
+            return
+        manifest = list(self._published)
+        if not manifest:
+            self._built = manifest
+            return
+        try:
+            # Holds only the cache's build lock: requests checking or releasing bundles don't wait
+            with STAGE_SECONDS.time(stage="bundle_prebuild"):
+                bundle = self.bundle_cache.acquire(self.folder, manifest=manifest)
+            self.bundle_cache.release(bundle)
+            self._counters["prebuilds"] += 1
+            logger.info(f"✅ Prebuilt bundle for {len(manifest)} file(s) in {self.folder}")
+        except Exception as e:
+            self._counters["prebuild_errors"] += 1
+            logger.error(f"❌ Background bundle build failed: {e}", exc_info=True)
+        # Either way, don't retry until the folder changes again
+        self._built = manifest
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns event/hash/prebuild counters plus settled and pending file counts.
+        """
+        manifest, pending = self.snapshot()
+        stats = dict(self._counters)
+        stats["files"] = len(manifest)
+        stats["pending"] = pending
+        stats["inotify"] = int(self.mode == "inotify")
+        return stats
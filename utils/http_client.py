@@ -0,0 +1,86 @@
+"""
+Shared HTTP client layer.
+
+A single process-wide requests.Session keeps TCP/TLS connections alive and
+pooled per host, and retries idempotent requests with exponential backoff on
+connection errors and 5xx responses. 429s and Retry-After are left to the
+caller: providers hand them to the rate limiter (utils.rate_limiter), which
+backs off without holding a search thread. Services take a session by
+injection and fall back to this shared one.
+"""
+
+import logging
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                  max_retries: Optional[int] = None, backoff_factor: Optional[float] = None) -> requests.Session:
+    """
+    Creates a pooled, keep-alive session with retry and backoff.
+
+    Args:
+        pool_connections (Optional[int]): Number of per-host pools to cache.
+        pool_maxsize (Optional[int]): Maximum connections kept alive per host.
+        max_retries (Optional[int]): Retries on connection errors and 5xx.
+        backoff_factor (Optional[float]): Base for exponential backoff between retries.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    retry = Retry(
+        total=max_retries if max_retries is not None else Config.HTTP_MAX_RETRIES,
+        backoff_factor=backoff_factor if backoff_factor is not None else Config.HTTP_BACKOFF_FACTOR,
+        # No 429, and no sleeping on Retry-After: a provider's wait can outlast
+        # the search deadline, so the rate limiter handles it instead
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=False,
+        # Hand the final response back so callers can inspect status and headers
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections or Config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or Config.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide shared session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+                logger.info("🌐 Shared HTTP session initialized.")
+    return _session
+
+
+def close_http_session():
+    """
+    Closes the shared session and its pooled connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
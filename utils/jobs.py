@@ -0,0 +1,378 @@
+"""
+Background job scheduler for heavy per-user work (bundle builds, uploads).
+
+Handlers submit a job and return at once, so a long MLparset never holds one
+of the bot's update slots. A fixed pool of worker tasks runs the jobs (their
+blocking parts already go to threads), which bounds how much compression and
+uploading happens at once; searches stay on the update path and are not
+queued behind it.
+
+Scheduling:
+- Each job has a priority class; lower numbers are served first
+  (PRIORITY_INTERACTIVE before PRIORITY_BULK).
+- Within a class users take turns (round robin), so one user's pile of jobs
+  delays another user's job by at most one job per turn.
+- A job identical to one the same chat already has queued or running is not
+  queued again, and each user may only have so many jobs waiting.
+
+Each job owns a status message carrying a Cancel button. The job edits it with
+its progress, plus a ticker showing time spent in long stages. Cancelling a
+queued job drops it; cancelling a running one cancels its task at the next
+await (a blocking step already handed to a thread still runs to completion).
+"""
+
+import asyncio
+import contextvars
+import logging
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from config import Config
+from utils.logger import get_request_id
+from utils.metrics import JOB_WAIT_SECONDS, JOBS_QUEUED, JOBS_RUNNING, JOBS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# How long a started job waits for its status message to be attached
+ATTACH_TIMEOUT = 10.0
+
+
+class QueueFull(Exception):
+    """
+    The user already has Config.JOB_MAX_PER_USER jobs waiting.
+    """
+
+
+class Job:
+    """
+    One unit of background work and its status message.
+    """
+
+    def __init__(self, job_id: str, user_id: int, chat_id: int, kind: str, key: str, priority: int,
+                 run: Callable[["Job"], Awaitable[Any]]):
+        """
+        Initialize the job (JobScheduler.submit() creates these).
+
+        Args:
+            job_id (str): Short token used in the Cancel button's callback data.
+            user_id (int): Submitting user (the only one allowed to cancel).
+            chat_id (int): Chat the job answers in.
+            kind (str): Low-cardinality label for metrics (e.g. "mlparset").
+            key (str): Identity for deduplication within the chat.
+            priority (int): Priority class (lower runs first).
+            run (Callable[[Job], Awaitable]): The work; receives the job for progress updates.
+        """
+        self.id = job_id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.kind = kind
+        self.key = key
+        self.priority = priority
+        self.run = run
+        self.state = "queued"
+        self.created = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.status_msg = None
+        self.markup = None
+        self.stage: Optional[str] = None
+        self.stage_started = 0.0
+        self.closed = False
+        # Set when cancel() arrives before the task exists
+        self.cancel_requested = False
+        self._attached = asyncio.Event()
+        self._shown: Optional[str] = None
+        # The submitting update's context: the job's task runs in it (and logs its request id)
+        self.context = contextvars.copy_context()
+        self.request_id = get_request_id()
+
+    def attach(self, status_msg, markup=None):
+        """
+        Gives the job its status message and the keyboard (Cancel button) kept on it while it runs.
+        """
+        self.status_msg = status_msg
+        self.markup = markup
+        self._attached.set()
+
+    async def progress(self, text: str):
+        """
+        Shows a new stage on the status message (the ticker appends the time spent in it).
+        """
+        self.stage = text
+        self.stage_started = time.monotonic()
+        await self._edit(text, self.markup)
+
+    async def tick(self):
+        """
+        Refreshes the current stage with its elapsed time.
+        """
+        if self.stage and not self.closed:
+            elapsed = int(time.monotonic() - self.stage_started)
+            await self._edit(f"{self.stage} ({elapsed}s)", self.markup)
+
+    async def finish(self, text: str):
+        """
+        Replaces the status message with a final text (removing the Cancel button).
+        """
+        self.closed = True
+        await self._edit(text, None)
+
+    async def dismiss(self):
+        """
+        Deletes the status message (the job's output speaks for itself).
+        """
+        self.closed = True
+        if self.status_msg is not None:
+            try:
+                await self.status_msg.delete()
+            except Exception as e:
+                logger.debug(f"Could not delete status message of job {self.id}: {e}")
+
+    async def _edit(self, text: str, markup):
+        if self.status_msg is None or text == self._shown:
+            return
+        try:
+            await self.status_msg.edit_text(text, reply_markup=markup)
+            self._shown = text
+        except Exception as e:
+            # "Message is not modified", a deleted message or a flood limit: progress is best effort
+            logger.debug(f"Could not update status of job {self.id}: {e}")
+
+
+class JobScheduler:
+    """
+    Bounded worker pool over per-priority, per-user round-robin queues.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_per_user: Optional[int] = None,
+                 progress_interval: Optional[float] = None):
+        """
+        Initialize the scheduler (workers start with start()).
+
+        Args:
+            workers (Optional[int]): Jobs run concurrently.
+            max_per_user (Optional[int]): Queued (not yet running) jobs allowed per user.
+            progress_interval (Optional[float]): Seconds between elapsed-time status edits.
+        """
+        self.workers = workers or Config.JOB_WORKERS
+        self.max_per_user = max_per_user or Config.JOB_MAX_PER_USER
+        self.progress_interval = progress_interval or Config.JOB_PROGRESS_INTERVAL
+        # priority -> user_id -> that user's queued jobs (users in turn order)
+        self._queues: Dict[int, "OrderedDict[int, Deque[Job]]"] = {}
+        # job id -> queued or running job
+        self._jobs: Dict[str, Job] = {}
+        # (chat_id, key) -> queued or running job
+        self._by_key: Dict[Tuple[int, str], Job] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._counters = {"submitted": 0, "deduplicated": 0, "rejected": 0,
+                          "completed": 0, "failed": 0, "cancelled": 0}
+
+    async def start(self):
+        """
+        Starts the worker tasks on the running loop.
+        """
+        self._wakeup = asyncio.Event()
+        if any(self._queues.values()):
+            self._wakeup.set()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+        logger.info(f"🧵 Job scheduler started with {self.workers} workers.")
+
+    async def stop(self):
+        """
+        Cancels running jobs and stops the workers; queued jobs are dropped.
+        """
+        for job in list(self._jobs.values()):
+            if job.task is not None:
+                job.task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._jobs:
+            logger.info(f"🧵 Dropped {len(self._jobs)} unfinished jobs on shutdown.")
+
+    def submit(self, user_id: int, chat_id: int, kind: str, run: Callable[[Job], Awaitable[Any]],
+               priority: int = PRIORITY_BULK, key: Optional[str] = None) -> Tuple[Job, bool]:
+        """
+        Queues a job unless the chat already has the same one queued or running.
+
+        Args:
+            user_id (int): Submitting user.
+            chat_id (int): Chat the job answers in.
+            kind (str): Metrics label (e.g. "mlparset").
+            run (Callable[[Job], Awaitable]): The work.
+            priority (int): Priority class (PRIORITY_INTERACTIVE or PRIORITY_BULK).
+            key (Optional[str]): Deduplication identity within the chat (defaults to kind).
+
+        Returns:
+            Tuple[Job, bool]: The job and whether it was newly queued (False: the existing duplicate).
+
+        Raises:
+            QueueFull: If the user already has max_per_user jobs waiting.
+        """
+        identity = (chat_id, key or kind)
+        existing = self._by_key.get(identity)
+        # A closed job has already answered (its status message may be gone); repeating it is a new request
+        if existing is not None and not existing.closed:
+            self._counters["deduplicated"] += 1
+            return existing, False
+        waiting = sum(len(users.get(user_id, ())) for users in self._queues.values())
+        if waiting >= self.max_per_user:
+            self._counters["rejected"] += 1
+            raise QueueFull(f"user {user_id} has {waiting} jobs queued")
+
+        job = Job(secrets.token_urlsafe(6), user_id, chat_id, kind, key or kind, priority, run)
+        self._queues.setdefault(priority, OrderedDict()).setdefault(user_id, deque()).append(job)
+        self._jobs[job.id] = job
+        self._by_key[identity] = job
+        self._counters["submitted"] += 1
+        JOBS_QUEUED.inc(priority=priority)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job, True
+
+    def position(self, job: Job) -> int:
+        """
+        Approximate number of queued jobs that will start before job (0 if it is next or running).
+        """
+        if job.state != "queued":
+            return 0
+        ahead = 0
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if priority < job.priority:
+                ahead += sum(len(queue) for queue in users.values())
+            elif priority == job.priority:
+                mine = users.get(job.user_id, deque())
+                turn = mine.index(job) if job in mine else 0
+                # Round robin: users before us in the rotation get one job per turn of ours
+                # plus the current one, users after us one per earlier turn
+                ahead += turn
+                before = True
+                for user, queue in users.items():
+                    if user == job.user_id:
+                        before = False
+                    else:
+                        ahead += min(len(queue), turn + 1 if before else turn)
+        return ahead
+
+    async def cancel(self, job_id: str, user_id: int) -> bool:
+        """
+        Cancels a queued or running job on behalf of its owner.
+
+        Returns:
+            bool: False if there is no such job (or it belongs to someone else).
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return False
+        if job.state == "queued":
+            self._unqueue(job)
+            self._forget(job)
+            self._counters["cancelled"] += 1
+            JOBS_TOTAL.inc(kind=job.kind, outcome="cancelled")
+            await job.finish("🚫 Cancelled.")
+        elif job.task is not None:
+            job.task.cancel()
+        else:
+            job.cancel_requested = True
+        return True
+
+    def _unqueue(self, job: Job):
+        users = self._queues.get(job.priority, {})
+        queue = users.get(job.user_id)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            JOBS_QUEUED.dec(priority=job.priority)
+            if not queue:
+                del users[job.user_id]
+
+    def _forget(self, job: Job):
+        self._jobs.pop(job.id, None)
+        if self._by_key.get((job.chat_id, job.key)) is job:
+            del self._by_key[(job.chat_id, job.key)]
+
+    def _next(self) -> Optional[Job]:
+        """
+        Takes the next job: highest priority class first, users in turn within it.
+        """
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if not users:
+                continue
+            user_id, queue = users.popitem(last=False)
+            job = queue.popleft()
+            if queue:
+                # Back of the line for this user's next job
+                users[user_id] = queue
+            JOBS_QUEUED.dec(priority=priority)
+            return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        """
+        Runs one job to completion, failure or cancellation (the worker itself is never cancelled by it).
+        """
+        job.state = "running"
+        started = time.monotonic()
+        JOB_WAIT_SECONDS.observe(started - job.created, kind=job.kind)
+        try:
+            await asyncio.wait_for(job._attached.wait(), timeout=ATTACH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Job {job.id} ({job.kind}) started without a status message.")
+
+        job.task = job.context.run(asyncio.create_task, job.run(job), name=f"job-{job.kind}-{job.id}")
+        if job.cancel_requested:
+            job.task.cancel()
+        ticker = asyncio.create_task(self._tick(job))
+        outcome = "completed"
+        try:
+            with JOBS_RUNNING.track_inprogress():
+                await asyncio.wait([job.task])
+            if job.task.cancelled():
+                outcome = "cancelled"
+                await job.finish("🚫 Cancelled.")
+            elif job.task.exception() is not None:
+                outcome = "failed"
+                logger.error(f"❌ Job {job.id} ({job.kind}) failed: {job.task.exception()}",
+                             exc_info=job.task.exception(), extra={"request_id": job.request_id})
+                await job.finish("❌ Error processing request. Please try again.")
+            elif not job.closed:
+                await job.finish("✅ Done.")
+        finally:
+            ticker.cancel()
+            job.state = outcome
+            self._forget(job)
+            self._counters[outcome] += 1
+            JOBS_TOTAL.inc(kind=job.kind, outcome=outcome)
+            elapsed = (time.monotonic() - started) * 1000
+            logger.info(f"🧵 Job {job.id} ({job.kind}) {outcome} in {elapsed:.0f} ms",
+                        extra={"request_id": job.request_id, "duration_ms": round(elapsed, 1)})
+
+    async def _tick(self, job: Job):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await job.tick()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns job counters plus the number of queued and running jobs.
+        """
+        # Called from /stats and /metrics threads: iterate snapshots of the loop's dicts
+        stats = dict(self._counters)
+        stats["queued"] = sum(len(queue) for users in list(self._queues.values()) for queue in list(users.values()))
+        stats["running"] = sum(1 for job in list(self._jobs.values()) if job.state == "running")
+        return stats
@@ -1,39 +1,250 @@
 """
-Custom logging configuration for the Telegram Bot.
+Logging pipeline for the Telegram Bot: structured lines written off the event loop.
 
-This module provides a centralized production-grade logger setup
-that output to the console (stdout) with structured formatting.
+setup_logging() configures the root logger once per process. Records are put
+on a bounded queue by a QueueHandler, which never blocks: when the writer
+falls behind, records are dropped and counted. A warning or error arriving at
+a full queue takes the place of the oldest queued record below WARNING, so
+only a queue full of warnings drops them. A QueueListener thread formats them
+and writes to stdout, so a slow stdout pipe stalls that thread instead of the
+event loop.
+
+Each line is a compact JSON object: time, level, logger and message, the id
+of the update being handled (request_id, carried by a context variable into
+the update's tasks, jobs and to_thread() calls) and, when the caller passes
+extra={"duration_ms": ...}, how long the work took. LOG_FORMAT=text keeps the
+classic one-line format.
+
+Below WARNING, each logging call site may emit LOG_SAMPLE_BURST records per
+LOG_SAMPLE_WINDOW seconds. Further ones are suppressed, and the site's next
+record that gets through says how many were. A progress log inside a read
+loop thus becomes a trickle. Warnings and errors always pass.
 """
 
+import atexit
+import json
 import logging
+import queue
 import sys
+import threading
+import time
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+from config import Config
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(name)s] - %(message)s"
+TEXT_DATEFMT = "%Y-%m-%d %H:%M:%S"
+# Chatty at INFO (httpx logs every request the bot makes)
+QUIET_LOGGERS = ("httpx", "httpcore", "urllib3")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_setup_lock = threading.Lock()
+_handler: Optional["NonBlockingQueueHandler"] = None
+_sampler: Optional["SamplingFilter"] = None
+_listener: Optional[QueueListener] = None
+
+
+def set_request_id(request_id: Optional[str]) -> Token:
+    """
+    Tags records logged from the current context (and tasks started from it) with request_id.
+
+    Returns:
+        Token: For ContextVar.reset().
+    """
+    return _request_id.set(request_id)
+
+
+def get_request_id() -> Optional[str]:
+    """
+    Returns the request id of the current context, if any.
+    """
+    return _request_id.get()
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds request_id from the logging call's context (unless the call passed one).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets each call site log burst records per window below WARNING; counts the rest.
+    """
+
+    def __init__(self, burst: int, window: float):
+        """
+        Args:
+            burst (int): Records per call site and window (0 disables sampling).
+            window (float): Window length in seconds.
+        """
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.suppressed = 0
+        # (path, line) -> [window start, records passed, records suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.WARNING:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                self._sites[site] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            self.suppressed += 1
+            return False
+
 
-def setup_logger(name: str = "Bot") -> logging.Logger:
+class NonBlockingQueueHandler(QueueHandler):
     """
-    Configures and returns a production-ready console logger.
+    QueueHandler that drops (and counts) records instead of waiting on a full queue.
+
+    Records at WARNING and above evict the oldest queued lower-level record instead.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what the listener thread can't do later: merge the arguments and
+        # render the traceback (its frames must not outlive this call)
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg, record.args, record.message = message, None, message
+        record.exc_info, record.exc_text = None, exc_text
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Either the new record or the one it replaced is lost
+            self.dropped += 1
+            if record.levelno >= logging.WARNING:
+                self._replace_oldest_below_warning(record)
+
+    def _replace_oldest_below_warning(self, record: logging.LogRecord):
+        log_queue = self.queue
+        with log_queue.mutex:
+            for index, queued in enumerate(log_queue.queue):
+                # None is the listener's stop sentinel
+                if queued is not None and queued.levelno < logging.WARNING:
+                    del log_queue.queue[index]
+                    log_queue.queue.append(record)
+                    log_queue.not_empty.notify()
+                    return
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one compact JSON line.
+    """
+
+    # Optional record attributes copied into the line when set
+    FIELDS = ("request_id", "duration_ms", "suppressed")
+
+    def format(self, record: logging.LogRecord) -> str:
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        line = {
+            "ts": f"{stamp}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in self.FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                line[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line["exc"] = record.exc_text
+        if record.stack_info:
+            line["stack"] = record.stack_info
+        return json.dumps(line, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None):
+    """
+    Routes every logger through the queue to a background writer (once per process).
 
     Args:
-        name (str): The name of the logger (default: "Bot").
+        level (Optional[str]): Root level name (defaults to Config.LOG_LEVEL).
+        fmt (Optional[str]): "json" or "text" (defaults to Config.LOG_FORMAT).
+        stream: Where lines are written (defaults to sys.stdout).
+    """
+    global _handler, _sampler, _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stdout)
+        if (fmt or Config.LOG_FORMAT).lower() == "text":
+            output.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATEFMT))
+        else:
+            output.setFormatter(JsonFormatter())
 
-    Returns:
-        logging.Logger: Configured logger instance.
-    """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
-    # Prevent adding duplicate handlers if setup is called multiple times
-    if logger.hasHandlers():
-        return logger
-    
-    # Use stdout for container/systemd compatibility
-    handler = logging.StreamHandler(sys.stdout)
-    
-    # Format: [Time] [Level] [Module] Message
-    formatter = logging.Formatter(
-        '[%(asctime)s] [%(levelname)s] [%(name)s] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    
-    return logger
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+        # Sampling first: a suppressed record costs nothing more
+        _sampler = SamplingFilter(Config.LOG_SAMPLE_BURST, Config.LOG_SAMPLE_WINDOW)
+        _handler.addFilter(_sampler)
+        _handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+        root.setLevel((level or Config.LOG_LEVEL).upper())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = QueueListener(_handler.queue, output)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """
+    Writes out the queued records and stops the writer thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        logging.getLogger().removeHandler(_handler)
+
+
+def logging_stats() -> Dict[str, int]:
+    """
+    Returns queued, dropped and suppressed record counts (empty before setup_logging()).
+    """
+    if _handler is None:
+        return {}
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": _sampler.suppressed if _sampler is not None else 0,
+    }
@@ -0,0 +1,388 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small dependency-free registry of counters, gauges and histograms with
+labels, safe to update from worker threads. The bot's metrics are defined
+here so every instrumented module shares them; main.py serves the registry
+on GET /metrics. Components that already keep counters (caches, registries,
+rate limiter) are exported at scrape time through collectors instead of
+being double counted.
+
+Label values must stay low-cardinality (provider, handler, stage, route).
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond cache hits up to multi-minute uploads
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# (name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+class _Metric:
+    """
+    Base for labelled metrics: one child value per label combination.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count.
+    """
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down.
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        """
+        Increments the gauge for the duration of the block.
+        """
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observations in cumulative buckets, with sum and count.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count, sum]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """
+        Observes the wall-clock duration of the block (also when it raises).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, state[-1]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Collection of metrics plus scrape-time collectors, rendered as exposition text.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Each collector returns (name, kind, documentation, samples) families
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]):
+        """
+        Adds a callable producing metric families at scrape time.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [(m.name, m.kind, m.documentation, m.samples()) for m in metrics]
+        for collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"⚠️ Metrics collector failed: {e}")
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(_format_sample(*sample) for sample in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PROVIDER_SECONDS = REGISTRY.histogram(
+    "bot_provider_call_seconds", "Duration of one provider search call.", ["provider"])
+PROVIDER_CALLS = REGISTRY.counter(
+    "bot_provider_calls_total", "Provider search calls by outcome (ok, error, throttled, timeout).",
+    ["provider", "outcome"])
+PROVIDER_IN_FLIGHT = REGISTRY.gauge(
+    "bot_provider_calls_in_flight", "Provider calls currently running.", ["provider"])
+HANDLER_SECONDS = REGISTRY.histogram(
+    "bot_handler_seconds", "Duration of one update handler.", ["handler"])
+HANDLERS_IN_FLIGHT = REGISTRY.gauge(
+    "bot_handlers_in_flight", "Update handlers currently running.", ["handler"])
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Update handlers that raised.", ["handler"])
+STAGE_SECONDS = REGISTRY.histogram(
+    "bot_stage_seconds", "Duration of a processing stage (zip_build, tar_build, bundle_prebuild, upload, download, split).",
+    ["stage"])
+BYTES_SENT = REGISTRY.counter(
+    "bot_bytes_sent_total", "Bytes uploaded to Telegram.", ["kind"])
+BYTES_DOWNLOADED = REGISTRY.counter(
+    "bot_bytes_downloaded_total", "Bytes downloaded from origins.")
+HTTP_REQUESTS = REGISTRY.counter(
+    "bot_http_requests_total", "Requests served by the bot's HTTP server.", ["route", "status"])
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "bot_http_requests_in_flight", "HTTP requests currently being handled.")
+JOBS_QUEUED = REGISTRY.gauge(
+    "bot_jobs_queued", "Background jobs waiting for a worker.", ["priority"])
+JOBS_RUNNING = REGISTRY.gauge(
+    "bot_jobs_running", "Background jobs currently running.")
+JOB_WAIT_SECONDS = REGISTRY.histogram(
+    "bot_job_wait_seconds", "Time a background job spent queued.", ["kind"])
+JOBS_TOTAL = REGISTRY.counter(
+    "bot_jobs_total", "Finished background jobs by outcome (completed, failed, cancelled).", ["kind", "outcome"])
+UPDATES_DISPATCHED = REGISTRY.counter(
+    "bot_updates_dispatched_total", "Updates the supervisor queued for (or refused to) each worker.",
+    ["worker", "outcome"])
+WORKER_RESTARTS = REGISTRY.counter(
+    "bot_worker_restarts_total", "Worker processes restarted after exiting.", ["worker"])
+LOOP_LAG = REGISTRY.gauge(
+    "bot_event_loop_lag_seconds", "Latest event loop scheduling delay.")
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "bot_event_loop_lag_distribution_seconds", "Event loop scheduling delay samples.")
+
+
+def instrument_handler(name: str):
+    """
+    Decorator for async update handlers: duration histogram, in-flight gauge, error count
+    and a log line with the duration.
+
+    Args:
+        name (str): Handler label (e.g. "search").
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            with HANDLERS_IN_FLIGHT.track_inprogress(handler=name), HANDLER_SECONDS.time(handler=name):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    HANDLER_ERRORS.inc(handler=name)
+                    raise
+                finally:
+                    elapsed = (time.perf_counter() - started) * 1000
+                    logger.info(f"⏱️ Handled {name} in {elapsed:.0f} ms", extra={"duration_ms": round(elapsed, 1)})
+        return wrapper
+    return decorator
+
+
+def stats_collector(sources: Dict[str, Callable[[], Dict]]) -> Callable:
+    """
+    Builds a collector exporting components' stats() dicts as gauges.
+
+    Numeric values become bot_component_stat{component, stat, key}; key is
+    empty except for nested dicts (per-provider rate limiter state), where it
+    names the outer entry. Caches reporting
+    hits and misses also get bot_cache_hit_ratio. Sources run on the thread
+    that renders the registry (main.py renders off the event loop), so they
+    must be safe to call from any thread.
+
+    Args:
+        sources (Dict[str, Callable[[], Dict]]): Component name -> stats() callable.
+
+    Returns:
+        Callable: Collector for Registry.add_collector().
+    """
+    def collect():
+        stats, ratios = [], []
+        for component, source in list(sources.items()):
+            values = source()
+            for stat, value in values.items():
+                if isinstance(value, dict):
+                    for inner_stat, inner in value.items():
+                        if isinstance(inner, (int, float)) and not isinstance(inner, bool):
+                            stats.append(("bot_component_stat",
+                                          {"component": component, "stat": inner_stat, "key": str(stat)}, inner))
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats.append(("bot_component_stat", {"component": component, "stat": stat, "key": ""}, value))
+            if "hits" in values and "misses" in values:
+                served = values["hits"] + values.get("stale_hits", 0)
+                lookups = served + values["misses"]
+                ratios.append(("bot_cache_hit_ratio", {"cache": component}, served / lookups if lookups else 0.0))
+        return [
+            ("bot_component_stat", "gauge", "Counters and sizes reported by bot components.", stats),
+            ("bot_cache_hit_ratio", "gauge", "Share of cache lookups served from the cache.", ratios),
+        ]
+    return collect
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: how late a periodic sleep wakes up.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        """
+        Args:
+            interval (Optional[float]): Seconds between samples (defaults to Config.LOOP_LAG_INTERVAL).
+        """
+        self.interval = interval or Config.LOOP_LAG_INTERVAL
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Starts sampling on the running loop.
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - started - self.interval)
+            LOOP_LAG.set(self.lag)
+            LOOP_LAG_SECONDS.observe(self.lag)
@@ -0,0 +1,291 @@
+"""
+Lazy, cursor-based pagination of search results.
+
+The first page of a search comes from the regular fan-out. Each provider's
+result stream stays open as a lazy iterator (the Kaggle page=N walk, the Hub's
+Link-header pages, GitHub's page parameter), so a "Next" press only pulls the
+results it needs and never re-runs page one. Iterators left over from a live
+first page are parked here and picked up by the first "Next" press.
+
+Cursors live in a bounded store keyed by a short token that fits in a
+Telegram callback_data payload. Idle cursors expire after a TTL and the least
+recently used ones are dropped when the store is full; dropping one closes its
+iterators.
+"""
+
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from config import Config
+from utils.ranking import merge_results, normalize_url
+from utils.rate_limiter import ProviderThrottled
+
+logger = logging.getLogger(__name__)
+
+
+def _close(iterator: Optional[Iterator]):
+    """
+    Closes a generator (releasing any open response), ignoring other iterators.
+    """
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logger.debug(f"Error closing result iterator: {e}")
+
+
+class ProviderCursor:
+    """
+    Position in one provider's result stream.
+    """
+
+    def __init__(self, key: str, name: str, open_iterator: Callable[[int], Iterator[Dict[str, Any]]],
+                 consumed: int = 0, pending: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the cursor (no request is made until the first take()).
+
+        Args:
+            key (str): Provider key (as in bot_data["services"]).
+            name (str): Provider display name.
+            open_iterator (Callable[[int], Iterator]): Opens the stream at a result offset.
+            consumed (int): Results already read from the provider.
+            pending (Optional[List[Dict[str, Any]]]): Results read but not shown yet, served first.
+        """
+        self.key = key
+        self.name = name
+        self.consumed = consumed
+        self.pending = list(pending or [])
+        self.exhausted = False
+        self._open = open_iterator
+        self._iterator: Optional[Iterator[Dict[str, Any]]] = None
+
+    def take(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Returns up to count results (blocking; pending ones first).
+
+        Raises:
+            ProviderThrottled: If the provider is rate limiting us (the cursor stays usable).
+        """
+        taken = self.pending[:count]
+        del self.pending[:count]
+        while len(taken) < count and not self.exhausted:
+            if self._iterator is None:
+                self._iterator = self._open(self.consumed)
+            try:
+                taken.append(next(self._iterator))
+            except StopIteration:
+                self.exhausted = True
+                break
+            except ProviderThrottled:
+                # A generator that raised is finished; reopen at the same offset next time
+                self._iterator = None
+                self.pending[:0] = taken
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name} result stream failed: {e}")
+                self.exhausted = True
+                break
+            self.consumed += 1
+        return taken
+
+    def push_back(self, results: List[Dict[str, Any]]):
+        """
+        Returns unshown results to the front of the cursor.
+        """
+        self.pending[:0] = results
+
+    @property
+    def has_more(self) -> bool:
+        return bool(self.pending) or not self.exhausted
+
+    def close(self):
+        _close(self._iterator)
+        self._iterator = None
+
+
+@dataclass
+class ResultPage:
+    """
+    One page served from a SearchCursor.
+
+    Attributes:
+        results (List[Dict[str, Any]]): Results on this page, best first.
+        start (int): Number of results shown before this page.
+        has_more (bool): Whether another page may follow.
+        throttled (List[str]): Display names of providers skipped because they are rate limited.
+    """
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    start: int = 0
+    has_more: bool = False
+    throttled: List[str] = field(default_factory=list)
+
+
+class SearchCursor:
+    """
+    Pagination state of one search reply: provider cursors plus the URLs already shown.
+    """
+
+    def __init__(self, query: str, providers: List[ProviderCursor], shown: List[Dict[str, Any]]):
+        """
+        Initialize the cursor.
+
+        Args:
+            query (str): The search query (used for ranking each page).
+            providers (List[ProviderCursor]): One cursor per provider.
+            shown (List[Dict[str, Any]]): Results already shown to the user.
+        """
+        self.query = query
+        self.providers = providers
+        self.shown = len(shown)
+        self.shown_urls: Set[str] = {normalize_url(result.get("url", "")) for result in shown}
+        # Serializes "Next" presses on the same message
+        self.lock = asyncio.Lock()
+
+    @property
+    def has_more(self) -> bool:
+        return any(provider.has_more for provider in self.providers)
+
+    def assemble(self, pulled: Dict[str, List[Dict[str, Any]]], size: int) -> List[Dict[str, Any]]:
+        """
+        Ranks freshly pulled results into one page and pushes the unused ones back.
+
+        Args:
+            pulled (Dict[str, List[Dict[str, Any]]]): Results taken per provider name.
+            size (int): Page size.
+
+        Returns:
+            List[Dict[str, Any]]: The page, best first.
+        """
+        fresh = {
+            name: [result for result in results if normalize_url(result.get("url", "")) not in self.shown_urls]
+            for name, results in pulled.items()
+        }
+        ranked = merge_results(fresh, self.query)
+        page = ranked[:size]
+        # Ranked but not shown goes back for the next page; near-duplicates are dropped for good
+        leftover = {id(result) for result in ranked[size:]}
+        for provider in self.providers:
+            provider.push_back([result for result in fresh.get(provider.name, []) if id(result) in leftover])
+
+        self.shown_urls.update(normalize_url(result.get("url", "")) for result in page)
+        self.shown += len(page)
+        return page
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+class CursorStore:
+    """
+    Bounded, expiring store of search cursors and parked first-page iterators.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize the store.
+
+        Args:
+            max_entries (Optional[int]): Maximum cursors (and, separately, parked iterators) kept.
+            ttl (Optional[float]): Seconds an idle entry is kept.
+        """
+        self.max_entries = max_entries or Config.CURSOR_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.CURSOR_TTL
+        # token -> (cursor, expires_at), least recently used first
+        self._cursors: "OrderedDict[str, tuple]" = OrderedDict()
+        # key -> (iterator, expires_at)
+        self._parked: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"opened": 0, "resumed": 0, "expired": 0, "evicted": 0, "parked": 0, "unparked": 0}
+
+    def put(self, cursor: SearchCursor) -> str:
+        """
+        Stores a cursor and returns its token (10 URL-safe characters).
+        """
+        token = secrets.token_urlsafe(8)
+        with self._lock:
+            self._cursors[token] = (cursor, time.monotonic() + self.ttl)
+            self._counters["opened"] += 1
+            dropped = self._trim(self._cursors)
+        self._release(dropped)
+        return token
+
+    def get(self, token: str) -> Optional[SearchCursor]:
+        """
+        Returns the cursor for token (extending its lifetime), or None if it expired.
+        """
+        with self._lock:
+            dropped = self._trim(self._cursors)
+            entry = self._cursors.get(token)
+            if entry is not None:
+                self._cursors[token] = (entry[0], time.monotonic() + self.ttl)
+                self._cursors.move_to_end(token)
+                self._counters["resumed"] += 1
+        self._release(dropped)
+        return entry[0] if entry is not None else None
+
+    def park(self, key: str, iterator: Iterator):
+        """
+        Keeps an open provider iterator for the first "Next" press on the same search.
+        """
+        with self._lock:
+            previous = self._parked.pop(key, None)
+            self._parked[key] = (iterator, time.monotonic() + self.ttl)
+            self._counters["parked"] += 1
+            dropped = self._trim(self._parked)
+        if previous is not None:
+            dropped.append(previous[0])
+        self._release(dropped)
+
+    def unpark(self, key: str) -> Optional[Iterator]:
+        """
+        Takes a parked iterator (each one is handed out once).
+        """
+        with self._lock:
+            dropped = self._trim(self._parked)
+            entry = self._parked.pop(key, None)
+            if entry is not None:
+                self._counters["unparked"] += 1
+        self._release(dropped)
+        return entry[0] if entry is not None else None
+
+    def _trim(self, entries: "OrderedDict[str, tuple]") -> List[Any]:
+        """
+        Drops expired entries and the least recently used ones beyond max_entries (lock held).
+        """
+        dropped = []
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in entries.items() if expires_at <= now]:
+            dropped.append(entries.pop(key)[0])
+            self._counters["expired"] += 1
+        while len(entries) > self.max_entries:
+            dropped.append(entries.popitem(last=False)[1][0])
+            self._counters["evicted"] += 1
+        return dropped
+
+    @staticmethod
+    def _release(dropped: List[Any]):
+        """
+        Closes dropped cursors and iterators outside the lock.
+        """
+        for item in dropped:
+            if isinstance(item, SearchCursor):
+                item.close()
+            else:
+                _close(item)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns counters plus the number of open cursors and parked iterators.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["cursors"] = len(self._cursors)
+            stats["parked_iterators"] = len(self._parked)
+        return stats
@@ -0,0 +1,311 @@
+"""
+On-demand profiling of the running bot.
+
+Nothing here runs, and cProfile, pstats and tracemalloc are not even imported,
+until an admin asks for it: through the /profile bot command (ADMIN_USER_IDS)
+or the /debug/* routes on the HTTP port (PROFILE_TOKEN). An idle Profiler is
+a handful of counters, so it stays wired in permanently.
+
+Available on demand:
+- CPU for N seconds, either with a sampling profiler (a thread reading every
+  thread's stack each PROFILE_SAMPLE_INTERVAL; low overhead; writes folded
+  stacks for flamegraph.pl or speedscope) or with cProfile (exact call counts
+  for the event loop thread; writes a .prof file for pstats or snakeviz);
+- memory: tracemalloc snapshots, each one diffed against the previous
+  (tracing costs memory and CPU while on, so it is started and stopped explicitly);
+- the stack of every asyncio task and thread, to see what a stuck loop is waiting on.
+
+Each result is written under PROFILE_DIR and returned with a text summary.
+"""
+
+import asyncio
+import io
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CPU_MODES = ("sample", "cprofile")
+MEMORY_ACTIONS = ("start", "snapshot", "stop")
+# Lines listed in text summaries
+SUMMARY_LINES = 25
+
+
+class ProfilerBusy(Exception):
+    """
+    A CPU profile is already running in this process.
+    """
+
+
+@dataclass
+class ProfileResult:
+    """
+    Where a profile was written and what it found.
+
+    Attributes:
+        path (Optional[str]): The written file (None when nothing was written).
+        summary (str): Human-readable summary.
+    """
+    path: Optional[str]
+    summary: str
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_stacks(stop: threading.Event, interval: float, stacks: Counter):
+    """
+    Sampler thread: counts (thread name, frames root first...) of every other thread until stop is set.
+    """
+    me = threading.get_ident()
+    while not stop.wait(interval):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stacks[tuple(reversed(stack))] += 1
+
+
+class Profiler:
+    """
+    CPU, memory and task-stack profiles for this process, taken on request.
+    """
+
+    def __init__(self, out_dir: Optional[str] = None, sample_interval: Optional[float] = None,
+                 max_seconds: Optional[float] = None, frames: Optional[int] = None):
+        """
+        Initialize the profiler (starts nothing).
+
+        Args:
+            out_dir (Optional[str]): Where results are written (defaults to Config.PROFILE_DIR).
+            sample_interval (Optional[float]): Seconds between stack samples.
+            max_seconds (Optional[float]): Longest CPU profile allowed.
+            frames (Optional[int]): Frames tracemalloc keeps per allocation.
+        """
+        self.out_dir = out_dir or Config.PROFILE_DIR
+        self.sample_interval = sample_interval or Config.PROFILE_SAMPLE_INTERVAL
+        self.max_seconds = max_seconds or Config.PROFILE_MAX_SECONDS
+        self.frames = frames or Config.PROFILE_TRACEMALLOC_FRAMES
+        self._cpu_running = False
+        self._snapshot = None
+        self._counters = {"cpu_profiles": 0, "memory_snapshots": 0, "task_dumps": 0}
+
+    # ---------------------------------------------------------
+    # CPU
+    # ---------------------------------------------------------
+
+    async def profile_cpu(self, seconds: float, mode: str = "sample") -> ProfileResult:
+        """
+        Profiles the process for seconds while the event loop keeps running.
+
+        Args:
+            seconds (float): Duration (capped at max_seconds).
+            mode (str): "sample" (all threads, low overhead) or "cprofile" (event loop thread, exact).
+
+        Returns:
+            ProfileResult: The folded stacks or .prof file and the hottest entries.
+
+        Raises:
+            ValueError: On an unknown mode or a duration that is not a positive number.
+            ProfilerBusy: If a CPU profile is already running.
+        """
+        if mode not in CPU_MODES:
+            raise ValueError(f"Unknown CPU profile mode {mode!r} (use {' or '.join(CPU_MODES)})")
+        # NaN passes "<= 0" and would make asyncio.sleep() wait forever
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError("The duration must be a positive number of seconds")
+        if self._cpu_running:
+            raise ProfilerBusy("A CPU profile is already running")
+        seconds = min(seconds, self.max_seconds)
+        self._cpu_running = True
+        logger.info(f"🔬 CPU profile ({mode}) started for {seconds:g}s")
+        try:
+            if mode == "cprofile":
+                result = await self._cprofile(seconds)
+            else:
+                result = await self._sample(seconds)
+        finally:
+            self._cpu_running = False
+        self._counters["cpu_profiles"] += 1
+        logger.info(f"🔬 CPU profile written to {result.path}")
+        return result
+
+    async def _sample(self, seconds: float) -> ProfileResult:
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(target=_sample_stacks, args=(stop, self.sample_interval, stacks),
+                                   name="profiler-sampler", daemon=True)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+
+        path = self._path("cpu-sample", "folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+        total = sum(stacks.values())
+        threads, leaves = Counter(), Counter()
+        for stack, count in stacks.items():
+            threads[stack[0]] += count
+            leaves[(stack[0], stack[-1])] += count
+        lines = [f"{total} samples over {seconds:g}s (wall clock), every {self.sample_interval * 1000:g} ms", "",
+                 "Samples per thread:"]
+        lines += [f"  {count * 100 / total:5.1f}%  {thread}" for thread, count in threads.most_common(SUMMARY_LINES)]
+        lines += ["", "Top frames (self):"]
+        lines += [f"  {count * 100 / total:5.1f}%  [{thread}] {frame}"
+                  for (thread, frame), count in leaves.most_common(SUMMARY_LINES)]
+        return ProfileResult(path, "\n".join(lines) if total else "No samples taken.")
+
+    async def _cprofile(self, seconds: float) -> ProfileResult:
+        import cProfile
+        import pstats
+
+        # Enabled from a coroutine: profiles this (the event loop's) thread
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+
+        path = self._path("cpu-cprofile", "prof")
+        profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).strip_dirs().sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        return ProfileResult(path, out.getvalue().strip())
+
+    # ---------------------------------------------------------
+    # Memory
+    # ---------------------------------------------------------
+
+    async def memory(self, action: str = "snapshot") -> ProfileResult:
+        """
+        Starts or stops tracemalloc, or takes a snapshot diffed against the previous one.
+
+        Args:
+            action (str): "start", "snapshot" (starts tracing first if needed) or "stop".
+
+        Returns:
+            ProfileResult: For snapshots, the written report and the largest growth.
+
+        Raises:
+            ValueError: On an unknown action.
+        """
+        import tracemalloc
+
+        if action not in MEMORY_ACTIONS:
+            raise ValueError(f"Unknown memory action {action!r} (use {', '.join(MEMORY_ACTIONS)})")
+        if action == "stop":
+            if not tracemalloc.is_tracing():
+                return ProfileResult(None, "Memory tracing is not running.")
+            tracemalloc.stop()
+            self._snapshot = None
+            logger.info("🔬 Memory tracing stopped")
+            return ProfileResult(None, "Memory tracing stopped.")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._snapshot = await asyncio.to_thread(self._take_snapshot)
+            logger.info(f"🔬 Memory tracing started ({self.frames} frames)")
+            return ProfileResult(None, "Memory tracing started. Take a snapshot later to see what grew.")
+        if action == "start":
+            return ProfileResult(None, "Memory tracing is already running.")
+
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        current, peak = tracemalloc.get_traced_memory()
+        growth = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+        self._counters["memory_snapshots"] += 1
+
+        header = f"Traced memory: {current / 1024 ** 2:.1f} MB now, {peak / 1024 ** 2:.1f} MB peak"
+        path = self._path("memory", "txt")
+        with open(path, "w") as f:
+            f.write(f"{header}\n\nGrowth since the previous snapshot:\n")
+            f.writelines(f"{stat}\n" for stat in growth[:100])
+            f.write("\nLargest allocations (traceback):\n")
+            for stat in snapshot.statistics("traceback")[:20]:
+                f.write(f"\n{stat}\n")
+                f.writelines(f"{line}\n" for line in stat.traceback.format())
+        lines = [header, "", "Growth since the previous snapshot:"]
+        lines += [f"  {stat}" for stat in growth[:SUMMARY_LINES]]
+        logger.info(f"🔬 Memory snapshot written to {path}")
+        return ProfileResult(path, "\n".join(lines))
+
+    @staticmethod
+    def _take_snapshot():
+        import tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    # ---------------------------------------------------------
+    # Task and thread stacks
+    # ---------------------------------------------------------
+
+    def dump_tasks(self) -> ProfileResult:
+        """
+        Writes the stack of every asyncio task and thread (call from the event loop).
+
+        Returns:
+            ProfileResult: The dump and the tasks counted by coroutine.
+        """
+        tasks = sorted(asyncio.all_tasks(), key=lambda task: task.get_name())
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        out = io.StringIO()
+        out.write(f"{len(tasks)} asyncio tasks\n\n")
+        for task in tasks:
+            task.print_stack(file=out)
+            out.write("\n")
+        frames = sys._current_frames()
+        out.write(f"{len(frames)} threads\n\n")
+        for ident, frame in frames.items():
+            out.write(f"Thread {names.get(ident, ident)}:\n")
+            traceback.print_stack(frame, file=out)
+            out.write("\n")
+
+        path = self._path("tasks", "txt")
+        with open(path, "w") as f:
+            f.write(out.getvalue())
+        self._counters["task_dumps"] += 1
+
+        coroutines = Counter(getattr(task.get_coro(), "__qualname__", repr(task.get_coro())) for task in tasks)
+        lines = [f"{len(tasks)} asyncio tasks, {len(frames)} threads", "", "Tasks by coroutine:"]
+        lines += [f"  {count:5d}  {name}" for name, count in coroutines.most_common(SUMMARY_LINES)]
+        return ProfileResult(path, "\n".join(lines))
+
+    # ---------------------------------------------------------
+    # Helpers
+    # ---------------------------------------------------------
+
+    def _path(self, kind: str, extension: str) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.out_dir, f"{kind}-{stamp}-{os.getpid()}.{extension}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns profile counters and what is currently running.
+        """
+        tracing = "tracemalloc" in sys.modules and sys.modules["tracemalloc"].is_tracing()
+        return dict(self._counters, cpu_running=int(self._cpu_running), memory_tracing=int(tracing))
@@ -0,0 +1,286 @@
+"""
+Provider-aware rate limiting.
+
+Each provider gets a token bucket sized from configuration. The bucket then
+learns the real budget from upstream responses: GitHub's X-RateLimit-*
+headers and Retry-After elsewhere. A request that would wait only briefly
+for a token is queued; one that would wait longer is shed with
+ProviderThrottled, so callers can tell "throttled" apart from "no results".
+Bucket state lives in the state backend, so with several workers they all
+draw from one budget per provider.
+"""
+
+import email.utils
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from config import Config
+from utils.state import MemoryBackend, StateBackend, get_state_backend
+
+logger = logging.getLogger(__name__)
+
+_limiter: Optional["RateLimiter"] = None
+_limiter_lock = threading.Lock()
+
+
+class ProviderThrottled(Exception):
+    """
+    Raised when a provider's rate limit is exhausted.
+
+    Attributes:
+        provider (str): Provider key (e.g. "github").
+        retry_after (float): Seconds until the provider is expected to accept requests.
+    """
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is rate limited for another {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """
+    Parses a "count/seconds" rate spec such as "30/60".
+
+    Args:
+        spec (str): The rate spec.
+
+    Returns:
+        Tuple[int, float]: (bucket capacity, refill period in seconds).
+    """
+    count, _, period = spec.partition("/")
+    return int(count), float(period or 1)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parses a Retry-After header given as seconds or an HTTP date.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if absent or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (now or time.time()))
+
+
+class TokenBucket:
+    """
+    Token bucket that may go negative to represent queued reservations.
+
+    Times are wall-clock (time.time()), so the state can be shared between
+    processes through a StateBackend.
+    """
+
+    def __init__(self, capacity: int, period: float, state: Optional[Dict[str, float]] = None):
+        self.capacity = capacity
+        self.rate = capacity / period
+        state = state or {}
+        self.tokens = float(state.get("tokens", capacity))
+        self.updated = state.get("updated", time.time())
+        # Time before which the upstream told us not to call it
+        self.blocked_until = state.get("blocked_until", 0.0)
+
+    def refill(self, now: float):
+        # max(): a clock stepping backwards must not drain the bucket
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until one more token would be available.
+        """
+        token_wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(token_wait, self.blocked_until - now)
+
+    def state(self) -> Dict[str, float]:
+        """
+        Returns the bucket's mutable state as a JSON-serializable dict.
+        """
+        return {"tokens": self.tokens, "updated": self.updated, "blocked_until": self.blocked_until}
+
+
+class RateLimiter:
+    """
+    Per-provider token buckets with adaptive backoff from response headers.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, str]] = None, max_wait: Optional[float] = None,
+                 backend: Optional[StateBackend] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits (Optional[Dict[str, str]]): Provider key -> "count/seconds" budget.
+            max_wait (Optional[float]): Longest a caller is queued before the request is shed.
+            backend (Optional[StateBackend]): Where bucket state lives; a shared backend
+                makes every worker draw from the same budget (defaults to this process's memory).
+        """
+        limits = limits or Config.RATE_LIMITS
+        self.max_wait = max_wait if max_wait is not None else Config.RATE_LIMIT_MAX_WAIT
+        self.backend = backend or MemoryBackend()
+        self._limits = {name: parse_rate(spec) for name, spec in limits.items()}
+        self._lock = threading.Lock()
+        self._counters = {
+            name: {"allowed": 0, "queued": 0, "shed": 0, "throttled_responses": 0}
+            for name in self._limits
+        }
+
+    def _update(self, provider: str, fn: Callable[[TokenBucket, float], Any]) -> Any:
+        """
+        Atomically applies fn(bucket, now) to provider's refilled bucket in the backend.
+        """
+        capacity, period = self._limits[provider]
+
+        def apply(state):
+            bucket = TokenBucket(capacity, period, state)
+            now = time.time()
+            bucket.refill(now)
+            result = fn(bucket, now)
+            return bucket.state(), result
+
+        return self.backend.update(f"ratelimit:{provider}", apply)
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        """
+        Returns a refilled snapshot of provider's bucket (changes are not stored).
+        """
+        bucket = TokenBucket(*self._limits[provider], self.backend.get(f"ratelimit:{provider}"))
+        bucket.refill(time.time())
+        return bucket
+
+    def acquire(self, provider: str):
+        """
+        Takes a token for provider, sleeping briefly if needed.
+
+        Args:
+            provider (str): Provider key.
+
+        Raises:
+            ProviderThrottled: If the wait would exceed max_wait.
+        """
+        if provider not in self._limits:
+            return
+
+        def reserve(bucket: TokenBucket, now: float) -> float:
+            wait = bucket.wait_time(now)
+            if wait <= self.max_wait:
+                bucket.tokens -= 1
+            return wait
+
+        wait = self._update(provider, reserve)
+        with self._lock:
+            counters = self._counters[provider]
+            if wait > self.max_wait:
+                counters["shed"] += 1
+                raise ProviderThrottled(provider, wait)
+            counters["allowed"] += 1
+            if wait > 0:
+                counters["queued"] += 1
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def update_from_headers(self, provider: str, status: int, headers: Mapping[str, str]):
+        """
+        Adapts the provider's bucket to what the upstream reported.
+
+        Args:
+            provider (str): Provider key.
+            status (int): HTTP status code of the response.
+            headers (Mapping[str, str]): Response headers.
+        """
+        if provider not in self._limits:
+            return
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if remaining is None and retry_after is None and status not in (403, 429):
+            # Nothing to learn; skip the (possibly cross-process) write
+            return
+
+        def adapt(bucket: TokenBucket, now: float) -> bool:
+            if remaining is not None and remaining.isdigit():
+                bucket.tokens = min(bucket.tokens, float(remaining))
+                if int(remaining) == 0 and reset and reset.isdigit():
+                    bucket.blocked_until = max(bucket.blocked_until, float(reset))
+            if retry_after is not None and status in (403, 429, 503):
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            return status in (403, 429) and bucket.blocked_until > now
+
+        if self._update(provider, adapt):
+            with self._lock:
+                self._counters[provider]["throttled_responses"] += 1
+
+    def check_response(self, provider: str, status: int, headers: Mapping[str, str]):
+        """
+        Records a response and raises if it was a rate-limit rejection.
+
+        Raises:
+            ProviderThrottled: If the upstream rejected the request for quota reasons.
+        """
+        self.update_from_headers(provider, status, headers)
+        if status not in (403, 429):
+            return
+        wait = self.blocked_for(provider)
+        if status == 429 or wait > 0:
+            raise ProviderThrottled(provider, wait)
+
+    def check_exception(self, provider: str, exc: Exception):
+        """
+        Inspects an SDK exception carrying an HTTP response and re-raises throttling.
+
+        Raises:
+            ProviderThrottled: If the exception wraps a 429 (or quota 403) response.
+        """
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+        headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+        if isinstance(status, int):
+            self.check_response(provider, status, headers)
+
+    def blocked_for(self, provider: str) -> float:
+        """
+        Seconds until provider is expected to accept requests again.
+        """
+        if provider not in self._limits:
+            return 0.0
+        return max(0.0, self._bucket(provider).blocked_until - time.time())
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns per-provider counters and current bucket state.
+        """
+        stats = {}
+        for name in self._limits:
+            bucket = self._bucket(name)
+            with self._lock:
+                stats[name] = dict(self._counters[name])
+            stats[name]["tokens"] = round(bucket.tokens, 2)
+            stats[name]["blocked_for"] = round(max(0.0, bucket.blocked_until - bucket.updated), 1)
+        return stats
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter, creating it on first use.
+
+    Returns:
+        RateLimiter: The shared limiter.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(backend=get_state_backend())
+    return _limiter
@@ -0,0 +1,73 @@
+"""
+Request coalescing for in-flight upstream calls.
+
+Concurrent callers asking for the same key share a single running task
+instead of each starting their own upstream request.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key (must be used on one event loop).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counters = {"calls": 0, "coalesced": 0}
+
+    def start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Returns the in-flight task for key, starting one if none is running.
+
+        Args:
+            key (str): Deduplication key.
+            factory (Callable[[], Awaitable[Any]]): Creates the coroutine for a new call.
+
+        Returns:
+            asyncio.Task: The shared task.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+            return task
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        self._counters["calls"] += 1
+
+        def _forget(done: asyncio.Task):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            # Background refreshes may have no waiter; retrieve the error so it is not lost
+            if not done.cancelled() and done.exception() is not None:
+                logger.debug(f"In-flight call for {key} failed: {done.exception()}")
+
+        task.add_done_callback(_forget)
+        return task
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits the shared call for key. Cancelling one waiter does not cancel the call.
+
+        Args:
+            key (str): Deduplication key.
+            factory (Callable[[], Awaitable[Any]]): Creates the coroutine for a new call.
+
+        Returns:
+            Any: The result of the shared call.
+        """
+        return await asyncio.shield(self.start(key, factory))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns upstream call and coalescing counters.
+        """
+        stats = dict(self._counters)
+        stats["in_flight"] = len(self._inflight)
+        return stats
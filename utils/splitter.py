@@ -0,0 +1,199 @@
+"""
+Splitting files into Telegram-sized parts.
+
+Parts are byte ranges of the source, numbered like 7-Zip volumes
+(`name.001`, `name.002`, ...), so `cat name.* > name` or 7-Zip restores the
+original. Callers that only need to send the parts use FileRangeView, which
+reads a range of the source in place with no part files at all. When physical
+parts are needed, they are copied in the kernel (copy_file_range, then
+sendfile), falling back to a small reusable buffer. Memory stays constant
+either way.
+"""
+
+import io
+import logging
+import os
+from typing import List, Optional, Tuple
+from config import Config
+from utils.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFSIZE = 1024 * 1024
+
+
+def plan_parts(size: int, limit: int) -> List[Tuple[int, int]]:
+    """
+    Splits size bytes into (offset, length) ranges of at most limit bytes.
+
+    Args:
+        size (int): Total size.
+        limit (int): Maximum part size.
+
+    Returns:
+        List[Tuple[int, int]]: Ranges in order (a single range if size fits).
+    """
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    if size <= limit:
+        return [(0, size)]
+    return [(offset, min(limit, size - offset)) for offset in range(0, size, limit)]
+
+
+def part_name(path: str, index: int) -> str:
+    """
+    Name of the 1-based part index of path (e.g. bundle.zip.001).
+    """
+    return f"{path}.{index:03d}"
+
+
+class FileRangeView(io.RawIOBase):
+    """
+    Read-only, seekable file object over a byte range of another file.
+
+    Reads use os.pread on a private descriptor, so views of the same file can be
+    read concurrently and never copy the range anywhere.
+    """
+
+    def __init__(self, path: str, offset: int, length: int, name: Optional[str] = None):
+        """
+        Initialize the view.
+
+        Args:
+            path (str): Source file.
+            offset (int): Start of the range.
+            length (int): Length of the range.
+            name (Optional[str]): File name reported to uploaders.
+        """
+        super().__init__()
+        self._fd = os.open(path, os.O_RDONLY)
+        self.offset = offset
+        self.length = length
+        self.name = name or os.path.basename(path)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self.length - self._pos)
+        if n <= 0:
+            return 0
+        data = os.pread(self._fd, n, self.offset + self._pos)
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.length}[whence]
+        self._pos = max(0, base + pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def __len__(self) -> int:
+        return self.length
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+def part_views(path: str, limit: Optional[int] = None, name: Optional[str] = None) -> List[FileRangeView]:
+    """
+    Opens one FileRangeView per part of path (callers close them).
+
+    Args:
+        path (str): File to split.
+        limit (Optional[int]): Maximum part size (defaults to Config.CHUNK_SIZE).
+        name (Optional[str]): File name the parts are numbered after (defaults to path's).
+
+    Returns:
+        List[FileRangeView]: Views named like the parts split_file() would create.
+    """
+    limit = limit or Config.CHUNK_SIZE
+    base = name or os.path.basename(path)
+    ranges = plan_parts(os.path.getsize(path), limit)
+    if len(ranges) == 1:
+        return [FileRangeView(path, 0, ranges[0][1], base)]
+    return [FileRangeView(path, offset, length, part_name(base, index))
+            for index, (offset, length) in enumerate(ranges, 1)]
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, length: int):
+    """
+    Copies length bytes from src_fd at offset to the current position of dst_fd.
+
+    Tries copy_file_range, then sendfile, then a buffered pread/write loop.
+    """
+    remaining = length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while remaining:
+                copied = os.copy_file_range(src_fd, dst_fd, remaining, offset + length - remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError:
+            pass
+    if remaining and hasattr(os, "sendfile"):
+        try:
+            while remaining:
+                sent = os.sendfile(dst_fd, src_fd, offset + length - remaining, remaining)
+                if sent == 0:
+                    break
+                remaining -= sent
+        except OSError:
+            pass
+    while remaining:
+        chunk = os.pread(src_fd, min(COPY_BUFSIZE, remaining), offset + length - remaining)
+        if not chunk:
+            raise EOFError(f"Source ended {remaining} bytes before the requested range")
+        os.write(dst_fd, chunk)
+        remaining -= len(chunk)
+
+
+def split_file(path: str, limit: Optional[int] = None) -> List[str]:
+    """
+    Writes path as numbered part files next to it, if it exceeds limit.
+
+    Args:
+        path (str): File to split.
+        limit (Optional[int]): Maximum part size (defaults to Config.CHUNK_SIZE).
+
+    Returns:
+        List[str]: Part paths, or [path] if it already fits.
+    """
+    limit = limit or Config.CHUNK_SIZE
+    ranges = plan_parts(os.path.getsize(path), limit)
+    if len(ranges) == 1:
+        return [path]
+
+    logger.info(f"✂️ Splitting {path} into {len(ranges)} parts of up to {limit // (1024 * 1024)}MB")
+    with STAGE_SECONDS.time(stage="split"):
+        paths = []
+        src_fd = os.open(path, os.O_RDONLY)
+        try:
+            for index, (offset, length) in enumerate(ranges, 1):
+                chunk_path = part_name(path, index)
+                dst_fd = os.open(chunk_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                paths.append(chunk_path)
+                try:
+                    copy_range(src_fd, dst_fd, offset, length)
+                finally:
+                    os.close(dst_fd)
+        except Exception:
+            for chunk_path in paths:
+                try:
+                    os.remove(chunk_path)
+                except OSError:
+                    pass
+            raise
+        finally:
+            os.close(src_fd)
+    return paths
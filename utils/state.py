@@ -0,0 +1,311 @@
+"""
+Pluggable backend for state shared between bot worker processes.
+
+With several workers (Config.WORKERS > 1) the shared search cache tier,
+provider rate-limit buckets and in-flight locks live here instead of in
+process memory, so workers don't repeat each other's upstream calls or
+overspend a provider's quota together.
+
+Backends store JSON-serializable values under string keys with an optional
+TTL, and offer one atomic primitive, update(): a read-modify-write of one
+key. Locks are built on top of it. Two backends ship in-tree:
+- "memory": a dict in this process (the default with a single worker);
+- "sqlite": one SQLite file used by every worker on the host. SQLite's own
+  file locking serializes update() across processes (BEGIN IMMEDIATE).
+Any other backend (Redis, ...) can be plugged in as "package.module:Class".
+
+The Telegram file_id registry and the local index are SQLite files of their
+own and are shared by pointing every worker at the same path (the default).
+"""
+
+import importlib
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_backend: Optional["StateBackend"] = None
+_backend_lock = threading.Lock()
+
+# Every this many writes, the SQLite backend deletes expired rows
+PURGE_EVERY = 500
+
+# Returned by an update() function as the new value to leave the key (and its TTL) as it is
+KEEP = object()
+
+# fn(current value or None) -> (new value, None to delete or KEEP, result)
+Updater = Callable[[Optional[Any]], Tuple[Optional[Any], Any]]
+
+
+class StateBackend:
+    """
+    Key/value store with TTLs and an atomic read-modify-write.
+
+    Attributes:
+        shared (bool): Whether other processes see the same state.
+        owner (str): Identifies this process; prefixes its lock tokens.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._counters = {"reads": 0, "writes": 0, "locks_taken": 0, "locks_busy": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the value stored under key, or None if missing or expired.
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Stores value under key, expiring after ttl seconds (never if None).
+        """
+        self.update(key, lambda current: (value, None), ttl)
+
+    def delete(self, key: str):
+        """
+        Removes key.
+        """
+        self.update(key, lambda current: (None, None))
+
+    def update(self, key: str, fn: Updater, ttl: Optional[float] = None) -> Any:
+        """
+        Atomically replaces the value of key with fn's result.
+
+        Args:
+            key (str): Key to update.
+            fn (Updater): Called with the current value (None if missing or expired);
+                returns (new value, result). A new value of None deletes the key,
+                KEEP leaves it untouched.
+            ttl (Optional[float]): Seconds until the new value expires (never if None).
+
+        Returns:
+            Any: The result returned by fn.
+        """
+        raise NotImplementedError
+
+    def try_lock(self, name: str, ttl: float, token: Optional[str] = None) -> Optional[str]:
+        """
+        Takes the named lock for ttl seconds unless someone else holds it.
+
+        Each successful call gets its own token, so two callers in the same
+        process exclude each other too. Passing the token of a held lock
+        extends it.
+
+        Args:
+            name (str): Lock name.
+            ttl (float): Seconds until the lock expires on its own (covers crashed holders).
+            token (Optional[str]): Token from an earlier try_lock() to extend that hold.
+
+        Returns:
+            Optional[str]: The token to unlock with, or None if the lock is held by someone else.
+        """
+        mine = token or f"{self.owner}:{secrets.token_hex(8)}"
+
+        def claim(holder):
+            if holder is None or holder == mine:
+                return mine, mine
+            return KEEP, None
+
+        taken = self.update(f"lock:{name}", claim, ttl)
+        self._counters["locks_taken" if taken else "locks_busy"] += 1
+        return taken
+
+    def unlock(self, name: str, token: str):
+        """
+        Releases the named lock if it is still held with token (from try_lock()).
+        """
+        self.update(f"lock:{name}", lambda holder: (None if holder == token else KEEP, None))
+
+    def is_locked(self, name: str) -> bool:
+        """
+        Whether any process currently holds the named lock.
+        """
+        return self.get(f"lock:{name}") is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns read/write/lock counters of this process.
+        """
+        return dict(self._counters, shared=int(self.shared))
+
+    def close(self):
+        """
+        Releases the backend's resources.
+        """
+
+
+class MemoryBackend(StateBackend):
+    """
+    Process-local backend (values are stored as-is, without serialization).
+    """
+
+    def __init__(self):
+        super().__init__()
+        # key -> (value, expires_at or None)
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            self._counters["reads"] += 1
+            return self._live(key, time.time())
+
+    def update(self, key: str, fn: Updater, ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            now = time.time()
+            value, result = fn(self._live(key, now))
+            if value is KEEP:
+                return result
+            self._counters["writes"] += 1
+            if value is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (value, now + ttl if ttl is not None else None)
+            return result
+
+    def _live(self, key: str, now: float) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Backend on a SQLite file shared by every process that opens it.
+    """
+
+    shared = True
+
+    def __init__(self, db_path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            db_path (Optional[str]): SQLite file (defaults to Config.STATE_DB_PATH).
+            timeout (Optional[float]): Seconds to wait for another process's write lock.
+        """
+        super().__init__()
+        self.db_path = db_path or Config.STATE_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; update() opens its own write transaction
+        self._db = sqlite3.connect(self.db_path, timeout=timeout or Config.STATE_LOCK_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            self._counters["reads"] += 1
+            row = self._db.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, key: str, fn: Updater, ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            # Takes the database write lock up front, so the read below can't go stale
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, now)
+                ).fetchone()
+                value, result = fn(json.loads(row[0]) if row else None)
+                if value is KEEP:
+                    pass
+                elif value is None:
+                    self._db.execute("DELETE FROM state WHERE key = ?", (key,))
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value, separators=(",", ":")), now + ttl if ttl is not None else None)
+                    )
+                if value is not KEEP:
+                    self._writes += 1
+                    if self._writes % PURGE_EVERY == 0:
+                        self._db.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if value is not KEEP:
+                self._counters["writes"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["keys"] = self._db.execute("SELECT COUNT(*) FROM state").fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Backend name -> "module:Class"
+BACKENDS = {
+    "memory": "utils.state:MemoryBackend",
+    "sqlite": "utils.state:SQLiteBackend",
+}
+
+
+def create_backend(spec: Optional[str] = None) -> StateBackend:
+    """
+    Builds the backend named by spec.
+
+    Args:
+        spec (Optional[str]): "memory", "sqlite", "package.module:Class" or "auto"
+            (sqlite with several workers, else memory). Defaults to Config.STATE_BACKEND.
+
+    Returns:
+        StateBackend: The new backend.
+    """
+    spec = (spec or Config.STATE_BACKEND).strip()
+    if spec == "auto":
+        spec = "sqlite" if Config.WORKERS > 1 else "memory"
+    module_name, _, attr = BACKENDS.get(spec, spec).partition(":")
+    if not attr:
+        raise ValueError(f"Unknown state backend {spec!r}")
+    backend = getattr(importlib.import_module(module_name), attr)()
+    logger.info(f"🗃️ Using the {spec} state backend")
+    return backend
+
+
+def get_state_backend() -> StateBackend:
+    """
+    Returns the process-wide state backend, creating it on first use.
+
+    Returns:
+        StateBackend: The shared backend.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
@@ -0,0 +1,178 @@
+"""
+Streaming document uploads to the Telegram Bot API.
+
+python-telegram-bot reads file objects fully into memory before sending, so a
+generated archive would have to exist in full somewhere first. Here the
+multipart body is written straight from a file-like stream with chunked
+transfer encoding: compression and the network transfer overlap, and no
+temporary file is needed. When the stream's length is known (e.g. a
+FileRangeView over part of a bundle) the request carries a Content-Length
+instead of chunked encoding. The body cannot be replayed, so uploads are not
+retried; callers fall back to the temp-file path instead.
+"""
+
+import io
+import logging
+import re
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+import requests
+import urllib3
+from config import Config
+from utils.http_client import get_http_session
+from utils.metrics import BYTES_SENT, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Bot tokens appear in Bot API URLs ("/bot<id>:<secret>/sendDocument")
+TOKEN_PATTERN = re.compile(r"\d+:[A-Za-z0-9_-]{20,}")
+
+
+class StreamUploadError(Exception):
+    """
+    Raised when a streamed upload fails; the message never contains the bot token.
+
+    Attributes:
+        status (Optional[int]): HTTP status of Telegram's answer (None on transport errors).
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def redact_token(text: str) -> str:
+    """
+    Replaces anything shaped like a bot token in text.
+    """
+    return TOKEN_PATTERN.sub("<token>", text)
+
+
+class IterStream(io.RawIOBase):
+    """
+    Read-only file-like view over an iterator of byte chunks.
+
+    If length is given it is exposed as `len`, which requests uses as the
+    Content-Length (together with tell()).
+    """
+
+    def __init__(self, chunks: Iterable[bytes], length: Optional[int] = None):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self.bytes_read = 0
+        if length is not None:
+            self.len = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self.bytes_read += n
+        return n
+
+    def tell(self) -> int:
+        return self.bytes_read
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+        super().close()
+
+
+def _multipart_envelope(fields: Dict[str, Any], file_field: str, filename: str,
+                        boundary: str, content_type: str) -> Tuple[bytes, bytes]:
+    """
+    Builds the multipart/form-data bytes that go before and after the file part.
+    """
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode("utf-8")
+        + str(value).encode("utf-8") + b"\r\n"
+        for name, value in fields.items()
+    )
+    head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+             f"Content-Type: {content_type}\r\n\r\n").encode("utf-8")
+    return head, f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def _multipart_body(head: bytes, stream: io.RawIOBase, tail: bytes) -> Iterator[bytes]:
+    """
+    Yields the multipart body, reading the file part from stream.
+    """
+    yield head
+    while True:
+        chunk = stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+    yield tail
+
+
+def stream_document(base_url: str, chat_id: int, stream: io.RawIOBase, filename: str,
+                    caption: Optional[str] = None, session: Optional[requests.Session] = None,
+                    content_type: str = "application/zip", length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Sends a document whose bytes are produced while it uploads (blocking).
+
+    Args:
+        base_url (str): Bot API base URL including the token (telegram.Bot.base_url).
+        chat_id (int): Destination chat.
+        stream (io.RawIOBase): Source of the document bytes.
+        filename (str): File name shown in Telegram.
+        caption (Optional[str]): Document caption.
+        session (Optional[requests.Session]): HTTP session (defaults to the shared one).
+        content_type (str): MIME type of the document part.
+        length (Optional[int]): Size of the stream, if known (avoids chunked encoding).
+
+    Returns:
+        Dict[str, Any]: The sent Message as returned by the Bot API.
+
+    Raises:
+        StreamUploadError: If Telegram rejects the upload or the connection fails.
+    """
+    session = session or get_http_session()
+    boundary = uuid.uuid4().hex
+    fields = {"chat_id": chat_id}
+    if caption:
+        fields["caption"] = caption
+
+    head, tail = _multipart_envelope(fields, "document", filename, boundary, content_type)
+    body = IterStream(
+        _multipart_body(head, stream, tail),
+        length=len(head) + length + len(tail) if length is not None else None
+    )
+    try:
+        with STAGE_SECONDS.time(stage="upload"):
+            response = session.post(
+                f"{base_url}/sendDocument",
+                data=body,
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                timeout=(10, Config.STREAM_UPLOAD_TIMEOUT),
+            )
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        # requests puts the URL, token included, in its messages: keep only a redacted copy
+        raise StreamUploadError(f"sendDocument failed ({type(e).__name__}): {redact_token(str(e))}") from None
+    finally:
+        stream.close()
+        BYTES_SENT.inc(body.bytes_read, kind="stream")
+
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    if not response.ok or not payload.get("ok"):
+        description = payload.get("description") or response.reason
+        raise StreamUploadError(f"sendDocument failed ({response.status_code}): {redact_token(str(description))}",
+                                status=response.status_code)
+    sent = body.bytes_read - len(head) - len(tail)
+    logger.info(f"📤 Streamed {filename} ({sent / 1024 / 1024:.1f} MB) to chat {chat_id}")
+    return payload["result"]
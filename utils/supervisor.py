@@ -0,0 +1,452 @@
+"""
+Multi-process mode: a supervisor partitions updates across worker processes.
+
+With Config.WORKERS > 1 the process started by main.py only receives updates
+(long polling, or the webhook) and hands each one to a worker chosen by chat
+id. Every update of a chat therefore lands on the same worker, which keeps
+per-chat state (search cursors behind "Next", background jobs and their
+Cancel buttons) consistent without sharing it. Workers run the full bot
+without an Updater and coordinate the rest through the shared StateBackend.
+
+Updates travel as plain dicts. The supervisor buffers up to
+WORKER_QUEUE_SIZE of them per worker; a full buffer pushes back: the webhook
+answers 503 so Telegram redelivers later, and polling pauses. A sender thread
+writes them to the worker over a pipe of that worker's own, and the worker
+acknowledges each update as it hands it to the Application. Every
+incarnation of a worker gets fresh pipes, so a worker that dies mid-read
+leaves nothing locked behind: its replacement, started with exponential
+backoff, is first sent the updates the dead one never acknowledged, then the
+buffer. Workers also send a heartbeat from their event loop; one that stops
+beating for WORKER_HEARTBEAT_TIMEOUT (a wedged loop) is killed and restarted.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from telegram import Update
+from telegram.ext import Application
+from config import Config
+from utils.metrics import UPDATES_DISPATCHED, WORKER_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+# Sent to a worker to make it shut down
+STOP = None
+# A worker that stayed up this long counts as healthy again (its restart backoff resets)
+HEALTHY_UPTIME = 60.0
+MONITOR_INTERVAL = 1.0
+SHUTDOWN_TIMEOUT = 15.0
+# Workers beat this often; before their first beat they get STARTUP_TIMEOUT (imports, build_app)
+HEARTBEAT_INTERVAL = 2.0
+STARTUP_TIMEOUT = 120.0
+# How often a sender thread checks whether its incarnation is over
+SENDER_POLL = 0.2
+
+_CHAT_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post", "business_message",
+                "edited_business_message", "my_chat_member", "chat_member", "chat_join_request",
+                "message_reaction", "message_reaction_count", "chat_boost", "removed_chat_boost")
+_USER_FIELDS = ("callback_query", "inline_query", "chosen_inline_result", "shipping_query",
+                "pre_checkout_query", "poll_answer")
+
+
+def chat_key(update: Dict[str, Any]) -> int:
+    """
+    Returns the id an update is partitioned by.
+
+    Args:
+        update (Dict[str, Any]): Update as sent by the Bot API.
+
+    Returns:
+        int: The chat id; for updates without a chat, the sender's user id
+        (the private chat id), else the update id.
+    """
+    for name in _CHAT_FIELDS:
+        chat = (update.get(name) or {}).get("chat")
+        if chat:
+            return chat["id"]
+    callback = update.get("callback_query") or {}
+    chat = (callback.get("message") or {}).get("chat")
+    if chat:
+        return chat["id"]
+    for name in _USER_FIELDS:
+        payload = update.get(name) or {}
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+def partition(update: Dict[str, Any], workers: int) -> int:
+    """
+    Returns the index of the worker that handles update.
+    """
+    return chat_key(update) % workers
+
+
+@dataclass
+class WorkerLink:
+    """
+    A worker incarnation's end of its two pipes (passed to the worker entry point).
+
+    Attributes:
+        updates (Any): Connection receiving (seq, update dict) pairs, or STOP.
+        events (Any): Connection sending ("ack", seq) and ("beat", None) back.
+    """
+    updates: Any
+    events: Any
+
+
+class WorkerProcess:
+    """
+    One worker: its update buffer, which outlives restarts, and its current incarnation.
+
+    Attributes:
+        index (int): Worker number (its partition).
+        buffer (queue.Queue): Updates waiting to be sent, as (seq, update dict) pairs.
+        unacked (Dict[int, Dict]): Updates sent to the worker and not acknowledged yet, by seq.
+        process (Optional[Any]): The running process.
+        started_at (float): Monotonic time of the last start.
+        last_beat (Optional[float]): Monotonic time of the last heartbeat (None before the first).
+        restart_at (Optional[float]): Monotonic time a crashed worker is due to restart.
+        crashes (int): Crashes in a row (drives the restart backoff).
+        restarts (int): Restarts so far.
+        dispatched (int): Updates queued for this worker.
+        replayed (int): Updates re-sent to a restarted incarnation.
+    """
+
+    def __init__(self, index: int, queue_size: int):
+        self.index = index
+        self.buffer: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.unacked: Dict[int, Dict] = {}
+        self.lock = threading.Lock()
+        self.process: Optional[Any] = None
+        self.started_at = 0.0
+        self.last_beat: Optional[float] = None
+        self.restart_at: Optional[float] = None
+        self.crashes = 0
+        self.restarts = 0
+        self.dispatched = 0
+        self.replayed = 0
+        self.seq = 0
+        # The current incarnation's connections and threads
+        self.sender: Optional[Any] = None
+        self.events: Optional[Any] = None
+        self.threads: List[threading.Thread] = []
+        self.ended = threading.Event()
+
+    def responsive(self, now: float, timeout: float) -> bool:
+        """
+        Whether the process runs and has beaten recently (or is still within its startup time).
+        """
+        if self.process is None or not self.process.is_alive():
+            return False
+        if self.last_beat is None:
+            return now - self.started_at < STARTUP_TIMEOUT
+        return now - self.last_beat < timeout
+
+    def pending(self) -> int:
+        """
+        Updates buffered or in flight to the worker.
+        """
+        with self.lock:
+            return self.buffer.qsize() + len(self.unacked)
+
+
+class Supervisor:
+    """
+    Starts the worker processes, routes updates to them and restarts them when they die or hang.
+    """
+
+    def __init__(self, target: Callable[[int, WorkerLink], None], workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, restart_backoff: Optional[float] = None,
+                 heartbeat_timeout: Optional[float] = None):
+        """
+        Initialize the supervisor (no process starts until start()).
+
+        Args:
+            target (Callable[[int, WorkerLink], None]): Importable worker entry point, called
+                in the new process with the worker index and its WorkerLink.
+            workers (Optional[int]): Number of workers (defaults to Config.WORKERS).
+            queue_size (Optional[int]): Updates buffered per worker.
+            restart_backoff (Optional[float]): Longest wait before restarting a crashed worker.
+            heartbeat_timeout (Optional[float]): Silence after which a running worker is killed.
+        """
+        self.target = target
+        self.count = workers or Config.WORKERS
+        self.restart_backoff = restart_backoff or Config.WORKER_RESTART_BACKOFF
+        self.heartbeat_timeout = heartbeat_timeout or Config.WORKER_HEARTBEAT_TIMEOUT
+        # Fresh interpreters: forking a process that already runs threads is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+        size = queue_size or Config.WORKER_QUEUE_SIZE
+        self._workers: List[WorkerProcess] = [WorkerProcess(i, size) for i in range(self.count)]
+        self._stopping = False
+        self._monitor: Optional[asyncio.Task] = None
+        self._counters = {"dispatched": 0, "rejected": 0, "restarts": 0, "replayed": 0, "hung": 0}
+
+    async def start(self):
+        """
+        Starts every worker and the task that restarts crashed ones.
+        """
+        self._stopping = False
+        for worker in self._workers:
+            self._spawn(worker)
+        self._monitor = asyncio.create_task(self._watch())
+        logger.info(f"👷 Started {self.count} bot workers")
+
+    async def stop(self):
+        """
+        Asks every worker to finish, waiting up to SHUTDOWN_TIMEOUT before killing stragglers.
+        """
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            # Sent right after the updates already buffered
+            await loop.run_in_executor(None, self._put_stop, worker)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            await loop.run_in_executor(None, worker.process.join, max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning(f"⚠️ Worker {worker.index} did not stop in time; terminating it.")
+                worker.process.terminate()
+                await loop.run_in_executor(None, worker.process.join, 5)
+            await loop.run_in_executor(None, self._end_incarnation, worker)
+
+    def dispatch(self, update: Dict[str, Any]) -> bool:
+        """
+        Queues update for its worker without waiting.
+
+        Returns:
+            bool: False if that worker's buffer is full.
+        """
+        worker = self._workers[partition(update, self.count)]
+        with worker.lock:
+            worker.seq += 1
+            try:
+                worker.buffer.put_nowait((worker.seq, update))
+            except queue.Full:
+                self._counters["rejected"] += 1
+                UPDATES_DISPATCHED.inc(worker=worker.index, outcome="rejected")
+                return False
+        worker.dispatched += 1
+        self._counters["dispatched"] += 1
+        UPDATES_DISPATCHED.inc(worker=worker.index, outcome="queued")
+        return True
+
+    async def dispatch_wait(self, update: Dict[str, Any], interval: float = 0.05):
+        """
+        Queues update for its worker, waiting while the buffer is full (used by polling).
+        """
+        while not self.dispatch(update):
+            if self._stopping:
+                return
+            await asyncio.sleep(interval)
+
+    def alive(self) -> int:
+        """
+        Number of workers running with a recent heartbeat (or still starting up).
+        """
+        now = time.monotonic()
+        return sum(1 for worker in self._workers if worker.responsive(now, self.heartbeat_timeout))
+
+    def _spawn(self, worker: WorkerProcess):
+        """
+        Starts a new incarnation of worker with fresh pipes and its sender and event threads.
+        """
+        updates_in, updates_out = self._ctx.Pipe(duplex=False)
+        events_in, events_out = self._ctx.Pipe(duplex=False)
+        worker.process = self._ctx.Process(target=self.target,
+                                           args=(worker.index, WorkerLink(updates_in, events_out)),
+                                           name=f"bot-worker-{worker.index}", daemon=False)
+        worker.process.start()
+        # Only the worker keeps these ends, so its death shows up here as EOF / a broken pipe
+        updates_in.close()
+        events_out.close()
+        worker.sender, worker.events = updates_out, events_in
+        worker.ended = threading.Event()
+        worker.started_at = time.monotonic()
+        worker.last_beat = None
+        worker.restart_at = None
+        worker.threads = [
+            threading.Thread(target=self._send_loop, args=(worker, updates_out, worker.ended),
+                             name=f"worker-{worker.index}-sender", daemon=True),
+            threading.Thread(target=self._event_loop, args=(worker, events_in),
+                             name=f"worker-{worker.index}-events", daemon=True),
+        ]
+        for thread in worker.threads:
+            thread.start()
+        logger.info(f"👷 Worker {worker.index} running as pid {worker.process.pid}")
+
+    def _send_loop(self, worker: WorkerProcess, conn: Any, ended: threading.Event):
+        """
+        Sender thread: replays the unacknowledged updates, then feeds the buffer to the worker.
+        """
+        try:
+            with worker.lock:
+                replay = sorted(worker.unacked.items())
+            if replay:
+                worker.replayed += len(replay)
+                self._counters["replayed"] += len(replay)
+                logger.warning(f"🔁 Re-sending {len(replay)} unacknowledged update(s) to worker {worker.index}")
+            for item in replay:
+                conn.send(item)
+            while not ended.is_set():
+                try:
+                    item = worker.buffer.get(timeout=SENDER_POLL)
+                except queue.Empty:
+                    continue
+                if item is STOP:
+                    conn.send(STOP)
+                    return
+                with worker.lock:
+                    # Recorded before sending: if the worker dies first, the next incarnation gets it
+                    worker.unacked[item[0]] = item[1]
+                conn.send(item)
+        except (OSError, EOFError, ValueError):
+            # The worker went away; the watcher restarts it and the next sender replays
+            pass
+
+    def _event_loop(self, worker: WorkerProcess, conn: Any):
+        """
+        Event thread: records the worker's acknowledgements and heartbeats until its pipe closes.
+        """
+        while True:
+            try:
+                kind, value = conn.recv()
+            except (OSError, EOFError, ValueError):
+                return
+            if kind == "ack":
+                with worker.lock:
+                    worker.unacked.pop(value, None)
+            worker.last_beat = time.monotonic()
+
+    def _put_stop(self, worker: WorkerProcess):
+        try:
+            worker.buffer.put(STOP, timeout=1)
+        except queue.Full:
+            pass
+
+    def _end_incarnation(self, worker: WorkerProcess):
+        """
+        Closes a dead incarnation's pipes and waits for its threads (blocking).
+        """
+        worker.ended.set()
+        for conn in (worker.sender, worker.events):
+            if conn is not None:
+                conn.close()
+        for thread in worker.threads:
+            thread.join(timeout=5)
+        worker.sender = worker.events = None
+        worker.threads = []
+
+    async def _watch(self):
+        """
+        Restarts dead workers, backing off exponentially while they keep crashing, and kills hung ones.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            now = time.monotonic()
+            for worker in self._workers:
+                if self._stopping or worker.process is None:
+                    continue
+                if worker.process.is_alive():
+                    if not worker.responsive(now, self.heartbeat_timeout):
+                        self._counters["hung"] += 1
+                        logger.error(f"❌ Worker {worker.index} stopped sending heartbeats; killing it")
+                        worker.process.kill()
+                    continue
+                if worker.restart_at is None:
+                    uptime = now - worker.started_at
+                    worker.crashes = 1 if uptime >= HEALTHY_UPTIME else worker.crashes + 1
+                    delay = min(self.restart_backoff, 2 ** (worker.crashes - 1))
+                    worker.restart_at = now + delay
+                    logger.error(f"❌ Worker {worker.index} exited with code {worker.process.exitcode} "
+                                 f"after {uptime:.0f}s; restarting in {delay:.0f}s")
+                    await loop.run_in_executor(None, self._end_incarnation, worker)
+                elif now >= worker.restart_at:
+                    worker.restarts += 1
+                    self._counters["restarts"] += 1
+                    WORKER_RESTARTS.inc(worker=worker.index)
+                    self._spawn(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns dispatch counters and per-worker state.
+        """
+        now = time.monotonic()
+        stats = dict(self._counters, workers=self.count, alive=self.alive())
+        for worker in self._workers:
+            stats[f"worker-{worker.index}"] = {
+                "alive": int(worker.responsive(now, self.heartbeat_timeout)),
+                "pid": worker.process.pid if worker.process is not None else 0,
+                "queued": worker.pending(),
+                "dispatched": worker.dispatched,
+                "replayed": worker.replayed,
+                "restarts": worker.restarts,
+            }
+        return stats
+
+
+def start_inbox_reader(app: Application, link: WorkerLink, stop: asyncio.Event) -> threading.Thread:
+    """
+    Worker side: feeds updates from the supervisor's pipe into the Application.
+
+    A daemon thread blocks on the pipe and hands each update to the event loop,
+    which queues it for the Application and acknowledges it. A task on the loop
+    sends heartbeats, so a wedged loop goes quiet. stop is set when the
+    supervisor sends STOP or goes away.
+
+    Args:
+        app (Application): The worker's running application (without an Updater).
+        link (WorkerLink): The worker's pipes.
+        stop (asyncio.Event): Set to shut the worker down.
+
+    Returns:
+        threading.Thread: The reader thread.
+    """
+    loop = asyncio.get_running_loop()
+
+    def report(kind: str, value: Any = None):
+        # Only ever called on the loop, so sends don't interleave
+        try:
+            link.events.send((kind, value))
+        except (OSError, ValueError):
+            stop.set()
+
+    def deliver(seq: int, payload: Dict[str, Any]):
+        try:
+            app.update_queue.put_nowait(Update.de_json(payload, app.bot))
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"⚠️ Dropped malformed update from the supervisor: {e}")
+        report("ack", seq)
+
+    async def beat():
+        while not stop.is_set():
+            report("beat")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def read():
+        while True:
+            try:
+                item = link.updates.recv()
+            except (EOFError, OSError):
+                item = STOP
+            if item is STOP:
+                loop.call_soon_threadsafe(stop.set)
+                return
+            loop.call_soon_threadsafe(deliver, *item)
+
+    loop.create_task(beat())
+    thread = threading.Thread(target=read, name="worker-inbox", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,126 @@
+"""
+Persistent registry of Telegram file_ids for uploaded content.
+
+Telegram keeps every document the bot uploads and returns a file_id that can
+be sent again without transferring the bytes. The registry maps content hashes
+(bundles, split parts, catalog files) to those file_ids in SQLite, so
+re-uploads are skipped across restarts, and it counts the bytes saved.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UploadRegistry:
+    """
+    Maps content hashes to Telegram file_ids.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            db_path (Optional[str]): SQLite file (defaults to Config.UPLOAD_REGISTRY_PATH).
+        """
+        db_path = db_path or Config.UPLOAD_REGISTRY_PATH
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "content_hash TEXT PRIMARY KEY, file_id TEXT NOT NULL, size INTEGER NOT NULL, "
+            "label TEXT, created_at REAL NOT NULL, reuses INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS uploads_label ON uploads (label)")
+        self._db.commit()
+        self._counters = {"lookups": 0, "hits": 0, "uploads": 0, "invalidations": 0}
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """
+        Returns the file_id stored for content_hash, if any.
+
+        Args:
+            content_hash (str): Hash identifying the uploaded content.
+
+        Returns:
+            Optional[str]: The Telegram file_id, or None.
+        """
+        with self._lock:
+            self._counters["lookups"] += 1
+            row = self._db.execute(
+                "SELECT file_id FROM uploads WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if row:
+                self._counters["hits"] += 1
+            return row[0] if row else None
+
+    def record(self, content_hash: str, file_id: str, size: int, label: Optional[str] = None):
+        """
+        Stores the file_id Telegram returned for an upload.
+
+        When a label is given (e.g. "mlparset-bundle"), earlier entries with the
+        same label are dropped: the content behind that label has changed.
+
+        Args:
+            content_hash (str): Hash identifying the uploaded content.
+            file_id (str): The Telegram file_id.
+            size (int): Size of the uploaded content in bytes.
+            label (Optional[str]): Logical name of the content.
+        """
+        with self._lock:
+            if label:
+                self._db.execute(
+                    "DELETE FROM uploads WHERE label = ? AND content_hash != ?", (label, content_hash)
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, file_id, size, label, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, file_id, size, label, time.time())
+            )
+            self._db.commit()
+            self._counters["uploads"] += 1
+
+    def mark_reused(self, content_hash: str):
+        """
+        Counts a successful send-by-file_id for content_hash.
+        """
+        with self._lock:
+            self._db.execute("UPDATE uploads SET reuses = reuses + 1 WHERE content_hash = ?", (content_hash,))
+            self._db.commit()
+
+    def invalidate(self, content_hash: str):
+        """
+        Drops an entry whose file_id Telegram no longer accepts.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM uploads WHERE content_hash = ?", (content_hash,))
+            self._db.commit()
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns registry counters, including bytes saved by sending file_ids.
+        """
+        with self._lock:
+            entries, reuses, saved = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(reuses), 0), COALESCE(SUM(reuses * size), 0) FROM uploads"
+            ).fetchone()
+            stats = dict(self._counters)
+        stats.update({"entries": entries, "reuses": reuses, "bytes_saved": saved})
+        return stats
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self._lock:
+            self._db.close()
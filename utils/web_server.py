@@ -0,0 +1,272 @@
+"""
+Minimal asyncio HTTP/1.1 server for the webhook, health probes and stats.
+
+Runs on the bot's own event loop, so the webhook hands updates to the
+Application without crossing threads, and a slow client only holds its own
+connection: reading a request is bounded by a timeout, header and body sizes
+are capped, and connections beyond a limit are refused with 503 rather than
+queued. Keep-alive is supported (Telegram reuses webhook connections).
+Bodies must carry a Content-Length; chunked requests are refused.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+from config import Config
+from utils.metrics import HTTP_IN_FLIGHT, HTTP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+# How long a refused connection gets to send its request head before the 503
+BUSY_READ_TIMEOUT = 1.0
+# stop() waits this long for connection handlers to notice their closed sockets
+STOP_TIMEOUT = 5.0
+
+
+@dataclass
+class Request:
+    """
+    A parsed HTTP request.
+
+    Attributes:
+        method (str): Upper-case method.
+        path (str): Path without the query string.
+        query (Dict[str, list]): Parsed query string.
+        headers (Dict[str, str]): Headers with lower-case names.
+        body (bytes): Request body.
+        version (str): Protocol version from the request line.
+    """
+    method: str
+    path: str
+    query: Dict[str, list] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    version: str = "HTTP/1.1"
+
+
+@dataclass
+class Response:
+    """
+    An HTTP response.
+
+    Attributes:
+        status (int): Status code.
+        body (bytes): Response body.
+        content_type (str): Content-Type header.
+        headers (Dict[str, str]): Extra headers.
+    """
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class _BadRequest(Exception):
+    """
+    Malformed request; answered with status and the connection closed.
+    """
+
+    def __init__(self, status: HTTPStatus):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+class WebServer:
+    """
+    Routes (method, path) to async handlers on an asyncio server.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: Optional[int] = None,
+                 max_connections: Optional[int] = None, request_timeout: Optional[float] = None,
+                 max_body: Optional[int] = None):
+        """
+        Initialize the server (nothing listens until start()).
+
+        Args:
+            host (str): Interface to bind.
+            port (Optional[int]): Port to bind (defaults to Config.PORT; 0 picks a free one).
+            max_connections (Optional[int]): Open connections accepted before answering 503.
+            request_timeout (Optional[float]): Seconds to receive one request (and keep-alive idle limit).
+            max_body (Optional[int]): Largest accepted request body in bytes.
+        """
+        self.host = host
+        self.port = port if port is not None else Config.PORT
+        self.max_connections = max_connections or Config.WEB_MAX_CONNECTIONS
+        self.request_timeout = request_timeout or Config.WEB_REQUEST_TIMEOUT
+        self.max_body = max_body or Config.WEB_MAX_BODY
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self._counters = {"requests": 0, "rejected": 0, "errors": 0}
+
+    def route(self, method: str, path: str, handler: Handler):
+        """
+        Registers handler for method and path (GET routes also answer HEAD).
+        """
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        """
+        Starts listening; the bound port is available as self.port afterwards.
+        """
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌍 HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        """
+        Stops listening and closes open connections.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        # Before 3.12 wait_closed() doesn't wait for the handlers, which would be cancelled mid-read at loop exit
+        if self._handlers:
+            await asyncio.wait(list(self._handlers), timeout=STOP_TIMEOUT)
+        await self._server.wait_closed()
+        self._server = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns request counters and the number of open connections.
+        """
+        return dict(self._counters, connections=len(self._connections))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves one connection until it closes, times out or misbehaves.
+        """
+        if len(self._connections) >= self.max_connections:
+            self._counters["rejected"] += 1
+            try:
+                # Consume the request head first; closing on unread data resets the connection
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=BUSY_READ_TIMEOUT)
+                await self._write(writer, Response(HTTPStatus.SERVICE_UNAVAILABLE, b"Busy"), keep_alive=False)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                pass
+            writer.close()
+            return
+
+        self._connections.add(writer)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read(reader), timeout=self.request_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    # Idle keep-alive, slow or vanished client
+                    return
+                except _BadRequest as e:
+                    await self._write(writer, Response(e.status, e.status.phrase.encode()), keep_alive=False)
+                    return
+                if request is None:
+                    return
+
+                keep_alive = self._keep_alive(request)
+                response = await self._dispatch(request)
+                await self._write(writer, response, keep_alive, head=request.method == "HEAD")
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _read(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """
+        Reads one request (None on a clean close between requests).
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise _BadRequest(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise _BadRequest(HTTPStatus.LENGTH_REQUIRED)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        if length < 0:
+            raise _BadRequest(HTTPStatus.BAD_REQUEST)
+        if length > self.max_body:
+            raise _BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return Request(method.upper(), url.path or "/", parse_qs(url.query), headers, body, version)
+
+    async def _dispatch(self, request: Request) -> Response:
+        """
+        Runs the route handler, mapping missing routes and handler errors to status codes.
+        """
+        self._counters["requests"] += 1
+        method = "GET" if request.method == "HEAD" else request.method
+        handler = self._routes.get((method, request.path))
+        if handler is None:
+            # Unknown paths share one label so scanners can't blow up metric cardinality
+            route = request.path if any(path == request.path for _, path in self._routes) else "other"
+            status = HTTPStatus.METHOD_NOT_ALLOWED if route != "other" else HTTPStatus.NOT_FOUND
+            HTTP_REQUESTS.inc(route=route, status=status.value)
+            return Response(status, status.phrase.encode())
+        try:
+            with HTTP_IN_FLIGHT.track_inprogress():
+                response = await handler(request)
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.error(f"❌ HTTP handler for {request.method} {request.path} failed: {e}", exc_info=True)
+            response = Response(HTTPStatus.INTERNAL_SERVER_ERROR, b"Internal Server Error")
+        HTTP_REQUESTS.inc(route=request.path, status=int(response.status))
+        return response
+
+    @staticmethod
+    def _keep_alive(request: Request) -> bool:
+        connection = request.headers.get("connection", "").lower()
+        if request.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool, head: bool = False):
+        """
+        Writes a response with Content-Length framing.
+        """
+        status = HTTPStatus(response.status)
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head:
+            writer.write(response.body)
+        await writer.drain()